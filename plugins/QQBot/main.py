@@ -1,7 +1,11 @@
 from ncatbot.core import GroupMessage, PrivateMessage, MessageChain, Face, BaseMessage
+import asyncio
 import hashlib
 from ncatbot.plugin import CompatibleEnrollment
 from qq_bot.core.llm_manager.llm_registrar import get_llm_registrar
+from qq_bot.core.llm_manager.scheduler import Priority, llm_scheduler
+from qq_bot.conn.sql.archive import archive_old_messages
+from qq_bot.conn.sql.migrations import run_migrations
 
 from qq_bot.core.tool_manager.tool_registrar import ToolRegistrar
 from qq_bot.core.mcp_manager.mcp_register import get_mcp_register
@@ -11,8 +15,19 @@ from qq_bot.core.agent.agent_command import (
     group_random_picture,
     group_random_setu,
     group_use_tool, private_diary_record,
+    private_member_sync,
+)
+from qq_bot.core.agent.chat_gate import GateDecision, GroupChatGate
+from qq_bot.core.agent.debounce import MessageDebouncer
+from qq_bot.core.agent.agent_server import (
+    StreamedReply,
+    enqueue_group_msg_2_sql,
+    enqueue_private_msg_2_sql,
+    flush_msg_2_sql,
+    send_reply_sentences,
+    start_streamed_reply,
+    sync_all_group_members,
 )
-from qq_bot.core.agent.agent_server import save_group_msg_2_sql,save_private_msg_2_sql
 # from qq_bot.core import llm_registrar
 from qq_bot.utils.models import GroupMessageRecord,PrivateMessageRecord
 from qq_bot.utils.logging import logger
@@ -38,9 +53,22 @@ class QQBot(BasePlugin):
             group_at_chat,
         ]
         self.private_command = [
-            private_diary_record
+            private_diary_record,
+            private_member_sync,
         ]
         self.tools_description = [self.tools.tools["reminder_schedule"].description]
+        # 群消息先经本地门控，只有需要回复的消息才调用模型
+        self.chat_gate = GroupChatGate.from_settings()
+        # 同一群短时间内连续的多条消息合并为一次模型调用
+        self.group_debouncer = MessageDebouncer(
+            infer=self._group_reply_infer,
+            deliver=self._group_reply_deliver,
+            quiet=settings.GROUP_DEBOUNCE_QUIET,
+            max_wait=settings.GROUP_DEBOUNCE_MAX_WAIT,
+            name=settings.GROUP_CHATTER_LLM_CONFIG_NAME,
+        )
+        # 聊天模型初始化时会读取数据库，需先完成表结构迁移
+        await asyncio.to_thread(run_migrations)
         self.llm_registrar = await get_llm_registrar(self)
 
     async def on_load(self):
@@ -49,6 +77,39 @@ class QQBot(BasePlugin):
         print(f"插件版本: {self.version}")
         self.register_handlers()
 
+        # 定期保存聊天模型短期记忆快照
+        self.add_scheduled_task(
+            job_func=self.llm_registrar.save_snapshots,
+            name="chatter_memory_snapshot",
+            interval=settings.CHATTER_SNAPSHOT_INTERVAL,
+        )
+        # 定期清出空闲会话，控制短期记忆占用
+        self.add_scheduled_task(
+            job_func=self.llm_registrar.sweep_memories,
+            name="chatter_memory_sweep",
+            interval=settings.CHATTER_MEMORY_SWEEP_INTERVAL,
+        )
+        # 定期将过期聊天记录归档到冷存储，保持消息表规模
+        self.add_scheduled_task(
+            job_func=archive_old_messages,
+            name="message_archive",
+            interval=settings.ARCHIVE_INTERVAL,
+        )
+
+        # 定期同步群成员资料
+        self.add_scheduled_task(
+            job_func=sync_all_group_members,
+            name="group_member_sync",
+            interval=settings.GROUP_MEMBER_SYNC_INTERVAL,
+            kwargs={"api": self.api},
+        )
+        # 定期输出模型请求调度的排队情况
+        self.add_scheduled_task(
+            job_func=self.log_llm_scheduler_stats,
+            name="llm_scheduler_stats",
+            interval=settings.LLM_SCHEDULER_STATS_INTERVAL,
+        )
+
         self.register_user_func(
             name="ZoeHelp",
             handler=self.zoe_help,
@@ -62,6 +123,74 @@ class QQBot(BasePlugin):
             tags=["zoehelp"],
         )
 
+    async def _group_reply_infer(
+        self, group_id: int, burst: list[tuple[GroupMessageRecord, GroupMessage, GateDecision]]
+    ) -> str | dict | StreamedReply | None:
+        cur_model = self.llm_registrar.get(
+            settings.GROUP_CHATTER_LLM_CONFIG_NAME
+        )
+        tools=[self.tools.tools["reminder_schedule"].description]
+        user_msgs = [user_msg for user_msg, _, _ in burst]
+        # @机器人或回复机器人的消息优先于随机搭话调度
+        priority = (
+            Priority.MENTION
+            if any(decision.addressed for _, _, decision in burst)
+            else Priority.NORMAL
+        )
+        if cur_model.stream_reply:
+            # 流式回复（不支持工具调用）：生成第一句即视为推理完成，此前仍可被新消息取消，其余句子边生成边发送
+            return await start_streamed_reply(
+                cur_model.run_stream(user_msgs[-1], burst=user_msgs[:-1], priority=priority)
+            )
+        # 获取大模型回答（一次回复整批消息）
+        return await cur_model.run(
+            user_msgs[-1], burst=user_msgs[:-1], tools=tools, priority=priority
+        )
+
+    async def _group_reply_deliver(
+        self,
+        group_id: int,
+        burst: list[tuple[GroupMessageRecord, GroupMessage, GateDecision]],
+        res: str | dict | StreamedReply,
+    ) -> None:
+        user_msgs = [user_msg for user_msg, _, _ in burst]
+        user_msg, msg, _ = burst[-1]
+        # 合并回复的前几条消息没有对应的模型回复
+        no_replies = [""] * (len(user_msgs) - 1)
+
+        async def reply(text: str) -> None:
+            result = await msg.reply(text=text)
+            if isinstance(result, dict):
+                self.chat_gate.remember_bot_message((result.get("data") or {}).get("message_id"))
+
+        # 流式回复逐句发送
+        if isinstance(res, StreamedReply):
+            try:
+                await send_reply_sentences(res, reply)
+            finally:
+                await res.aclose()
+                if res.text:
+                    enqueue_group_msg_2_sql(messages=user_msgs,reply_messages=[*no_replies, res.text])
+        # 如果是文本类回答
+        elif isinstance(res, str):
+            await reply(res)
+            enqueue_group_msg_2_sql(messages=user_msgs,reply_messages=[*no_replies, res])
+        # 如果是function call
+        elif isinstance(res, dict):
+            if res["name"] == "reminder_schedule":
+                args = res["args"]
+                await self.api.post_group_msg(group_id=user_msg.group_id,text=res["content"])
+                self.add_scheduled_task(
+                    job_func=self.tools.tools["reminder_schedule"].group_msg_function,
+                    name=hashlib.md5(str(res["args"]).encode("utf-8")).hexdigest(),
+                    interval=args["time"],
+                    kwargs={"group_id":user_msg.group_id,"content":f"{args['user']},{args['message']}","api":self.api},
+                )
+                enqueue_group_msg_2_sql(messages=user_msgs,reply_messages=[*no_replies, res["content"]])
+
+    async def log_llm_scheduler_stats(self) -> None:
+        logger.info(f"[llm_scheduler] {llm_scheduler.stats()}")
+
     async def zoe_help(self, msg: BaseMessage):
         reply = ("喵呜～主人敲敲Zoe的小脑袋，就能解锁5项专属技能喵✨\n"
                  "1.🌦️全球天气秒查，晴雨都陪主人贴贴～\n"
@@ -74,6 +203,10 @@ class QQBot(BasePlugin):
 
     async def on_close(self):
         print(f"[{self.name}] 开始执行自定义退出逻辑...")
+        await flush_msg_2_sql()
+        await self.llm_registrar.flush_summaries()
+        await self.llm_registrar.flush_profiles()
+        await self.llm_registrar.save_snapshots()
         mcp_tools = await get_mcp_register()
         await mcp_tools.disconnect()
 
@@ -92,29 +225,23 @@ class QQBot(BasePlugin):
                 logger.warning(f"非文本消息，跳过")
                 return
             user_msg = await GroupMessageRecord.from_group_message(msg, False)
-            cur_model = self.llm_registrar.get(
-                settings.GROUP_CHATTER_LLM_CONFIG_NAME
+            decision = self.chat_gate.decide(user_msg, msg)
+            # 该群已有待回复的消息时，后续消息（指令等除外）并入同一批回复
+            if not decision.allowed and (
+                decision.filtered or not self.group_debouncer.is_active(user_msg.group_id)
+            ):
+                logger.debug(f"[gate] GROUP [{user_msg.group_id}] 跳过: {decision.reason}")
+                if not decision.filtered:
+                    # 未调用模型的群消息仍属于对话，照常写入短期记忆与数据库（无回复）
+                    cur_model = self.llm_registrar.get(settings.GROUP_CHATTER_LLM_CONFIG_NAME)
+                    cur_model.insert_and_update_history_message(user_msg)
+                    enqueue_group_msg_2_sql(messages=user_msg, reply_messages="")
+                return
+            logger.info(
+                f"[gate] GROUP [{user_msg.group_id}] "
+                f"{'调用模型' if decision.allowed else '并入待回复消息'}: {decision.reason}"
             )
-            tools=[self.tools.tools["reminder_schedule"].description]
-            if user_msg.content != "":
-                # 获取大模型回答
-                res= await cur_model.run(user_msg,tools=tools)
-                # 如果是文本类回答
-                if isinstance(res, str):
-                    await msg.reply(text=res)
-                    save_group_msg_2_sql(messages=user_msg,reply_messages=res)
-                # 如果是function call
-                elif isinstance(res, dict):
-                    if res["name"] == "reminder_schedule":
-                        args = res["args"]
-                        await self.api.post_group_msg(group_id=user_msg.group_id,text=res["content"])
-                        self.add_scheduled_task(
-                            job_func=self.tools.tools["reminder_schedule"].group_msg_function,
-                            name=hashlib.md5(str(res["args"]).encode("utf-8")).hexdigest(),
-                            interval=args["time"],
-                            kwargs={"group_id":user_msg.group_id,"content":f"{args['user']},{args['message']}","api":self.api},
-                        )
-                        save_group_msg_2_sql(messages=user_msg,reply_messages=res["content"])
+            self.group_debouncer.submit(user_msg.group_id, (user_msg, msg, decision))
 
         @bot.private_event()
         async def on_private_message(msg: PrivateMessage):
@@ -147,7 +274,7 @@ class QQBot(BasePlugin):
                             # await self.bot.api.post_private_msg(msg.user_id, image=d["content"])
                             await msg.reply(image=d["content"],is_file=True)
                     logger.info(f"{user_msg.user_id}回复消息：{str(format_message)}")
-                    save_private_msg_2_sql(messages=user_msg,reply_messages=res)
+                    enqueue_private_msg_2_sql(messages=user_msg,reply_messages=res)
 
 
 
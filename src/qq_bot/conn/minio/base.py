@@ -67,6 +67,11 @@ minio = MinioServer(
         settings.MINIO_JM_BOCKET_NAME,
         settings.MINIO_RANDOM_PIC_BOCKET_NAME,
         settings.MINIO_RANDOM_SETU_BOCKET_NAME,
+        *(
+            [settings.MINIO_ARCHIVE_BOCKET_NAME]
+            if settings.MINIO_ARCHIVE_BOCKET_NAME
+            else []
+        ),
     ],
 )
 
@@ -0,0 +1,302 @@
+import asyncio
+import gzip
+import io
+import json
+import os
+import re
+from collections import defaultdict
+from collections.abc import Callable, Iterator
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Literal, NamedTuple, Protocol
+
+from qq_bot.conn.sql.crud.group_message_crud import (
+    delete_group_messages,
+    iter_group_messages,
+)
+from qq_bot.conn.sql.crud.private_message_crud import (
+    delete_private_messages,
+    iter_private_messages,
+)
+from qq_bot.conn.sql.session import LocalSessionSync
+from qq_bot.utils.config import settings
+from qq_bot.utils.logging import logger
+from sqlmodel import Session
+
+ARCHIVE_FORMAT_VERSION = 1
+
+_PARTITION_PATTERN = re.compile(r"dt=(\d{4}-\d{2}-\d{2})/part-(\d+)-(\d+)\.json\.gz$")
+
+
+class _ArchiveTable(NamedTuple):
+    prefix: str
+    columns: list[str]
+    iter_rows: Callable[..., Iterator[Any]]
+    delete_rows: Callable[[Session, list[int]], int]
+
+
+_TABLES: dict[str, _ArchiveTable] = {
+    "group": _ArchiveTable(
+        prefix="group_message_v1",
+        columns=[
+            "id",
+            "message_id",
+            "group_id",
+            "sender_id",
+            "at_user_id",
+            "message",
+            "from_bot",
+            "send_time",
+            "reply_message",
+        ],
+        iter_rows=iter_group_messages,
+        delete_rows=delete_group_messages,
+    ),
+    "private": _ArchiveTable(
+        prefix="private_message_v1",
+        columns=[
+            "id",
+            "message_id",
+            "sender_id",
+            "message",
+            "from_bot",
+            "send_time",
+            "reply_message",
+        ],
+        iter_rows=iter_private_messages,
+        delete_rows=delete_private_messages,
+    ),
+}
+
+
+class ArchiveStorage(Protocol):
+    def put(self, key: str, data: bytes) -> None: ...
+
+    def get(self, key: str) -> bytes: ...
+
+    def list(self, prefix: str) -> list[str]: ...
+
+
+class LocalArchiveStorage:
+    def __init__(self, root: str) -> None:
+        self.root = root
+
+    def put(self, key: str, data: bytes) -> None:
+        path = Path(self.root) / key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        tmp_path.replace(path)
+
+    def get(self, key: str) -> bytes:
+        with open(os.path.join(self.root, key), "rb") as f:
+            return f.read()
+
+    def list(self, prefix: str) -> list[str]:
+        base = os.path.join(self.root, prefix)
+        keys = []
+        for dirpath, _, filenames in os.walk(base):
+            for filename in filenames:
+                if filename.endswith(".json.gz"):
+                    path = os.path.join(dirpath, filename)
+                    keys.append(os.path.relpath(path, self.root).replace(os.sep, "/"))
+        return keys
+
+
+class MinioArchiveStorage:
+    def __init__(self, bucket: str) -> None:
+        # 延迟导入：仅在使用 MinIO 归档时才连接
+        from qq_bot.conn.minio.base import minio
+
+        self.client = minio.client
+        self.bucket = bucket
+
+    def put(self, key: str, data: bytes) -> None:
+        self.client.put_object(
+            self.bucket, key, io.BytesIO(data), len(data), content_type="application/gzip"
+        )
+
+    def get(self, key: str) -> bytes:
+        response = self.client.get_object(self.bucket, key)
+        try:
+            return response.read()
+        finally:
+            response.close()
+            response.release_conn()
+
+    def list(self, prefix: str) -> list[str]:
+        return [
+            obj.object_name
+            for obj in self.client.list_objects(
+                self.bucket, prefix=prefix, recursive=True
+            )
+        ]
+
+
+def get_archive_storage() -> ArchiveStorage:
+    if settings.ARCHIVE_STORAGE == "minio":
+        return MinioArchiveStorage(settings.MINIO_ARCHIVE_BOCKET_NAME)
+    return LocalArchiveStorage(settings.ARCHIVE_ROOT)
+
+
+def _encode_partition(table: _ArchiveTable, rows: list[dict]) -> bytes:
+    # 按列存储：同一列的值连续排列，压缩率更高，读取时可先按列过滤
+    payload = {
+        "version": ARCHIVE_FORMAT_VERSION,
+        "table": table.prefix,
+        "rows": len(rows),
+        "columns": {column: [row[column] for row in rows] for column in table.columns},
+    }
+    return gzip.compress(
+        json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    )
+
+
+def _decode_partition(data: bytes) -> dict[str, list]:
+    payload = json.loads(gzip.decompress(data))
+    if payload.get("version") != ARCHIVE_FORMAT_VERSION:
+        raise ValueError(f"不支持的归档版本: {payload.get('version')}")
+    return payload["columns"]
+
+
+def _row_to_dict(row: Any, columns: list[str]) -> dict:
+    data = {column: getattr(row, column) for column in columns}
+    data["send_time"] = int(row.send_time.timestamp())
+    return data
+
+
+def archive_messages(
+    kind: Literal["group", "private"],
+    older_than_days: int | None = None,
+    batch_size: int | None = None,
+    storage: ArchiveStorage | None = None,
+) -> int:
+    """将超过指定天数的聊天记录按发送日期分区写入压缩列存文件，并从热表删除
+
+    文件写入成功后才删除对应的行，中途失败时已写入的分区保持一致，未写入的行留在热表中等待下次归档。
+
+    Args:
+        kind (Literal["group", "private"]): 群聊或私聊记录
+        older_than_days (int | None, optional): 归档多少天以前的消息，为空时使用 ARCHIVE_AFTER_DAYS. Defaults to None.
+        batch_size (int | None, optional): 单个文件最多包含的行数，为空时使用 ARCHIVE_BATCH_SIZE. Defaults to None.
+        storage (ArchiveStorage | None, optional): 归档存储，为空时按 ARCHIVE_STORAGE 创建. Defaults to None.
+
+    Returns:
+        int: 归档的行数
+    """
+    table = _TABLES[kind]
+    batch_size = batch_size or settings.ARCHIVE_BATCH_SIZE
+    storage = storage or get_archive_storage()
+    cutoff = datetime.now() - timedelta(
+        days=older_than_days or settings.ARCHIVE_AFTER_DAYS
+    )
+
+    buffers: dict[date, list[dict]] = defaultdict(list)
+    archived = 0
+    # 读取使用服务端游标，删除使用另一个连接，互不阻塞
+    with LocalSessionSync() as read_db, LocalSessionSync() as write_db:
+
+        def flush(day: date) -> None:
+            nonlocal archived
+            rows = buffers.pop(day)
+            key = (
+                f"{table.prefix}/dt={day.isoformat()}/"
+                f"part-{rows[0]['id']}-{rows[-1]['id']}.json.gz"
+            )
+            storage.put(key, _encode_partition(table, rows))
+            table.delete_rows(write_db, [row["id"] for row in rows])
+            write_db.commit()
+            archived += len(rows)
+
+        for row in table.iter_rows(read_db, end_time=cutoff, page_size=batch_size):
+            day = row.send_time.date()
+            if day not in buffers:
+                # 行按主键顺序读取，发送日期基本递增：出现新的一天时先写出更早的日期，
+                # 内存中只保留当天的缓冲（少量乱序的行会写入该日期的另一个文件）
+                for earlier in [d for d in buffers if d < day]:
+                    flush(earlier)
+            buffers[day].append(_row_to_dict(row, table.columns))
+            if len(buffers[day]) >= batch_size:
+                flush(day)
+        for day in list(buffers):
+            flush(day)
+
+    logger.info(
+        f"[archive] {table.prefix} 已归档{archived}条 {cutoff:%Y-%m-%d} 之前的消息"
+    )
+    return archived
+
+
+def read_archive(
+    kind: Literal["group", "private"],
+    group_id: int | None = None,
+    sender_id: int | None = None,
+    start_time: datetime | None = None,
+    end_time: datetime | None = None,
+    storage: ArchiveStorage | None = None,
+) -> Iterator[dict]:
+    """按群、发送者与时间范围查询归档的聊天记录
+
+    Args:
+        kind (Literal["group", "private"]): 群聊或私聊记录
+        group_id (int | None, optional): 按群过滤（仅群聊）. Defaults to None.
+        sender_id (int | None, optional): 按发送者过滤. Defaults to None.
+        start_time (datetime | None, optional): 发送时间下界（包含）. Defaults to None.
+        end_time (datetime | None, optional): 发送时间上界（不包含）. Defaults to None.
+        storage (ArchiveStorage | None, optional): 归档存储. Defaults to None.
+
+    Yields:
+        Iterator[dict]: 按时间顺序排列的消息，send_time 为 datetime
+    """
+    table = _TABLES[kind]
+    storage = storage or get_archive_storage()
+
+    partitions = []
+    for key in storage.list(f"{table.prefix}/"):
+        if not (match := _PARTITION_PATTERN.search(key)):
+            continue
+        day = date.fromisoformat(match.group(1))
+        # 先按分区日期裁剪，不读取范围外的文件
+        if start_time is not None and day < start_time.date():
+            continue
+        if end_time is not None and day > end_time.date():
+            continue
+        partitions.append((day, int(match.group(2)), key))
+
+    start_ts = int(start_time.timestamp()) if start_time is not None else None
+    end_ts = int(end_time.timestamp()) if end_time is not None else None
+    for _, _, key in sorted(partitions):
+        columns = _decode_partition(storage.get(key))
+        # 先在过滤列上筛出命中的行号，再组装整行
+        indexes = range(len(columns["id"]))
+        if group_id is not None:
+            values = columns["group_id"]
+            indexes = [i for i in indexes if values[i] == str(group_id)]
+        if sender_id is not None:
+            values = columns["sender_id"]
+            indexes = [i for i in indexes if values[i] == str(sender_id)]
+        if start_ts is not None:
+            values = columns["send_time"]
+            indexes = [i for i in indexes if values[i] >= start_ts]
+        if end_ts is not None:
+            values = columns["send_time"]
+            indexes = [i for i in indexes if values[i] < end_ts]
+
+        for i in indexes:
+            row = {column: columns[column][i] for column in table.columns}
+            row["send_time"] = datetime.fromtimestamp(row["send_time"])
+            yield row
+
+
+async def archive_old_messages() -> dict[str, int]:
+    """定时任务：归档群聊与私聊的冷数据"""
+    result = {}
+    for kind in _TABLES:
+        try:
+            result[kind] = await asyncio.to_thread(archive_messages, kind)
+        except Exception as err:  # noqa: PERF203
+            logger.error(f"{err}. [archive] {kind} 消息归档失败")
+    return result
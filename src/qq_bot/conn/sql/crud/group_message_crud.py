@@ -1,11 +1,12 @@
-import uuid
+from collections import defaultdict, deque
 from sqlmodel import Session, select
-from typing import Literal
+from sqlmodel.ext.asyncio.session import AsyncSession
 from qq_bot.utils.models import GroupMessageRecord
 from qq_bot.conn.sql.models import GroupMessageV1
-from qq_bot.utils.util_text import trans_str
-from typing import List
-from sqlalchemy import asc
+from typing import AsyncIterator, Iterator, List
+from datetime import datetime
+from sqlalchemy import asc, delete, desc, func, insert, tuple_
+from qq_bot.utils.config import settings
 
 
 def insert_group_message(
@@ -28,28 +29,118 @@ def insert_group_message(
     db.refresh(new_msg)
 
 
+async def insert_group_message_async(
+    db: AsyncSession,
+    message: GroupMessageRecord,
+    reply_message: str,
+) -> None:
+    db.add(GroupMessageV1(**_group_message_row(message, reply_message)))
+    await db.commit()
+
+
+def _group_message_row(message: GroupMessageRecord, reply_message: str) -> dict:
+    return {
+        "message_id": message.str_message_id(),
+        "group_id": message.str_group_id(),
+        "sender_id": message.str_sender_id(),
+        "at_user_id": message.str_at_user_id(),
+        "message": message.content,
+        "from_bot": 1 if message.from_bot else 0,
+        "send_time": message.get_datetime(),
+        "reply_message": reply_message,
+    }
+
+
+def _group_message_chunks(
+    messages: list[GroupMessageRecord],
+    reply_messages: list[str],
+    chunk_size: int | None,
+) -> Iterator[list[dict]]:
+    assert len(messages) == len(reply_messages), "消息与回复数量不一致"
+    size = chunk_size or settings.SQL_BULK_INSERT_CHUNK_SIZE
+    rows = [_group_message_row(m, r) for m, r in zip(messages, reply_messages)]
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+# 支持 RETURNING 的数据库以 executemany 执行这条已缓存的语句，由 SQLAlchemy 合并为
+# 多行 INSERT ... VALUES ... RETURNING，并按参数顺序返回主键
+_INSERT_RETURNING_ID = insert(GroupMessageV1).returning(
+    GroupMessageV1.id, sort_by_parameter_order=True
+)
+
+
+def _reselect_ids_stmt(chunk: list[dict], first_id: int):
+    # MySQL 不支持 RETURNING，且 innodb_autoinc_lock_mode=2 时同一语句的自增主键不保证连续，
+    # 只能确定 lastrowid 为本语句第一行的主键：在同一事务内按 (group_id, message_id) 回查
+    keys = {(row["group_id"], row["message_id"]) for row in chunk}
+    return (
+        select(GroupMessageV1.id, GroupMessageV1.group_id, GroupMessageV1.message_id)
+        .where(
+            GroupMessageV1.id >= first_id,
+            tuple_(GroupMessageV1.group_id, GroupMessageV1.message_id).in_(keys),
+        )
+        .order_by(asc(GroupMessageV1.id))
+    )
+
+
+def _match_ids(rows, chunk: list[dict]) -> list[int]:
+    # 同一语句内主键按行顺序递增，相同键的多行依次取最小的主键
+    ids: dict[tuple[str, str], deque[int]] = defaultdict(deque)
+    for row_id, group_id, message_id in rows:
+        ids[(group_id, message_id)].append(row_id)
+    return [ids[(row["group_id"], row["message_id"])].popleft() for row in chunk]
+
+
 def insert_group_messages(
     db: Session,
     messages: list[GroupMessageRecord],
     reply_messages: list[str],
-) -> None:
-    db.bulk_insert_mappings(
-        GroupMessageV1,
-        [
-            {
-                "message_id": message.str_message_id(),
-                "group_id": message.str_group_id(),
-                "sender_id": message.str_sender_id(),
-                "at_user_id": message.str_at_user_id(),
-                "message": message.str_at_user_id(),
-                "from_bot": message.content,
-                "send_time": 1 if message.from_bot else 0,
-                "reply_message": reply_message,
-            }
-            for message,reply_message in zip(messages,reply_messages)
-        ],
-    )
+    chunk_size: int | None = None,
+) -> list[int]:
+    """按块批量写入群聊记录，每块合并为多行 INSERT，全部写入后统一提交
+
+    Args:
+        db (Session): 数据库会话
+        messages (list[GroupMessageRecord]): 群聊消息
+        reply_messages (list[str]): 与消息一一对应的模型回复
+        chunk_size (int | None, optional): 每块的行数，为空时使用 SQL_BULK_INSERT_CHUNK_SIZE. Defaults to None.
+
+    Returns:
+        list[int]: 按消息顺序排列的自增主键
+    """
+    returning = db.get_bind().dialect.insert_returning
+    ids: list[int] = []
+    for chunk in _group_message_chunks(messages, reply_messages, chunk_size):
+        if returning:
+            ids.extend(db.execute(_INSERT_RETURNING_ID, chunk).scalars())
+        else:
+            # MySQL：一条多行 INSERT 写入整块，lastrowid 为本语句第一行的主键
+            result = db.execute(insert(GroupMessageV1).values(chunk))
+            rows = db.execute(_reselect_ids_stmt(chunk, result.lastrowid)).all()
+            ids.extend(_match_ids(rows, chunk))
     db.commit()
+    return ids
+
+
+async def insert_group_messages_async(
+    db: AsyncSession,
+    messages: list[GroupMessageRecord],
+    reply_messages: list[str],
+    chunk_size: int | None = None,
+) -> list[int]:
+    returning = db.get_bind().dialect.insert_returning
+    ids: list[int] = []
+    for chunk in _group_message_chunks(messages, reply_messages, chunk_size):
+        if returning:
+            ids.extend((await db.execute(_INSERT_RETURNING_ID, chunk)).scalars())
+        else:
+            result = await db.execute(insert(GroupMessageV1).values(chunk))
+            rows = (await db.execute(_reselect_ids_stmt(chunk, result.lastrowid))).all()
+            ids.extend(_match_ids(rows, chunk))
+    await db.commit()
+    return ids
+
 
 def fetch_all_group_messages(db: Session) -> List[GroupMessageV1]:
     """
@@ -58,4 +149,160 @@ def fetch_all_group_messages(db: Session) -> List[GroupMessageV1]:
     """
     stmt = select(GroupMessageV1).order_by(asc(GroupMessageV1.id))
     rows = db.exec(stmt).all()
-    return list(rows)
\ No newline at end of file
+    return list(rows)
+
+
+async def fetch_all_group_messages_async(db: AsyncSession) -> List[GroupMessageV1]:
+    stmt = select(GroupMessageV1).order_by(asc(GroupMessageV1.id))
+    rows = (await db.exec(stmt)).all()
+    return list(rows)
+
+
+def _page_group_messages_stmt(
+    after_id: int,
+    page_size: int,
+    group_id: int | None = None,
+    sender_id: int | None = None,
+    start_time: datetime | None = None,
+    end_time: datetime | None = None,
+):
+    # 键集分页：WHERE id > 上一页最后的 id ORDER BY id LIMIT page_size，不随页数变慢
+    stmt = (
+        select(GroupMessageV1)
+        .where(GroupMessageV1.id > after_id)
+        .order_by(asc(GroupMessageV1.id))
+        .limit(page_size)
+    )
+    if group_id is not None:
+        stmt = stmt.where(GroupMessageV1.group_id == str(group_id))
+    if sender_id is not None:
+        stmt = stmt.where(GroupMessageV1.sender_id == str(sender_id))
+    if start_time is not None:
+        stmt = stmt.where(GroupMessageV1.send_time >= start_time)
+    if end_time is not None:
+        stmt = stmt.where(GroupMessageV1.send_time < end_time)
+    return stmt.execution_options(stream_results=True, yield_per=page_size)
+
+
+def iter_group_messages(
+    db: Session,
+    group_id: int | None = None,
+    sender_id: int | None = None,
+    start_time: datetime | None = None,
+    end_time: datetime | None = None,
+    after_id: int = 0,
+    page_size: int = 1000,
+) -> Iterator[GroupMessageV1]:
+    """按主键顺序流式读取消息，内存占用与表大小无关（用于导出、重建向量库等离线任务）
+
+    Args:
+        db (Session): 数据库会话
+        group_id (int | None, optional): 按群过滤. Defaults to None.
+        sender_id (int | None, optional): 按发送者过滤. Defaults to None.
+        start_time (datetime | None, optional): 发送时间下界（包含）. Defaults to None.
+        end_time (datetime | None, optional): 发送时间上界（不包含）. Defaults to None.
+        after_id (int, optional): 从该主键之后开始读取，可用于断点续读. Defaults to 0.
+        page_size (int, optional): 每页行数，同时作为服务端游标的批大小. Defaults to 1000.
+
+    Yields:
+        Iterator[GroupMessageV1]: 按 id 升序的消息
+    """
+    while True:
+        stmt = _page_group_messages_stmt(
+            after_id, page_size, group_id=group_id, sender_id=sender_id, start_time=start_time, end_time=end_time
+        )
+        count = 0
+        for row in db.exec(stmt):
+            count += 1
+            after_id = row.id
+            yield row
+        if count < page_size:
+            return
+
+
+async def iter_group_messages_async(
+    db: AsyncSession,
+    group_id: int | None = None,
+    sender_id: int | None = None,
+    start_time: datetime | None = None,
+    end_time: datetime | None = None,
+    after_id: int = 0,
+    page_size: int = 1000,
+) -> AsyncIterator[GroupMessageV1]:
+    while True:
+        stmt = _page_group_messages_stmt(
+            after_id, page_size, group_id=group_id, sender_id=sender_id, start_time=start_time, end_time=end_time
+        )
+        count = 0
+        async for row in await db.stream_scalars(stmt):
+            count += 1
+            after_id = row.id
+            yield row
+        if count < page_size:
+            return
+
+
+def _recent_group_messages_stmt(limit: int, group_id: int | None = None):
+    if group_id is not None:
+        return (
+            select(GroupMessageV1)
+            .where(GroupMessageV1.group_id == str(group_id))
+            .order_by(desc(GroupMessageV1.id))
+            .limit(limit)
+        )
+
+    ranked = select(
+        GroupMessageV1.id.label("id"),
+        func.row_number()
+        .over(partition_by=GroupMessageV1.group_id, order_by=desc(GroupMessageV1.id))
+        .label("rn"),
+    ).subquery()
+    return (
+        select(GroupMessageV1)
+        .join(ranked, GroupMessageV1.id == ranked.c.id)
+        .where(ranked.c.rn <= limit)
+        .order_by(asc(GroupMessageV1.id))
+    )
+
+
+def fetch_recent_group_messages(
+    db: Session, limit: int, group_id: int | None = None
+) -> List[GroupMessageV1]:
+    """
+    按 group_id 分组，读取每个群最近的 limit 条消息（单条窗口函数查询），
+    结果按 id 升序排列，便于按时间顺序回放到短期记忆。
+    指定 group_id 时只读取该会话的最近 limit 条（按 key 过滤后 LIMIT）。
+    """
+    rows = db.exec(_recent_group_messages_stmt(limit, group_id)).all()
+    # 按 key 过滤时为倒序 LIMIT，翻转回时间顺序
+    return list(reversed(rows)) if group_id is not None else list(rows)
+
+
+async def fetch_recent_group_messages_async(
+    db: AsyncSession, limit: int, group_id: int | None = None
+) -> List[GroupMessageV1]:
+    rows = (await db.exec(_recent_group_messages_stmt(limit, group_id))).all()
+    return list(reversed(rows)) if group_id is not None else list(rows)
+
+
+def fetch_max_group_message_id(db: Session) -> int | None:
+    """读取消息表当前最大主键，作为短期记忆快照的水位线"""
+    return db.exec(select(func.max(GroupMessageV1.id))).first()
+
+
+async def fetch_max_group_message_id_async(db: AsyncSession) -> int | None:
+    return (await db.exec(select(func.max(GroupMessageV1.id)))).first()
+
+
+def delete_group_messages(db: Session, ids: list[int], chunk_size: int = 900) -> int:
+    """按主键分块删除消息（不提交，由调用方控制事务），返回删除的行数
+
+    每块的绑定参数数不超过 SQLite 3.32 之前的上限（999）。
+    """
+    deleted = 0
+    for start in range(0, len(ids), chunk_size):
+        result = db.execute(
+            delete(GroupMessageV1).where(GroupMessageV1.id.in_(ids[start:start + chunk_size]))
+        )
+        deleted += result.rowcount
+    return deleted
@@ -1,12 +1,11 @@
-import uuid
 from sqlmodel import Session, select
-from typing import Literal
+from sqlmodel.ext.asyncio.session import AsyncSession
 from qq_bot.utils.models import PrivateMessageRecord
 from qq_bot.conn.sql.models import PrivateMessageV1
-from qq_bot.utils.util_text import trans_str
-from typing import List
-from sqlmodel import Session, select
-from sqlalchemy import asc
+from typing import AsyncIterator, Iterator, List
+from datetime import datetime
+from sqlalchemy import asc, delete, desc, func, insert
+from qq_bot.utils.config import settings
 
 def insert_private_message(
     db: Session,
@@ -26,27 +25,70 @@ def insert_private_message(
     db.refresh(new_msg)
 
 
+async def insert_private_message_async(
+    db: AsyncSession,
+    message: PrivateMessageRecord,
+    reply_message: str,
+) -> None:
+    db.add(PrivateMessageV1(**_private_message_row(message, reply_message)))
+    await db.commit()
+
+
+def _private_message_row(message: PrivateMessageRecord, reply_message: str) -> dict:
+    return {
+        "message_id": message.str_id(),
+        "sender_id": message.str_user_id(),
+        "message": message.content,
+        "from_bot": 1 if message.from_bot else 0,
+        "send_time": message.get_datetime(),
+        "reply_message": reply_message,
+    }
+
+
+def _private_message_chunks(
+    messages: list[PrivateMessageRecord],
+    reply_messages: list[str],
+    chunk_size: int | None,
+) -> Iterator[list[dict]]:
+    assert len(messages) == len(reply_messages), "消息与回复数量不一致"
+    size = chunk_size or settings.SQL_BULK_INSERT_CHUNK_SIZE
+    rows = [_private_message_row(m, r) for m, r in zip(messages, reply_messages)]
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
 def insert_private_messages(
     db: Session,
     messages: list[PrivateMessageRecord],
     reply_messages: list[str],
+    chunk_size: int | None = None,
 ) -> None:
-    db.bulk_insert_mappings(
-        PrivateMessageV1,
-        [
-            {
-                "message_id": message.str_id(),
-                "sender_id": message.str_user_id(),
-                "message": message.content,
-                "from_bot": 1 if message.from_bot else 0,
-                "send_time": message.get_datetime(),
-                "reply_message": reply_message,
-            }
-            for message,reply_message in zip(messages,reply_messages)
-        ],
-    )
+    """按块批量写入私聊记录，全部写入后统一提交
+
+    每块以 executemany 执行同一条已缓存的 INSERT，由驱动/SQLAlchemy 合并为多行 INSERT，
+    避免为每块的多行 VALUES 重新编译语句。
+
+    Args:
+        db (Session): 数据库会话
+        messages (list[PrivateMessageRecord]): 私聊消息
+        reply_messages (list[str]): 与消息一一对应的模型回复
+        chunk_size (int | None, optional): 每块的行数，为空时使用 SQL_BULK_INSERT_CHUNK_SIZE. Defaults to None.
+    """
+    for chunk in _private_message_chunks(messages, reply_messages, chunk_size):
+        db.execute(insert(PrivateMessageV1), chunk)
     db.commit()
 
+
+async def insert_private_messages_async(
+    db: AsyncSession,
+    messages: list[PrivateMessageRecord],
+    reply_messages: list[str],
+    chunk_size: int | None = None,
+) -> None:
+    for chunk in _private_message_chunks(messages, reply_messages, chunk_size):
+        await db.execute(insert(PrivateMessageV1), chunk)
+    await db.commit()
+
 def fetch_all_private_messages(db: Session) -> List[PrivateMessageV1]:
     """
     读取 private_message_v1 全表数据，按 id 升序排列，
@@ -55,3 +97,153 @@ def fetch_all_private_messages(db: Session) -> List[PrivateMessageV1]:
     stmt = select(PrivateMessageV1).order_by(asc(PrivateMessageV1.id))
     rows = db.exec(stmt).all()
     return list(rows)
+
+
+async def fetch_all_private_messages_async(db: AsyncSession) -> List[PrivateMessageV1]:
+    stmt = select(PrivateMessageV1).order_by(asc(PrivateMessageV1.id))
+    rows = (await db.exec(stmt)).all()
+    return list(rows)
+
+
+def _page_private_messages_stmt(
+    after_id: int,
+    page_size: int,
+    sender_id: int | None = None,
+    start_time: datetime | None = None,
+    end_time: datetime | None = None,
+):
+    # 键集分页：WHERE id > 上一页最后的 id ORDER BY id LIMIT page_size，不随页数变慢
+    stmt = (
+        select(PrivateMessageV1)
+        .where(PrivateMessageV1.id > after_id)
+        .order_by(asc(PrivateMessageV1.id))
+        .limit(page_size)
+    )
+    if sender_id is not None:
+        stmt = stmt.where(PrivateMessageV1.sender_id == str(sender_id))
+    if start_time is not None:
+        stmt = stmt.where(PrivateMessageV1.send_time >= start_time)
+    if end_time is not None:
+        stmt = stmt.where(PrivateMessageV1.send_time < end_time)
+    return stmt.execution_options(stream_results=True, yield_per=page_size)
+
+
+def iter_private_messages(
+    db: Session,
+    sender_id: int | None = None,
+    start_time: datetime | None = None,
+    end_time: datetime | None = None,
+    after_id: int = 0,
+    page_size: int = 1000,
+) -> Iterator[PrivateMessageV1]:
+    """按主键顺序流式读取消息，内存占用与表大小无关（用于导出、重建向量库等离线任务）
+
+    Args:
+        db (Session): 数据库会话
+        sender_id (int | None, optional): 按发送者过滤. Defaults to None.
+        start_time (datetime | None, optional): 发送时间下界（包含）. Defaults to None.
+        end_time (datetime | None, optional): 发送时间上界（不包含）. Defaults to None.
+        after_id (int, optional): 从该主键之后开始读取，可用于断点续读. Defaults to 0.
+        page_size (int, optional): 每页行数，同时作为服务端游标的批大小. Defaults to 1000.
+
+    Yields:
+        Iterator[PrivateMessageV1]: 按 id 升序的消息
+    """
+    while True:
+        stmt = _page_private_messages_stmt(
+            after_id, page_size, sender_id=sender_id, start_time=start_time, end_time=end_time
+        )
+        count = 0
+        for row in db.exec(stmt):
+            count += 1
+            after_id = row.id
+            yield row
+        if count < page_size:
+            return
+
+
+async def iter_private_messages_async(
+    db: AsyncSession,
+    sender_id: int | None = None,
+    start_time: datetime | None = None,
+    end_time: datetime | None = None,
+    after_id: int = 0,
+    page_size: int = 1000,
+) -> AsyncIterator[PrivateMessageV1]:
+    while True:
+        stmt = _page_private_messages_stmt(
+            after_id, page_size, sender_id=sender_id, start_time=start_time, end_time=end_time
+        )
+        count = 0
+        async for row in await db.stream_scalars(stmt):
+            count += 1
+            after_id = row.id
+            yield row
+        if count < page_size:
+            return
+
+
+def _recent_private_messages_stmt(limit: int, sender_id: int | None = None):
+    if sender_id is not None:
+        return (
+            select(PrivateMessageV1)
+            .where(PrivateMessageV1.sender_id == str(sender_id))
+            .order_by(desc(PrivateMessageV1.id))
+            .limit(limit)
+        )
+
+    ranked = select(
+        PrivateMessageV1.id.label("id"),
+        func.row_number()
+        .over(partition_by=PrivateMessageV1.sender_id, order_by=desc(PrivateMessageV1.id))
+        .label("rn"),
+    ).subquery()
+    return (
+        select(PrivateMessageV1)
+        .join(ranked, PrivateMessageV1.id == ranked.c.id)
+        .where(ranked.c.rn <= limit)
+        .order_by(asc(PrivateMessageV1.id))
+    )
+
+
+def fetch_recent_private_messages(
+    db: Session, limit: int, sender_id: int | None = None
+) -> List[PrivateMessageV1]:
+    """
+    按 sender_id 分组，读取每个私聊对象最近的 limit 条消息（单条窗口函数查询），
+    结果按 id 升序排列，便于按时间顺序回放到短期记忆。
+    指定 sender_id 时只读取该会话的最近 limit 条（按 key 过滤后 LIMIT）。
+    """
+    rows = db.exec(_recent_private_messages_stmt(limit, sender_id)).all()
+    # 按 key 过滤时为倒序 LIMIT，翻转回时间顺序
+    return list(reversed(rows)) if sender_id is not None else list(rows)
+
+
+async def fetch_recent_private_messages_async(
+    db: AsyncSession, limit: int, sender_id: int | None = None
+) -> List[PrivateMessageV1]:
+    rows = (await db.exec(_recent_private_messages_stmt(limit, sender_id))).all()
+    return list(reversed(rows)) if sender_id is not None else list(rows)
+
+
+def fetch_max_private_message_id(db: Session) -> int | None:
+    """读取消息表当前最大主键，作为短期记忆快照的水位线"""
+    return db.exec(select(func.max(PrivateMessageV1.id))).first()
+
+
+async def fetch_max_private_message_id_async(db: AsyncSession) -> int | None:
+    return (await db.exec(select(func.max(PrivateMessageV1.id)))).first()
+
+
+def delete_private_messages(db: Session, ids: list[int], chunk_size: int = 900) -> int:
+    """按主键分块删除消息（不提交，由调用方控制事务），返回删除的行数
+
+    每块的绑定参数数不超过 SQLite 3.32 之前的上限（999）。
+    """
+    deleted = 0
+    for start in range(0, len(ids), chunk_size):
+        result = db.execute(
+            delete(PrivateMessageV1).where(PrivateMessageV1.id.in_(ids[start:start + chunk_size]))
+        )
+        deleted += result.rowcount
+    return deleted
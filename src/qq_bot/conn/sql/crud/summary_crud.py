@@ -0,0 +1,98 @@
+import json
+from datetime import datetime
+from typing import Literal
+
+from qq_bot.conn.sql.models import ConversationSummaryV1
+from sqlmodel import Session, col, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+
+def _summaries_stmt(scope: str, conversation_ids: list[int]):
+    return select(ConversationSummaryV1).where(
+        ConversationSummaryV1.scope == scope,
+        col(ConversationSummaryV1.conversation_id).in_(
+            [str(i) for i in conversation_ids]
+        ),
+    )
+
+
+def _apply_summary(
+    row: ConversationSummaryV1 | None,
+    scope: str,
+    conversation_id: int,
+    summary: str,
+    covered_until: datetime,
+    covered_message_ids: list[int],
+) -> ConversationSummaryV1:
+    if row is None:
+        row = ConversationSummaryV1(scope=scope, conversation_id=str(conversation_id))
+    row.summary = summary
+    row.covered_until = covered_until
+    row.covered_message_ids = json.dumps([str(i) for i in covered_message_ids])
+    row.update_time = datetime.now()
+    return row
+
+
+def select_summaries(
+    db: Session,
+    scope: Literal["group", "private"],
+    conversation_ids: list[int],
+) -> list[ConversationSummaryV1]:
+    """读取指定会话的滚动摘要"""
+    if not conversation_ids:
+        return []
+    return list(db.exec(_summaries_stmt(scope, conversation_ids)).all())
+
+
+async def select_summaries_async(
+    db: AsyncSession,
+    scope: Literal["group", "private"],
+    conversation_ids: list[int],
+) -> list[ConversationSummaryV1]:
+    if not conversation_ids:
+        return []
+    return list((await db.exec(_summaries_stmt(scope, conversation_ids))).all())
+
+
+def upsert_summary(
+    db: Session,
+    scope: Literal["group", "private"],
+    conversation_id: int,
+    summary: str,
+    covered_until: datetime,
+    covered_message_ids: list[int] | None = None,
+) -> None:
+    """写入（或覆盖）会话的滚动摘要
+
+    Args:
+        db (Session): 数据库会话
+        scope (Literal["group", "private"]): 会话类型
+        conversation_id (int): 群号或私聊用户的QQ号
+        summary (str): 摘要内容
+        covered_until (datetime): 摘要已覆盖到的最后一条消息的发送时间
+        covered_message_ids (list[int] | None, optional): covered_until 同一秒内已覆盖的消息id. Defaults to None.
+    """
+    row = db.get(ConversationSummaryV1, (scope, str(conversation_id)))
+    db.add(
+        _apply_summary(
+            row, scope, conversation_id, summary, covered_until, covered_message_ids or []
+        )
+    )
+    db.commit()
+
+
+async def upsert_summary_async(
+    db: AsyncSession,
+    scope: Literal["group", "private"],
+    conversation_id: int,
+    summary: str,
+    covered_until: datetime,
+    covered_message_ids: list[int] | None = None,
+) -> None:
+    row = await db.get(ConversationSummaryV1, (scope, str(conversation_id)))
+    db.add(
+        _apply_summary(
+            row, scope, conversation_id, summary, covered_until, covered_message_ids or []
+        )
+    )
+    await db.commit()
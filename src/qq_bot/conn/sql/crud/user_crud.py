@@ -1,36 +1,258 @@
-from cachetools.keys import hashkey
+import threading
+from datetime import datetime
+from typing import Iterable, Iterator
+from cachetools import TTLCache
 from sqlmodel import Session, col, select
-from cachetools import LRUCache, cached
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import case, insert, or_
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from qq_bot.conn.sql.models import UserV1
+from qq_bot.utils.config import settings
 from qq_bot.utils.models import QUser
-from qq_bot.utils.util_text import trans_int, trans_str
 
-_user_by_name_cache: LRUCache[str, str] = LRUCache(maxsize=1024 * 10)
-_user_by_id_cache: LRUCache[str, str] = LRUCache(maxsize=1024 * 10)
+
+_MISSING = object()
+
+
+def _row_to_profile(row: UserV1) -> QUser:
+    return QUser(
+        user_id=int(row.user_id),
+        nikename=row.nikename,
+        sex=row.sex,
+        age=row.age,
+        long_nick=row.long_nick,
+        location=row.location,
+        update_time=int(row.update_time.timestamp()) if row.update_time else 0,
+    )
+
+
+class UserProfileCache:
+    """用户资料缓存
+
+    以 user_id 为主键缓存 QUser（与会话无关的普通数据，而非 ORM 对象），并维护昵称到 user_id 的二级索引。
+    数据库中不存在的用户同样会被缓存（负缓存），有效期更短。批量查询时所有未命中的 id 合并为一条 IN 查询。
+    对外返回的是缓存对象的副本，调用方修改不会污染缓存。
+
+    Args:
+        maxsize (int, optional): 最多缓存的用户数. Defaults to 10240.
+        ttl (float, optional): 命中数据的有效期（秒）. Defaults to 600.
+        negative_ttl (float, optional): 不存在用户的有效期（秒）. Defaults to 60.
+    """
+
+    def __init__(
+        self, maxsize: int = 10240, ttl: float = 600, negative_ttl: float = 60
+    ) -> None:
+        self._profiles: TTLCache[int, QUser] = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._names: TTLCache[str, int] = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._missing_ids: TTLCache[int, bool] = TTLCache(maxsize=maxsize, ttl=negative_ttl)
+        self._missing_names: TTLCache[str, bool] = TTLCache(maxsize=maxsize, ttl=negative_ttl)
+        # 同步查询可能在线程池中执行，cachetools 本身不是线程安全的
+        self._lock = threading.RLock()
+
+    def _lookup(self, user_id: int) -> QUser | None | object:
+        with self._lock:
+            if (profile := self._profiles.get(user_id)) is not None:
+                return profile.model_copy()
+            if user_id in self._missing_ids:
+                return None
+        return _MISSING
+
+    def _lookup_name(self, name: str) -> int | None | object:
+        with self._lock:
+            if (user_id := self._names.get(name)) is not None and user_id in self._profiles:
+                return user_id
+            if name in self._missing_names:
+                return None
+        return _MISSING
+
+    def _store(self, ids: Iterable[int], rows: list[UserV1]) -> dict[int, QUser]:
+        found = {}
+        with self._lock:
+            for row in rows:
+                profile = _row_to_profile(row)
+                self._profiles[profile.user_id] = profile
+                self._missing_ids.pop(profile.user_id, None)
+                if profile.nikename:
+                    self._names[profile.nikename] = profile.user_id
+                    self._missing_names.pop(profile.nikename, None)
+                found[profile.user_id] = profile.model_copy()
+            for user_id in ids:
+                if user_id not in found:
+                    self._missing_ids[user_id] = True
+        return found
+
+    def _store_name(self, name: str, row: UserV1 | None) -> QUser | None:
+        if row is None:
+            with self._lock:
+                self._missing_names[name] = True
+            return None
+        return self._store([int(row.user_id)], [row])[int(row.user_id)]
+
+    def _partition(self, ids: Iterable[int]) -> tuple[dict[int, QUser], list[int]]:
+        hits, misses = {}, []
+        for user_id in dict.fromkeys(int(i) for i in ids):
+            profile = self._lookup(user_id)
+            if profile is _MISSING:
+                misses.append(user_id)
+            elif profile is not None:
+                hits[user_id] = profile
+        return hits, misses
+
+    def get(self, db: Session, user_id: int) -> QUser | None:
+        return self.get_many(db, [user_id]).get(int(user_id))
+
+    def get_many(self, db: Session, ids: Iterable[int]) -> dict[int, QUser]:
+        """批量获取用户资料，未命中的 id 通过一次 IN 查询补齐
+
+        Args:
+            db (Session): 数据库会话
+            ids (Iterable[int]): 用户 id
+
+        Returns:
+            dict[int, QUser]: user_id 到用户资料的映射，不存在的用户不在结果中
+        """
+        hits, misses = self._partition(ids)
+        if misses:
+            hits.update(self._store(misses, select_user_by_ids(db, misses)))
+        return hits
+
+    async def get_async(self, db: AsyncSession, user_id: int) -> QUser | None:
+        return (await self.get_many_async(db, [user_id])).get(int(user_id))
+
+    async def get_many_async(self, db: AsyncSession, ids: Iterable[int]) -> dict[int, QUser]:
+        hits, misses = self._partition(ids)
+        if misses:
+            hits.update(self._store(misses, await select_user_by_ids_async(db, misses)))
+        return hits
+
+    def get_by_name(self, db: Session, name: str) -> QUser | None:
+        """按昵称获取用户资料（昵称重复时取任意一个）"""
+        user_id = self._lookup_name(name)
+        if user_id is None:
+            return None
+        if user_id is not _MISSING:
+            return self.get(db, user_id)
+        return self._store_name(name, select_user_by_name(db, name))
+
+    async def get_by_name_async(self, db: AsyncSession, name: str) -> QUser | None:
+        user_id = self._lookup_name(name)
+        if user_id is None:
+            return None
+        if user_id is not _MISSING:
+            return await self.get_async(db, user_id)
+        return self._store_name(name, await select_user_by_name_async(db, name))
+
+    def invalidate(self, users: Iterable[QUser]) -> None:
+        """资料写入数据库后调用，清除相关 id 与新旧昵称的缓存（含负缓存）"""
+        with self._lock:
+            for user in users:
+                user_id = int(user.user_id)
+                old = self._profiles.pop(user_id, None)
+                self._missing_ids.pop(user_id, None)
+                for name in {old.nikename if old else None, user.nikename}:
+                    if name is None:
+                        continue
+                    if self._names.get(name) == user_id:
+                        self._names.pop(name, None)
+                    self._missing_names.pop(name, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._profiles.clear()
+            self._names.clear()
+            self._missing_ids.clear()
+            self._missing_names.clear()
+
+
+user_profiles = UserProfileCache(
+    maxsize=settings.USER_CACHE_MAXSIZE,
+    ttl=settings.USER_CACHE_TTL,
+    negative_ttl=settings.USER_CACHE_NEGATIVE_TTL,
+)
 
 
-@cached(_user_by_name_cache, key=lambda db, user_id: str(hashkey(user_id)))  # noqa
 def select_user_by_id(db: Session, user_id: int) -> UserV1 | None:
     result = db.exec(select(UserV1).where(UserV1.user_id == str(user_id))).first()
     return result
 
 
 def select_user_by_ids(db: Session, ids: list[int]) -> list[UserV1]:
-    result = db.exec(select(UserV1).where(col(UserV1.id).in_(ids))).all()
+    if not ids:
+        return []
+    result = db.exec(
+        select(UserV1).where(col(UserV1.user_id).in_([str(i) for i in ids]))
+    ).all()
     return list(result)
 
 
-@cached(_user_by_id_cache, key=lambda db, name: str(hashkey(name)))  # noqa
+async def select_user_by_id_async(db: AsyncSession, user_id: int) -> UserV1 | None:
+    result = await db.exec(select(UserV1).where(UserV1.user_id == str(user_id)))
+    return result.first()
+
+
+async def select_user_by_ids_async(db: AsyncSession, ids: list[int]) -> list[UserV1]:
+    if not ids:
+        return []
+    result = await db.exec(
+        select(UserV1).where(col(UserV1.user_id).in_([str(i) for i in ids]))
+    )
+    return list(result.all())
+
+
 def select_user_by_name(db: Session, name: str) -> UserV1 | None:
     result = db.exec(select(UserV1).where(UserV1.nikename == str(name))).first()
     return result
 
 
+async def select_user_by_name_async(db: AsyncSession, name: str) -> UserV1 | None:
+    result = await db.exec(select(UserV1).where(UserV1.nikename == str(name)))
+    return result.first()
+
+
+def _user_row(user: QUser) -> dict:
+    # DateTime 列需要 datetime 对象（SQLite 不接受字符串）
+    row = user.to_dict()
+    row["update_time"] = datetime.fromtimestamp(user.update_time)
+    return row
+
+
 def insert_users(db: Session, users: list[QUser] | QUser) -> None:
     data: list[QUser] = users if isinstance(users, list) else [users]
 
-    db.bulk_insert_mappings(UserV1, [user.to_dict() for user in data])
+    db.bulk_insert_mappings(UserV1, [_user_row(user) for user in data])
     db.commit()
+    user_profiles.invalidate(data)
+
+
+async def insert_users_async(db: AsyncSession, users: list[QUser] | QUser) -> None:
+    data: list[QUser] = users if isinstance(users, list) else [users]
+    if not data:
+        return
+
+    await db.execute(insert(UserV1), [_user_row(user) for user in data])
+    await db.commit()
+    user_profiles.invalidate(data)
+
+
+def _merge_users(
+    db: Session | AsyncSession,
+    existing: dict[int, UserV1],
+    q_map: dict[int, QUser],
+) -> list[UserV1]:
+    # 更新或新增
+    to_flush = []
+    for uid, q_user in q_map.items():
+        user = existing.get(uid)
+        if user is None:
+            # 数据库里没有就新建
+            user = UserV1(user_id=str(uid))
+            db.add(user)
+        # 同步字段
+        for field, value in _user_row(q_user).items():
+            setattr(user, field, value)
+        to_flush.append(user)
+    return to_flush
 
 
 def update_users(
@@ -47,31 +269,118 @@ def update_users(
     existing = {
         int(u.user_id): u
         for u in db.exec(
-            select(UserV1).where(UserV1.user_id.in_(map(str, q_map.keys())))
+            select(UserV1).where(col(UserV1.user_id).in_([str(i) for i in q_map]))
         ).all()
     }
 
     # 3. 更新或新增
-    to_flush = []
-    for uid, q_user in q_map.items():
-        user = existing.get(uid)
-        if user is None:
-            # 数据库里没有就新建
-            user = UserV1(user_id=str(uid))
-            db.add(user)
-        # 同步字段
-        for field, value in q_user.to_dict().items():
-            setattr(user, field, value)
-        to_flush.append(user)
+    to_flush = _merge_users(db, existing, q_map)
+
+    # 4. 一次性 flush + commit
+    db.add_all(to_flush)
+    db.commit()
 
-    # 4. 清缓存
-    for q_user in updated_users:
-        _user_by_name_cache.pop(str(hashkey(q_user.nikename)), None)
-        _user_by_id_cache.pop(str(hashkey(q_user.user_id)), None)
+    # 5. 提交后再清缓存，避免并发读取在提交前把旧数据重新载入缓存
+    user_profiles.invalidate(updated_users)
+
+
+async def update_users_async(db: AsyncSession, updated_users: list[QUser]) -> None:
+    if not updated_users:
+        return
+
+    q_map = {int(q.user_id): q for q in updated_users}
+    rows = await db.exec(
+        select(UserV1).where(col(UserV1.user_id).in_([str(i) for i in q_map]))
+    )
+    existing = {int(u.user_id): u for u in rows.all()}
+
+    to_flush = _merge_users(db, existing, q_map)
 
-    # 5. 一次性 flush + commit
     db.add_all(to_flush)
+    await db.commit()
+    user_profiles.invalidate(updated_users)
+
+# 用户资料中可被同步更新的字段
+PROFILE_FIELDS = ("nikename", "sex", "age", "long_nick", "location")
+
+
+def _upsert_users_stmt(dialect: str, rows: list[dict], fields: tuple[str, ...]):
+    """单条多行 upsert，只更新 fields 中的列，且仅在这些列确实变化时才修改 update_time
+
+    MySQL 使用 INSERT ... ON DUPLICATE KEY UPDATE（各列值相同时 InnoDB 不会改写该行），
+    SQLite 使用 INSERT ... ON CONFLICT DO UPDATE ... WHERE，未变化的行不会被更新。
+    """
+    table = UserV1.__table__
+    if dialect == "mysql":
+        stmt = mysql_insert(table).values(rows)
+        changed = or_(*(table.c[f].is_distinct_from(stmt.inserted[f]) for f in fields))
+        # MySQL 按书写顺序赋值，update_time 必须在其他列被覆盖之前计算
+        return stmt.on_duplicate_key_update(
+            [
+                ("update_time", case((changed, stmt.inserted.update_time), else_=table.c.update_time)),
+                *((f, stmt.inserted[f]) for f in fields),
+            ]
+        )
+    if dialect == "sqlite":
+        stmt = sqlite_insert(table).values(rows)
+        changed = or_(*(table.c[f].is_distinct_from(stmt.excluded[f]) for f in fields))
+        return stmt.on_conflict_do_update(
+            index_elements=[table.c.user_id],
+            set_={f: stmt.excluded[f] for f in (*fields, "update_time")},
+            where=changed,
+        )
+    raise NotImplementedError(f"不支持的数据库: {dialect}")
+
+
+def _upsert_chunks(
+    users: list[QUser], chunk_size: int | None
+) -> Iterator[list[dict]]:
+    # 同一用户只保留最后一条，避免同一语句内重复主键
+    rows = list({int(u.user_id): _user_row(u) for u in users}.values())
+    size = chunk_size or settings.SQL_BULK_INSERT_CHUNK_SIZE
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def upsert_users(
+    db: Session,
+    users: list[QUser],
+    fields: Iterable[str] = PROFILE_FIELDS,
+    chunk_size: int | None = None,
+) -> None:
+    """批量写入用户资料，已存在的用户只更新 fields 中发生变化的列
+
+    Args:
+        db (Session): 数据库会话
+        users (list[QUser]): 用户资料
+        fields (Iterable[str], optional): 已存在用户需要同步的列（新用户写入全部列）. Defaults to PROFILE_FIELDS.
+        chunk_size (int | None, optional): 每条语句的行数，为空时使用 SQL_BULK_INSERT_CHUNK_SIZE. Defaults to None.
+    """
+    if not users:
+        return
+    fields = tuple(fields)
+    dialect = db.get_bind().dialect.name
+    for chunk in _upsert_chunks(users, chunk_size):
+        db.execute(_upsert_users_stmt(dialect, chunk, fields))
     db.commit()
+    user_profiles.invalidate(users)
+
+
+async def upsert_users_async(
+    db: AsyncSession,
+    users: list[QUser],
+    fields: Iterable[str] = PROFILE_FIELDS,
+    chunk_size: int | None = None,
+) -> None:
+    if not users:
+        return
+    fields = tuple(fields)
+    dialect = db.get_bind().dialect.name
+    for chunk in _upsert_chunks(users, chunk_size):
+        await db.execute(_upsert_users_stmt(dialect, chunk, fields))
+    await db.commit()
+    user_profiles.invalidate(users)
+
 
 def fetch_all_users_info(db: Session) -> list[UserV1]:
     """
@@ -81,3 +390,8 @@ def fetch_all_users_info(db: Session) -> list[UserV1]:
     stmt = select(UserV1)
     rows = db.exec(stmt).all()
     return list(rows)
+
+
+async def fetch_all_users_info_async(db: AsyncSession) -> list[UserV1]:
+    rows = await db.exec(select(UserV1))
+    return list(rows.all())
@@ -0,0 +1,45 @@
+from qq_bot.conn.sql.crud.group_message_crud import insert_group_messages_async
+from qq_bot.conn.sql.crud.private_message_crud import insert_private_messages_async
+from qq_bot.conn.sql.write_behind import WriteBehindQueue
+from qq_bot.utils.config import settings
+from qq_bot.utils.decorator import sql_session
+from qq_bot.utils.logging import logger
+from qq_bot.utils.models import GroupMessageRecord, PrivateMessageRecord
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+
+@sql_session
+async def _write_group_messages(
+    items: list[tuple[GroupMessageRecord, str]], db: AsyncSession | None = None
+) -> None:
+    await insert_group_messages_async(db, [m for m, _ in items], [r for _, r in items])
+    logger.info(
+        f"聊天记录已存储[{len(items)}条]: {', '.join(f'{m.content[:4]}..' for m, _ in items)}"
+    )
+
+
+@sql_session
+async def _write_private_messages(
+    items: list[tuple[PrivateMessageRecord, str]], db: AsyncSession | None = None
+) -> None:
+    await insert_private_messages_async(db, [m for m, _ in items], [r for _, r in items])
+    logger.info(
+        f"聊天记录已存储[{len(items)}条]: {', '.join(f'{m.content[:4]}..' for m, _ in items)}"
+    )
+
+
+# 消息处理协程只负责入队，由后台任务按批写入数据库
+group_message_writer: WriteBehindQueue[tuple[GroupMessageRecord, str]] = WriteBehindQueue(
+    _write_group_messages,
+    batch_size=settings.SQL_WRITE_BATCH_SIZE,
+    flush_interval=settings.SQL_WRITE_FLUSH_INTERVAL,
+    name="group_message_writer",
+)
+private_message_writer: WriteBehindQueue[tuple[PrivateMessageRecord, str]] = (
+    WriteBehindQueue(
+        _write_private_messages,
+        batch_size=settings.SQL_WRITE_BATCH_SIZE,
+        flush_interval=settings.SQL_WRITE_FLUSH_INTERVAL,
+        name="private_message_writer",
+    )
+)
@@ -0,0 +1,211 @@
+from collections.abc import Callable
+from datetime import datetime
+from typing import NamedTuple
+
+from qq_bot.conn.sql.models import SchemaMigrationV1
+from qq_bot.conn.sql.session import local_engine_sync
+from qq_bot.utils.logging import logger
+from sqlalchemy import (
+    Column,
+    Connection,
+    DateTime,
+    Engine,
+    Index,
+    Integer,
+    MetaData,
+    SmallInteger,
+    String,
+    Table,
+    Text,
+    insert,
+    inspect,
+    select,
+    text,
+)
+from sqlalchemy.dialects.mysql import TINYINT
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    upgrade: Callable[[Connection], None]
+
+
+def _create_index_online(conn: Connection, index: Index) -> None:
+    """创建索引（已存在时跳过），MySQL 下使用 InnoDB 在线 DDL，建索引期间不阻塞读写"""
+    table_name = index.table.name
+    existing = {ix["name"] for ix in inspect(conn).get_indexes(table_name)}
+    if index.name in existing:
+        return
+
+    if conn.dialect.name == "mysql":
+        columns = ", ".join(f"`{column.name}`" for column in index.columns)
+        conn.execute(
+            text(
+                f"ALTER TABLE `{table_name}` ADD INDEX `{index.name}` ({columns}), "
+                "ALGORITHM=INPLACE, LOCK=NONE"
+            )
+        )
+    else:
+        index.create(conn)
+    logger.info(f"[migration] 已创建索引 {table_name}.{index.name}")
+
+
+def _v1_tables() -> MetaData:
+    """v1 的表结构快照
+
+    迁移只能依赖当时的表结构，不能引用会随版本变化的 ORM 模型：之后的列与索引由新版本的迁移添加。
+    """
+    flag = SmallInteger().with_variant(TINYINT(1), "mysql")
+    metadata = MetaData()
+    Table(
+        "group_message_v1",
+        metadata,
+        Column("id", Integer, primary_key=True, autoincrement=True),
+        Column("message_id", String(32), nullable=False),
+        Column("group_id", String(32), nullable=False),
+        Column("sender_id", String(32), nullable=False),
+        Column("message", String(2048), nullable=False),
+        Column("from_bot", flag, nullable=False),
+        Column("at_user_id", String(32)),
+        Column("send_time", DateTime, nullable=False),
+        Column("reply_message", String(2048), nullable=False),
+    )
+    Table(
+        "user_group_v1",
+        metadata,
+        Column("user_id", Integer, primary_key=True),
+        Column("group_id", Integer, nullable=False),
+        Column("is_valid", flag, nullable=False),
+    )
+    Table(
+        "user_v1",
+        metadata,
+        Column("user_id", String(32), primary_key=True),
+        Column("nikename", String(64)),
+        Column("sex", String(16)),
+        Column("age", Integer),
+        Column("long_nick", String(255)),
+        Column("location", String(64)),
+        Column("update_time", DateTime),
+    )
+    Table(
+        "private_message_v1",
+        metadata,
+        Column("id", Integer, primary_key=True, autoincrement=True),
+        Column("message_id", String(32), nullable=False),
+        Column("sender_id", String(32), nullable=False),
+        Column("message", String(2048), nullable=False),
+        Column("from_bot", flag, nullable=False),
+        Column("send_time", DateTime, nullable=False),
+        Column("reply_message", String(2048), nullable=False),
+    )
+    Table(
+        "conversation_summary_v1",
+        metadata,
+        Column("scope", String(16), primary_key=True),
+        Column("conversation_id", String(32), primary_key=True),
+        Column("summary", Text, nullable=False),
+        Column("covered_until", DateTime, nullable=False),
+        Column("update_time", DateTime, nullable=False),
+    )
+    return metadata
+
+
+def _create_tables(conn: Connection) -> None:
+    # 已存在的表（如引入迁移前建好的库）保持不变
+    _v1_tables().create_all(conn, checkfirst=True)
+
+
+# v2 新增的索引：(表名, 索引名, 列)
+V2_INDEXES = [
+    # 按群读取最近消息（WHERE group_id ORDER BY id DESC / 窗口函数分区）
+    ("group_message_v1", "ix_group_message_v1_group_id_id", ("group_id", "id")),
+    # 按群及时间范围读取
+    (
+        "group_message_v1",
+        "ix_group_message_v1_group_id_send_time",
+        ("group_id", "send_time"),
+    ),
+    ("private_message_v1", "ix_private_message_v1_sender_id_id", ("sender_id", "id")),
+    (
+        "private_message_v1",
+        "ix_private_message_v1_sender_id_send_time",
+        ("sender_id", "send_time"),
+    ),
+    ("user_v1", "ix_user_v1_nikename", ("nikename",)),
+]
+
+
+def _create_message_and_user_indexes(conn: Connection) -> None:
+    tables = _v1_tables().tables
+    for table_name, index_name, columns in V2_INDEXES:
+        table = tables[table_name]
+        _create_index_online(conn, Index(index_name, *(table.c[c] for c in columns)))
+
+
+def _add_column(
+    conn: Connection, table_name: str, column_name: str, ddl_type: str
+) -> None:
+    """为已有的表添加可为空的列（已存在时跳过）"""
+    existing = {column["name"] for column in inspect(conn).get_columns(table_name)}
+    if column_name in existing:
+        return
+    preparer = conn.dialect.identifier_preparer
+    conn.execute(
+        text(
+            f"ALTER TABLE {preparer.quote(table_name)} "
+            f"ADD COLUMN {preparer.quote(column_name)} {ddl_type}"
+        )
+    )
+    logger.info(f"[migration] 已添加列 {table_name}.{column_name}")
+
+
+def _add_summary_covered_message_ids(conn: Connection) -> None:
+    _add_column(conn, "conversation_summary_v1", "covered_message_ids", "TEXT")
+
+
+# 按版本号顺序执行，已发布的迁移不可修改，新的变更追加新版本
+MIGRATIONS: list[Migration] = [
+    Migration(1, "create_tables", _create_tables),
+    Migration(2, "message_and_user_indexes", _create_message_and_user_indexes),
+    Migration(3, "summary_covered_message_ids", _add_summary_covered_message_ids),
+]
+
+
+def run_migrations(engine: Engine = local_engine_sync) -> list[int]:
+    """执行所有尚未应用的迁移
+
+    Args:
+        engine (Engine, optional): 数据库引擎. Defaults to local_engine_sync.
+
+    Returns:
+        list[int]: 本次执行的迁移版本号
+    """
+    SchemaMigrationV1.__table__.create(engine, checkfirst=True)
+    with engine.connect() as conn:
+        applied = set(conn.execute(select(SchemaMigrationV1.version)).scalars())
+
+    executed: list[int] = []
+    for migration in sorted(MIGRATIONS, key=lambda m: m.version):
+        if migration.version in applied:
+            continue
+        logger.info(f"[migration] 执行迁移 v{migration.version}: {migration.name}")
+        with engine.begin() as conn:
+            migration.upgrade(conn)
+            conn.execute(
+                insert(SchemaMigrationV1).values(
+                    version=migration.version,
+                    name=migration.name,
+                    applied_at=datetime.now(),
+                )
+            )
+        executed.append(migration.version)
+
+    if not executed:
+        logger.info("[migration] 数据库结构已是最新")
+    return executed
+
+
+if __name__ == "__main__":
+    run_migrations()
@@ -1,13 +1,23 @@
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import Column, DateTime, Integer, String
+from sqlalchemy import Column, DateTime, Index, Integer, SmallInteger, String, Text
 from sqlalchemy.dialects.mysql import TINYINT
 from sqlmodel import Field, SQLModel
 
 
+# 布尔标记列：MySQL 下保持 TINYINT(1)，其他数据库使用通用的 SMALLINT
+FlagType = SmallInteger().with_variant(TINYINT(1), "mysql")
+
+
 class GroupMessageV1(SQLModel, table=True):
     __tablename__ = "group_message_v1"
+    __table_args__ = (
+        # 按群读取最近消息（WHERE group_id ORDER BY id DESC / 窗口函数分区）
+        Index("ix_group_message_v1_group_id_id", "group_id", "id"),
+        # 按群及时间范围读取
+        Index("ix_group_message_v1_group_id_send_time", "group_id", "send_time"),
+    )
 
     id: Optional[int] = Field(
         default=None,
@@ -19,7 +29,7 @@ class GroupMessageV1(SQLModel, table=True):
     group_id: str = Field(sa_column=Column("group_id", String(32), nullable=False))
     sender_id: str = Field(sa_column=Column("sender_id", String(32), nullable=False))
     message: str = Field(sa_column=Column("message", String(2048), nullable=False))
-    from_bot: int = Field(sa_column=Column("from_bot", TINYINT(1), nullable=False))
+    from_bot: int = Field(sa_column=Column("from_bot", FlagType, nullable=False))
     at_user_id: Optional[str] = Field(
         default=None, sa_column=Column("at_user_id", String(32))
     )
@@ -35,11 +45,12 @@ class UserGroupV1(SQLModel, table=True):
 
     user_id: int = Field(sa_column=Column("user_id", Integer, primary_key=True))
     group_id: int = Field(sa_column=Column("group_id", Integer, nullable=False))
-    is_valid: int = Field(sa_column=Column("is_valid", TINYINT(1), nullable=False))
+    is_valid: int = Field(sa_column=Column("is_valid", FlagType, nullable=False))
 
 
 class UserV1(SQLModel, table=True):
     __tablename__ = "user_v1"
+    __table_args__ = (Index("ix_user_v1_nikename", "nikename"),)
 
     user_id: Optional[str] = Field(
         default=None, sa_column=Column("user_id", String(32), primary_key=True)
@@ -62,6 +73,10 @@ class UserV1(SQLModel, table=True):
 
 class PrivateMessageV1(SQLModel, table=True):
     __tablename__ = "private_message_v1"
+    __table_args__ = (
+        Index("ix_private_message_v1_sender_id_id", "sender_id", "id"),
+        Index("ix_private_message_v1_sender_id_send_time", "sender_id", "send_time"),
+    )
 
     id: Optional[int] = Field(
         default=None,
@@ -72,9 +87,40 @@ class PrivateMessageV1(SQLModel, table=True):
     )
     sender_id: str = Field(sa_column=Column("sender_id", String(32), nullable=False))
     message: str = Field(sa_column=Column("message", String(2048), nullable=False))
-    from_bot: int = Field(sa_column=Column("from_bot", TINYINT(1), nullable=False))
+    from_bot: int = Field(sa_column=Column("from_bot", FlagType, nullable=False))
     send_time: datetime = Field(
         sa_column=Column("send_time", DateTime, nullable=False)
     )
     reply_message: str = Field(default=None,sa_column=Column("reply_message", String(2048), nullable=False))
 
+
+class ConversationSummaryV1(SQLModel, table=True):
+    __tablename__ = "conversation_summary_v1"
+
+    # 会话类型：group / private
+    scope: str = Field(sa_column=Column("scope", String(16), primary_key=True))
+    conversation_id: str = Field(
+        sa_column=Column("conversation_id", String(32), primary_key=True)
+    )
+    summary: str = Field(sa_column=Column("summary", Text, nullable=False))
+    # 摘要已覆盖到的最后一条消息的发送时间
+    covered_until: datetime = Field(
+        sa_column=Column("covered_until", DateTime, nullable=False)
+    )
+    # covered_until 同一秒内已被摘要覆盖的消息 id（JSON 数组）
+    covered_message_ids: Optional[str] = Field(
+        default=None, sa_column=Column("covered_message_ids", Text)
+    )
+    update_time: datetime = Field(
+        sa_column=Column("update_time", DateTime, nullable=False)
+    )
+
+
+class SchemaMigrationV1(SQLModel, table=True):
+    __tablename__ = "schema_migration_v1"
+
+    version: int = Field(sa_column=Column("version", Integer, primary_key=True))
+    name: str = Field(sa_column=Column("name", String(128), nullable=False))
+    applied_at: datetime = Field(
+        sa_column=Column("applied_at", DateTime, nullable=False)
+    )
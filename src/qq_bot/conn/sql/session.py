@@ -1,7 +1,9 @@
+import os
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker
-from sqlmodel import SQLModel, Session, create_engine, select
+from sqlmodel import Session, create_engine
 from sqlmodel.ext.asyncio.session import AsyncSession
-from qq_bot.utils.logging import logger
 from qq_bot.utils.config import settings
 from qq_bot.conn.sql.models import *
 
@@ -11,10 +13,51 @@ from sqlalchemy.ext.asyncio import (
     create_async_engine,
 )
 
+# 各数据库后端对应的异步驱动
+ASYNC_DRIVERS = {"mysql": "asyncmy", "sqlite": "aiosqlite"}
+
+# SQLite 连接参数：WAL 允许读写并发，NORMAL 同步级别在 WAL 下只在检查点时 fsync
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    "temp_store": "MEMORY",
+    "cache_size": -64000,  # 约 64MB 页缓存
+    "mmap_size": 256 * 1024 * 1024,
+    "foreign_keys": "ON",
+}
+
+
+def _async_database_uri(uri: str) -> str:
+    url = make_url(uri)
+    backend = url.get_backend_name()
+    return url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}").render_as_string(
+        hide_password=False
+    )
+
+
+def _engine_options(uri: str) -> dict:
+    url = make_url(uri)
+    if url.get_backend_name() != "sqlite":
+        return {"pool_pre_ping": True}
+
+    if url.database and url.database != ":memory:":
+        os.makedirs(os.path.dirname(os.path.abspath(url.database)), exist_ok=True)
+    # 同一连接可能被不同线程使用（asyncio.to_thread），写锁冲突时等待而不是立即报错
+    return {"connect_args": {"check_same_thread": False, "timeout": 30}}
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    for key, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {key}={value}")
+    cursor.close()
+
+
 local_engine_sync = create_engine(
     url=settings.SQL_DATABASE_URI,
-    pool_pre_ping=True,
-    echo=settings.DEBUG
+    echo=settings.DEBUG,
+    **_engine_options(settings.SQL_DATABASE_URI),
 )
 LocalSessionSync = sessionmaker(
     autocommit=False,
@@ -24,10 +67,15 @@ LocalSessionSync = sessionmaker(
 )
 
 local_engine_async = create_async_engine(
-    url=settings.SQL_DATABASE_URI.replace("mysql+pymysql", "mysql+asyncmy"),
-    pool_pre_ping=True,
-    echo=settings.DEBUG
+    url=_async_database_uri(settings.SQL_DATABASE_URI),
+    echo=settings.DEBUG,
+    **_engine_options(settings.SQL_DATABASE_URI),
 )
+
+if local_engine_sync.dialect.name == "sqlite":
+    event.listen(local_engine_sync, "connect", _set_sqlite_pragmas)
+    event.listen(local_engine_async.sync_engine, "connect", _set_sqlite_pragmas)
+
 LocalSessionAsync = async_sessionmaker(
 
     autocommit=False,
@@ -49,8 +97,7 @@ def get_local_db_sync():
         yield session
 
 
-logger.info(f"[init] Checking database consistency...")
-SQLModel.metadata.create_all(local_engine_sync)
+# 表结构由 qq_bot.conn.sql.migrations 管理，在插件初始化时执行
 
 # with LocalSession() as db:
 #     logger.info(f"[init] Checking message type data consistency...")
\ No newline at end of file
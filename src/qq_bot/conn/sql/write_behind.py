@@ -0,0 +1,111 @@
+import asyncio
+from collections.abc import Awaitable, Callable
+from typing import Generic, TypeVar
+
+from qq_bot.utils.logging import logger
+
+T = TypeVar("T")
+
+_STOP = object()
+
+
+class WriteBehindQueue(Generic[T]):
+    """异步写回队列
+
+    调用方只需把数据放入队列即可返回，后台任务在攒够 batch_size 条或
+    距本批第一条数据超过 flush_interval 秒时，调用 writer 批量写入。
+    写入失败时按 retry 次数重试，仍失败则丢弃该批并记录日志。
+    flush 可在读取数据库前确保此前入队的数据都已写入。
+
+    Args:
+        writer (Callable[[list[T]], Awaitable[None]]): 批量写入函数
+        batch_size (int, optional): 每批最多写入的条数. Defaults to 100.
+        flush_interval (float, optional): 一批数据最长等待时间（秒）. Defaults to 1.0.
+        retry (int, optional): 写入失败的重试次数. Defaults to 3.
+        name (str, optional): 日志中显示的名称. Defaults to "".
+    """
+
+    def __init__(
+        self,
+        writer: Callable[[list[T]], Awaitable[None]],
+        batch_size: int = 100,
+        flush_interval: float = 1.0,
+        retry: int = 3,
+        name: str = "",
+    ) -> None:
+        self._writer = writer
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retry = retry
+        self._name = name
+        self._queue: asyncio.Queue | None = None
+        self._worker: asyncio.Task | None = None
+
+    def put(self, item: T) -> None:
+        """放入一条待写入的数据（不阻塞），首次调用时启动后台写入任务"""
+        if self._worker is None or self._worker.done():
+            self._queue = self._queue or asyncio.Queue()
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+        self._queue.put_nowait(item)
+
+    def __len__(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopped = False
+        while not stopped:
+            item = await self._queue.get()
+            batch: list[T] = []
+            flushed: list[asyncio.Future] = []
+            deadline = loop.time() + self.flush_interval
+            while True:
+                if item is _STOP:
+                    stopped = True
+                    break
+                if isinstance(item, asyncio.Future):
+                    # flush 标记：不再等待凑批，立即写入已取出的数据
+                    flushed.append(item)
+                    break
+                batch.append(item)
+                timeout = deadline - loop.time()
+                if len(batch) >= self.batch_size or timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            if batch:
+                await self._write(batch)
+            for waiter in flushed:
+                if not waiter.done():
+                    waiter.set_result(None)
+
+    async def _write(self, batch: list[T]) -> None:
+        for attempt in range(1, self.retry + 1):
+            try:
+                await self._writer(batch)
+                logger.debug(f"[{self._name}]: 已批量写入{len(batch)}条")
+                return
+            except Exception as err:  # noqa: PERF203
+                logger.warning(
+                    f"{err}. [{self._name}]: 批量写入失败，重试[{attempt}/{self.retry}]"
+                )
+                await asyncio.sleep(min(2 ** (attempt - 1), 5))
+        logger.error(f"[{self._name}]: 批量写入失败，已丢弃{len(batch)}条")
+
+    async def flush(self) -> None:
+        """立即写入此前放入队列的全部数据，写入完成（或重试失败被丢弃）后返回"""
+        if self._worker is None or self._worker.done():
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait(waiter)
+        await waiter
+
+    async def close(self) -> None:
+        """写入队列中剩余的全部数据并停止后台任务（退出前调用）"""
+        if self._worker is None or self._worker.done():
+            return
+        self._queue.put_nowait(_STOP)
+        await self._worker
+        self._worker = None
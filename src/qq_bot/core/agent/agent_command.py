@@ -10,7 +10,7 @@ from qq_bot.core.agent.base import AgentBase
 from qq_bot.utils.decorator import MessageCommands
 from qq_bot.utils.models import GroupMessageRecord, PrivateMessageRecord
 from qq_bot.utils.util import blue_image
-from qq_bot.core.agent.agent_server import group_random_chat
+from qq_bot.core.agent.agent_server import group_random_chat, sync_all_group_members
 from qq_bot.core import random_pic_provider
 from qq_bot.conn.minio.base import minio
 from qq_bot.utils.config import settings
@@ -159,3 +159,19 @@ async def private_diary_record(agent: BasePlugin, message: PrivateMessageRecord,
     except:
         await agent.api.post_private_msg(user_id=message.user_id,text="日记保存失败")
         return False
+
+
+@MessageCommands(command=f"{settings.BOT_COMMAND_PRIVATE_MEMBER_SYNC}")
+async def private_member_sync(agent: BasePlugin, message: PrivateMessageRecord, params: str = "", **kwargs) -> bool:
+    if str(message.user_id) != str(settings.ROOT):
+        return False
+
+    group_ids = [int(g) for g in params.split() if g.isdigit()]
+    await agent.api.post_private_msg(user_id=message.user_id, text="开始同步群成员资料")
+    result = await sync_all_group_members(agent.api, group_ids)
+    text = "\n".join(f"{group_id}: {count}人" for group_id, count in result.items())
+    await agent.api.post_private_msg(
+        user_id=message.user_id,
+        text=f"群成员同步完成，共{sum(result.values())}人\n{text}",
+    )
+    return True
@@ -1,28 +1,24 @@
 import asyncio
 import random
+from typing import Any, AsyncGenerator, AsyncIterator, Awaitable, Callable
 from ncatbot.core import GroupMessage, BotAPI
-from sqlmodel import Session
-from qq_bot.conn.sql.crud.user_crud import (
-    insert_users,
-    select_user_by_ids,
-    update_users,
-)
-from qq_bot.core.agent.base import AgentBase
+from sqlmodel.ext.asyncio.session import AsyncSession
+from qq_bot.conn.sql.crud.user_crud import upsert_users_async
 from qq_bot.utils.decorator import sql_session
 from qq_bot.utils.models import GroupMessageRecord, PrivateMessageRecord, QUser
 from qq_bot.utils.util_text import (
     auto_split_sentence,
-    language_classifity,
     typing_time_calculate,
 )
 from qq_bot.conn.sql.crud.group_message_crud import (
-    insert_group_message,
-    insert_group_messages,
+    insert_group_message_async,
+    insert_group_messages_async,
 )
 from qq_bot.conn.sql.crud.private_message_crud import (
-    insert_private_message,
-    insert_private_messages,
+    insert_private_message_async,
+    insert_private_messages_async,
 )
+from qq_bot.conn.sql.message_writer import group_message_writer, private_message_writer
 
 from qq_bot.core import get_llm_registrar
 from qq_bot.utils.config import settings
@@ -30,18 +26,18 @@ from qq_bot.utils.logging import logger
 
 
 @sql_session
-def save_group_msg_2_sql(
+async def save_group_msg_2_sql(
     messages: list[GroupMessageRecord] | GroupMessageRecord,
     reply_messages: list[str] | str,
-    db: Session | None = None,
+    db: AsyncSession | None = None,
 ) -> None:
     try:
         abs: str = ""
         if isinstance(messages, list):
-            insert_group_messages(db=db, messages=messages,reply_messages=reply_messages)
+            await insert_group_messages_async(db=db, messages=messages,reply_messages=reply_messages)
             abs = ", ".join([f"{i.content[:4]}.." for i in messages])
         elif isinstance(messages, GroupMessageRecord):
-            insert_group_message(db=db, message=messages,reply_message=reply_messages)
+            await insert_group_message_async(db=db, message=messages,reply_message=reply_messages)
             abs = f"{messages.content[:5]}.."
         else:
             return
@@ -50,18 +46,18 @@ def save_group_msg_2_sql(
         logger.error(f"{err}. 聊天记录存储失败: {abs}")
 
 @sql_session
-def save_private_msg_2_sql(
+async def save_private_msg_2_sql(
         messages: list[PrivateMessageRecord] | PrivateMessageRecord,
         reply_messages: list[str] | str,
-        db: Session | None = None,
+        db: AsyncSession | None = None,
 ) -> None:
     try:
         abs: str = ""
         if isinstance(messages, list):
-            insert_private_messages(db=db, messages=messages,reply_messages=reply_messages)
+            await insert_private_messages_async(db=db, messages=messages,reply_messages=reply_messages)
             abs = ", ".join([f"{i.content[:4]}.." for i in messages])
         elif isinstance(messages, PrivateMessageRecord):
-            insert_private_message(db=db, message=messages,reply_message=reply_messages)
+            await insert_private_message_async(db=db, message=messages,reply_message=reply_messages)
             abs = f"{messages.content[:5]}.."
         else:
             return
@@ -70,33 +66,84 @@ def save_private_msg_2_sql(
         logger.error(f"{err}. 聊天记录存储失败: {abs}")
 
 
+def enqueue_group_msg_2_sql(
+    messages: list[GroupMessageRecord] | GroupMessageRecord,
+    reply_messages: list[str] | str,
+) -> None:
+    if isinstance(messages, GroupMessageRecord):
+        messages, reply_messages = [messages], [reply_messages]
+    for message, reply_message in zip(messages, reply_messages):
+        group_message_writer.put((message, reply_message))
+
+
+def enqueue_private_msg_2_sql(
+    messages: list[PrivateMessageRecord] | PrivateMessageRecord,
+    reply_messages: list[str] | str,
+) -> None:
+    if isinstance(messages, PrivateMessageRecord):
+        messages, reply_messages = [messages], [reply_messages]
+    for message, reply_message in zip(messages, reply_messages):
+        private_message_writer.put((message, reply_message))
+
+
+async def flush_msg_2_sql() -> None:
+    """写入队列中剩余的聊天记录（退出前调用）"""
+    await group_message_writer.close()
+    await private_message_writer.close()
+
+
+# 群成员列表只包含这些资料，同步时不覆盖签名、地区等私聊获取的字段
+MEMBER_PROFILE_FIELDS = ("nikename", "sex", "age")
+
+
 @sql_session
-def update_group_user_info(
-    users: list[QUser], db: Session | None = None
-) -> tuple[list, list]:
-    updated_users: list[str] = []
-    inserted_users: list[str] = []
+async def update_group_user_info(
+    users: list[QUser], db: AsyncSession | None = None
+) -> None:
+    await upsert_users_async(db, users, fields=MEMBER_PROFILE_FIELDS)
 
-    try:
-        # 更新已有数据
-        existed_users = select_user_by_ids(db=db, ids=[u.id for u in users])
-        update_users(db=db, users=existed_users, updated_users=users)
-        updated_users = [u.nikename for u in existed_users]
-        logger.info(f"更新群组用户[{len(existed_users)}]条: {updated_users}")
-    except Exception as err:
-        logger.error(f"更新群组用户时发生错误: {err}")
 
-    try:
-        # 插入新数据
-        existed_users_id = {int(u.id) for u in existed_users}  # 使用 set 来加速查找
-        new_users: list[QUser] = [u for u in users if int(u.id) not in existed_users_id]
-        insert_users(db=db, users=new_users)
-        inserted_users = [u.nikename for u in new_users]
-        logger.info(f"新增群组用户[{len(new_users)}条]: {inserted_users}")
-    except Exception as err:
-        logger.error(f"新增群组用户时发生错误: {err}")
+async def sync_group_members(api: BotAPI, group_id: int) -> int:
+    """拉取群成员列表，并以单条批量 upsert 同步到用户表（仅修改有变化的行）
+
+    Args:
+        api (BotAPI): OneBot 接口
+        group_id (int): 群号
+
+    Returns:
+        int: 同步的成员数
+    """
+    response = await api.get_group_member_list(group_id, True)
+    if response.get("status") != "ok":
+        logger.warning(f"GROUP [{group_id}] 获取群成员列表失败: {response.get('message')}")
+        return 0
+    users = [QUser.from_member_info(member) for member in response.get("data") or []]
+    await update_group_user_info(users)
+    logger.info(f"GROUP [{group_id}] 已同步群成员[{len(users)}]人")
+    return len(users)
+
+
+async def sync_all_group_members(
+    api: BotAPI, group_ids: list[int] | None = None
+) -> dict[int, int]:
+    """同步多个群的成员资料，为空时使用 GROUP_MEMBER_SYNC_GROUPS，仍为空则同步机器人所在的全部群
 
-    return updated_users, inserted_users
+    Returns:
+        dict[int, int]: 各群同步的成员数（失败的群为 0）
+    """
+    group_ids = group_ids or settings.GROUP_MEMBER_SYNC_GROUPS
+    if not group_ids:
+        response = await api.get_group_list(no_cache=False)
+        group_ids = [int(g["group_id"]) for g in response.get("data") or []]
+
+    result: dict[int, int] = {}
+    for group_id in group_ids:
+        try:
+            result[group_id] = await sync_group_members(api, group_id)
+        except Exception as err:
+            logger.error(f"{err}. GROUP [{group_id}] 群成员同步失败")
+            result[group_id] = 0
+    return result
 
 
 async def send_msg_2_group(
@@ -118,6 +165,105 @@ async def send_msg_2_group(
     )
 
 
+class StreamedReply:
+    """已生成第一句的流式回复，迭代时依次产出第一句及后续生成的句子
+
+    后续句子由后台任务持续读取并缓存，模型生成完毕即结束底层的流并释放调度名额，不必等待逐句发送时的打字耗时。
+
+    Args:
+        first (str): 第一句
+        rest (AsyncGenerator[str, None]): 尚未读取的后续句子
+    """
+
+    def __init__(self, first: str, rest: AsyncGenerator[str, None]) -> None:
+        self._first = first
+        self._buffer: asyncio.Queue[str | None] = asyncio.Queue()
+        self._drain = asyncio.get_running_loop().create_task(self._prefetch(rest))
+        # 已产出的句子（原文），用于记录完整回复
+        self.sentences: list[str] = []
+
+    async def _prefetch(self, rest: AsyncGenerator[str, None]) -> None:
+        try:
+            async for sentence in rest:
+                self._buffer.put_nowait(sentence)
+        finally:
+            await rest.aclose()
+            self._buffer.put_nowait(None)
+
+    async def __aiter__(self) -> AsyncIterator[str]:
+        self.sentences.append(self._first)
+        yield self._first
+        while (sentence := await self._buffer.get()) is not None:
+            self.sentences.append(sentence)
+            yield sentence
+        # 流中途出错时抛出异常
+        await self._drain
+
+    @property
+    def text(self) -> str:
+        return "".join(self.sentences).strip()
+
+    async def aclose(self) -> None:
+        """提前结束时停止读取底层的流（释放调度名额，未生成完的回复不写入短期记忆）"""
+        self._drain.cancel()
+        await asyncio.gather(self._drain, return_exceptions=True)
+
+
+async def start_streamed_reply(sentences: AsyncGenerator[str, None]) -> StreamedReply | None:
+    """读取流式回复直到第一句非空的句子，此前可被取消；模型没有生成任何内容时返回 None"""
+    try:
+        async for sentence in sentences:
+            if sentence.strip("。.~～ \n"):
+                return StreamedReply(sentence, sentences)
+    except BaseException:
+        await sentences.aclose()
+        raise
+    return None
+
+
+async def send_reply_sentences(
+    sentences: AsyncIterator[str], send: Callable[[str], Awaitable[Any]]
+) -> list[str]:
+    """逐句发送回复，每句发送前模拟打字耗时（等待下一句生成的时间也计入其中）
+
+    Args:
+        sentences (AsyncIterator[str]): 回复的句子
+        send (Callable[[str], Awaitable[Any]]): 发送一句话
+
+    Returns:
+        list[str]: 实际发送的句子
+    """
+    loop = asyncio.get_running_loop()
+    last_sent = loop.time()
+    sent: list[str] = []
+    async for part in sentences:
+        part = part.strip("。.~～")
+        if not part:
+            continue
+        await asyncio.sleep(max(0.0, typing_time_calculate(part) - (loop.time() - last_sent)))
+        await send(part)
+        last_sent = loop.time()
+        sent.append(part)
+    return sent
+
+
+async def _iter_reply_sentences(llm, message: GroupMessageRecord) -> AsyncIterator[str]:
+    # 流式模式下每句生成完毕即产出，否则等待完整回复后再拆句
+    if llm.stream_reply:
+        reply = await start_streamed_reply(llm.run_stream(message))
+        if reply is None:
+            return
+        try:
+            async for sentence in reply:
+                yield sentence
+        finally:
+            await reply.aclose()
+        return
+    bot_reply: str | None = await llm.run(message)
+    for sentence in auto_split_sentence(bot_reply) if bot_reply else []:
+        yield sentence
+
+
 async def group_random_chat(
     api: BotAPI,
     message: GroupMessageRecord,
@@ -128,30 +274,32 @@ async def group_random_chat(
     real_prob = random.random()
     if real_prob < prob:
         logger.info(f"回复意愿达标 [{prob:.2f}({real_prob:.2f}) / 1.0]")
-        llm_registrar = get_llm_registrar()
+        llm_registrar = await get_llm_registrar()
         llm: LLMGroupChatter = llm_registrar.get(settings.GROUP_CHATTER_LLM_CONFIG_NAME)
-        bot_reply: str | None = await llm.run(message)
-
-        if not bot_reply:
-            return False
 
         if need_split:
             bot_messages: list[GroupMessageRecord] = []
-            language = language_classifity(bot_reply)
-            parts: list[str] = auto_split_sentence(bot_reply, language)
-
-            for part in parts:
-                part = part.strip("。.~～")
-                await asyncio.sleep(typing_time_calculate(part, language))
-                bot_reply = await send_msg_2_group(api, message.group_id, part, reply=message.id)
-                if bot_reply:
-                    bot_messages.append(bot_reply)
-            save_group_msg_2_sql(messages=bot_messages)
+
+            async def send(part: str) -> None:
+                bot_message = await send_msg_2_group(api, message.group_id, part, reply=message.message_id)
+                if bot_message:
+                    bot_messages.append(bot_message)
+
+            await send_reply_sentences(_iter_reply_sentences(llm, message), send)
+            if not bot_messages:
+                return False
+            # 拆分发送的每一段都是独立的 bot 消息，没有对应的模型回复
+            await save_group_msg_2_sql(
+                messages=bot_messages, reply_messages=[""] * len(bot_messages)
+            )
         else:
-            await asyncio.sleep(typing_time_calculate(bot_reply, language))
-            bot_message = await send_msg_2_group(api, message.group_id, bot_reply, reply=message.id)
+            bot_reply: str | None = await llm.run(message)
+            if not bot_reply:
+                return False
+            await asyncio.sleep(typing_time_calculate(bot_reply))
+            bot_message = await send_msg_2_group(api, message.group_id, bot_reply, reply=message.message_id)
             if bot_message is not None:
-                save_group_msg_2_sql(messages=bot_message)
+                await save_group_msg_2_sql(messages=bot_message, reply_messages="")
 
         return True
 
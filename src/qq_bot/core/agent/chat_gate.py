@@ -0,0 +1,194 @@
+import importlib
+import random
+import time
+from collections import defaultdict, deque
+from collections.abc import Callable
+from typing import NamedTuple
+
+from cachetools import LRUCache
+from ncatbot.core import GroupMessage
+from qq_bot.utils.config import settings
+from qq_bot.utils.models import GroupMessageRecord
+from qq_bot.utils.util_text import get_data_from_message
+
+# 本地分类器：返回消息值得回复的附加概率（0~1），叠加在群聊天意愿之上
+Classifier = Callable[[GroupMessageRecord], float]
+
+
+class GateDecision(NamedTuple):
+    allowed: bool
+    reason: str
+
+    @property
+    def filtered(self) -> bool:
+        """消息本身不属于对话（空消息、机器人自己的消息、指令）"""
+        return self.reason in ("empty", "self", "command")
+
+    @property
+    def addressed(self) -> bool:
+        """消息直接发给机器人（@机器人或回复机器人）"""
+        return self.reason in ("mention", "reply")
+
+
+class KeywordClassifier:
+    """默认的本地分类器：提到关键词（如机器人的昵称）或提问时提高回复概率
+
+    Args:
+        keywords (list[str]): 关键词
+        keyword_weight (float, optional): 命中关键词时的附加概率. Defaults to 0.6.
+        question_weight (float, optional): 消息为提问时的附加概率. Defaults to 0.1.
+    """
+
+    def __init__(
+        self,
+        keywords: list[str],
+        keyword_weight: float = 0.6,
+        question_weight: float = 0.1,
+    ) -> None:
+        self.keywords = [k for k in keywords if k]
+        self.keyword_weight = keyword_weight
+        self.question_weight = question_weight
+
+    def __call__(self, message: GroupMessageRecord) -> float:
+        score = 0.0
+        if any(keyword in message.content for keyword in self.keywords):
+            score += self.keyword_weight
+        if message.content.rstrip().endswith(("?", "？", "吗", "呢")):
+            score += self.question_weight
+        return score
+
+
+def load_classifier(path: str) -> Classifier:
+    """按 "模块路径:对象名" 加载自定义分类器"""
+    module_name, _, attr = path.partition(":")
+    return getattr(importlib.import_module(module_name), attr)
+
+
+class GroupChatGate:
+    """群聊调用模型前的本地门控，只做内存判断，不访问网络
+
+    判断顺序：空消息与机器人自己的消息 -> 指令前缀 -> @机器人或回复机器人（直接放行）-> 频率上限
+    -> 冷却时间 -> 按「群聊天意愿 + 分类器附加概率」随机放行。放行即计入该群的频率计数。
+
+    Args:
+        bot_id (int | None): 机器人 QQ 号
+        command_prefixes (list[str]): 由其他指令处理的消息前缀
+        willingness (float): 默认的群聊天意愿（随机回复概率）
+        group_willingness (dict[int, float] | None, optional): 各群单独配置的聊天意愿. Defaults to None.
+        classifier (Classifier | None, optional): 本地分类器. Defaults to None.
+        min_length (int, optional): 非@消息的最短长度. Defaults to 2.
+        cooldown (float, optional): 同一群两次主动回复的最短间隔（秒）. Defaults to 10.
+        max_per_minute (int, optional): 同一群每分钟最多调用模型的次数，0 表示不限制. Defaults to 6.
+    """
+
+    def __init__(
+        self,
+        bot_id: int | None,
+        command_prefixes: list[str],
+        willingness: float,
+        group_willingness: dict[int, float] | None = None,
+        classifier: Classifier | None = None,
+        min_length: int = 2,
+        cooldown: float = 10,
+        max_per_minute: int = 6,
+    ) -> None:
+        self.bot_id = bot_id
+        self.command_prefixes = tuple(p for p in command_prefixes if p)
+        self.willingness = willingness
+        self.group_willingness = group_willingness or {}
+        self.classifier = classifier
+        self.min_length = min_length
+        self.cooldown = cooldown
+        self.max_per_minute = max_per_minute
+        # 各群最近一分钟内放行的时间
+        self._calls: dict[int, deque[float]] = defaultdict(deque)
+        # 机器人最近发出的消息id，用于识别「回复机器人」
+        self._bot_messages: LRUCache[int, bool] = LRUCache(maxsize=4096)
+
+    @classmethod
+    def from_settings(cls) -> "GroupChatGate":
+        classifier = (
+            load_classifier(settings.GROUP_GATE_CLASSIFIER)
+            if settings.GROUP_GATE_CLASSIFIER
+            else KeywordClassifier(settings.GROUP_GATE_KEYWORDS)
+        )
+        return cls(
+            bot_id=int(settings.BOT_UID) if settings.BOT_UID else None,
+            command_prefixes=[
+                settings.BOT_COMMAND_GROUP_TOOL,
+                settings.BOT_COMMAND_GROUP_JM_CHECK,
+                settings.BOT_COMMAND_GROUP_RANDOM_PIC,
+                settings.BOT_COMMAND_GROUP_RANDOM_SETU,
+                *settings.GROUP_GATE_COMMAND_PREFIXES,
+            ],
+            willingness=settings.CHAT_WILLINGNESS,
+            group_willingness={
+                int(k): v for k, v in settings.GROUP_CHAT_WILLINGNESS.items()
+            },
+            classifier=classifier,
+            min_length=settings.GROUP_GATE_MIN_LENGTH,
+            cooldown=settings.GROUP_GATE_COOLDOWN,
+            max_per_minute=settings.GROUP_GATE_MAX_PER_MINUTE,
+        )
+
+    def remember_bot_message(self, message_id: int | None) -> None:
+        """记录机器人发出的消息，之后回复该消息视为与机器人对话"""
+        if message_id is not None:
+            self._bot_messages[int(message_id)] = True
+
+    def _recent_calls(self, group_id: int, now: float) -> deque[float]:
+        calls = self._calls[group_id]
+        while calls and now - calls[0] >= 60:
+            calls.popleft()
+        return calls
+
+    def _allow(self, group_id: int, now: float, reason: str) -> GateDecision:
+        self._calls[group_id].append(now)
+        return GateDecision(True, reason)
+
+    def decide(
+        self, message: GroupMessageRecord, origin_msg: GroupMessage | None = None
+    ) -> GateDecision:
+        """判断该消息是否需要调用模型
+
+        Args:
+            message (GroupMessageRecord): 群消息
+            origin_msg (GroupMessage | None, optional): 原始消息（用于识别回复）. Defaults to None.
+
+        Returns:
+            GateDecision: 是否放行及原因
+        """
+        content = message.content.strip()
+        if not content:
+            return GateDecision(False, "empty")
+        if self.bot_id is not None and message.sender_id == self.bot_id:
+            return GateDecision(False, "self")
+        if self.command_prefixes and content.startswith(self.command_prefixes):
+            return GateDecision(False, "command")
+
+        now = time.monotonic()
+        group_id = message.group_id
+        # 直接发给机器人的消息总是放行，不受频率上限与聊天意愿限制
+        if self.bot_id is not None and message.at_user_id == self.bot_id:
+            return self._allow(group_id, now, "mention")
+        if origin_msg is not None:
+            reply_id = get_data_from_message(origin_msg.message, "reply").get("id")
+            if reply_id is not None and int(reply_id) in self._bot_messages:
+                return self._allow(group_id, now, "reply")
+
+        calls = self._recent_calls(group_id, now)
+        if self.max_per_minute and len(calls) >= self.max_per_minute:
+            return GateDecision(False, f"rate_limited({len(calls)}/min)")
+
+        if len(content) < self.min_length:
+            return GateDecision(False, "too_short")
+        if calls and now - calls[-1] < self.cooldown:
+            return GateDecision(False, f"cooldown({now - calls[-1]:.1f}s)")
+
+        prob = self.group_willingness.get(group_id, self.willingness)
+        if self.classifier is not None:
+            prob += self.classifier(message)
+        roll = random.random()
+        if roll < prob:
+            return self._allow(group_id, now, f"willingness(p={prob:.2f}, r={roll:.2f})")
+        return GateDecision(False, f"willingness(p={prob:.2f}, r={roll:.2f})")
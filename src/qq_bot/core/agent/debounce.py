@@ -0,0 +1,159 @@
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+from typing import Generic, TypeVar
+
+from qq_bot.utils.logging import logger
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class _Burst:
+    __slots__ = (
+        "pending",
+        "first_at",
+        "wakeup",
+        "waiter",
+        "inflight",
+        "inflight_at",
+        "task",
+        "last_delivery",
+    )
+
+    def __init__(self) -> None:
+        # 等待窗口结束的消息，以及正在推理（可被取消）的消息
+        self.pending: list = []
+        self.first_at = 0.0
+        self.wakeup = asyncio.Event()
+        self.waiter: asyncio.Task | None = None
+        self.inflight: list = []
+        self.inflight_at = 0.0
+        self.task: asyncio.Task | None = None
+        # 最近一批开始发送回复的任务（被取消的推理不会替换它），后续批次须等待其发送完毕
+        self.last_delivery: asyncio.Task | None = None
+
+
+class MessageDebouncer(Generic[T, R]):
+    """会话级消息合并（防抖）
+
+    同一会话的消息到达后等待 quiet 秒，期间每来一条新消息重新计时，但自本批第一条消息起最多等待 max_wait 秒。
+    窗口结束后整批消息交给 infer 生成一次回复，再交给 deliver 发送。
+    推理期间同一会话又有新消息到达时（且这批消息尚未等待超过 max_wait），取消进行中的推理并将这批消息并入新的窗口；
+    已开始发送的回复不会被取消，同一会话的回复按顺序发送。
+
+    Args:
+        infer (Callable[[Hashable, list[T]], Awaitable[R]]): 由一批消息生成回复（可被取消）
+        deliver (Callable[[Hashable, list[T], R], Awaitable[None]]): 发送回复并记录
+        quiet (float, optional): 静默多少秒后视为一批消息结束，0 表示不合并. Defaults to 1.5.
+        max_wait (float, optional): 一批消息最长等待时间（秒）. Defaults to 6.0.
+        name (str, optional): 日志中显示的名称. Defaults to "".
+    """
+
+    def __init__(
+        self,
+        infer: Callable[[Hashable, list[T]], Awaitable[R]],
+        deliver: Callable[[Hashable, list[T], R], Awaitable[None]],
+        quiet: float = 1.5,
+        max_wait: float = 6.0,
+        name: str = "",
+    ) -> None:
+        self._infer = infer
+        self._deliver = deliver
+        self.quiet = quiet
+        self.max_wait = max_wait
+        self._name = name
+        self._bursts: dict[Hashable, _Burst] = {}
+
+    def is_active(self, key: Hashable) -> bool:
+        """会话是否有尚未回复的消息（等待窗口中或推理中）"""
+        burst = self._bursts.get(key)
+        return burst is not None and bool(burst.pending or burst.inflight)
+
+    def submit(self, key: Hashable, item: T) -> None:
+        """加入一条消息（不阻塞）"""
+        loop = asyncio.get_running_loop()
+        burst = self._bursts.get(key)
+        if burst is None:
+            burst = self._bursts[key] = _Burst()
+
+        if (
+            burst.inflight
+            and burst.task is not None
+            and not burst.task.done()
+            and loop.time() - burst.inflight_at < self.max_wait
+        ):
+            # 新消息使进行中的推理过时，取消后与新消息合并为一批（超过 max_wait 后不再取消，避免持续刷屏时始终无法回复）
+            burst.task.cancel()
+            logger.info(
+                f"[{self._name}]: 会话[{key}]有新消息，取消进行中的推理({len(burst.inflight)}条)"
+            )
+            burst.first_at = (
+                burst.inflight_at
+                if not burst.pending
+                else min(burst.first_at, burst.inflight_at)
+            )
+            burst.pending[:0] = burst.inflight
+            burst.inflight = []
+        if not burst.pending:
+            burst.first_at = loop.time()
+        burst.pending.append(item)
+
+        burst.wakeup.set()
+        if burst.waiter is None or burst.waiter.done():
+            burst.waiter = loop.create_task(self._wait(key, burst))
+
+    async def _wait(self, key: Hashable, burst: _Burst) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            burst.wakeup.clear()
+            delay = min(self.quiet, burst.first_at + self.max_wait - loop.time())
+            if delay <= 0:
+                break
+            try:
+                await asyncio.wait_for(burst.wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                break
+
+        items, burst.pending = burst.pending, []
+        burst.inflight, burst.inflight_at = items, burst.first_at
+        burst.waiter = None
+        previous = [
+            t for t in (burst.task, burst.last_delivery) if t is not None and not t.done()
+        ]
+        burst.task = loop.create_task(self._process(key, burst, items, previous))
+
+    async def _process(
+        self, key: Hashable, burst: _Burst, items: list[T], previous: list[asyncio.Task]
+    ) -> None:
+        if previous:
+            # 上一批的推理或回复可能仍在进行，等待其完成以保证顺序
+            await asyncio.wait(previous)
+        try:
+            result = await self._infer(key, items)
+        except asyncio.CancelledError:
+            raise
+        except Exception as err:
+            logger.error(f"{err}. [{self._name}]: 会话[{key}]推理失败")
+            result = None
+        # 推理完成后不再允许取消
+        if burst.inflight is items:
+            burst.inflight = []
+        if result is not None:
+            burst.last_delivery = asyncio.current_task()
+        try:
+            if result is not None:
+                if len(items) > 1:
+                    logger.info(
+                        f"[{self._name}]: 会话[{key}]合并{len(items)}条消息为一次回复"
+                    )
+                await self._deliver(key, items, result)
+        except Exception as err:
+            logger.error(f"{err}. [{self._name}]: 会话[{key}]回复发送失败")
+        finally:
+            if (
+                self._bursts.get(key) is burst
+                and not burst.pending
+                and not burst.inflight
+                and burst.waiter is None
+            ):
+                self._bursts.pop(key, None)
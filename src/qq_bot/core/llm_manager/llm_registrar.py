@@ -41,6 +41,44 @@ class LLMRegistrar:
             logger.info(f"已注册模型：{tag}" if inst.is_activate else
                         f"已注册模型：{tag} [未激活]")
 
+    async def save_snapshots(self) -> None:
+        """保存所有聊天模型的短期记忆快照"""
+        for tag, inst in self.model_services.items():
+            if not hasattr(inst, "save_snapshot"):
+                continue
+            try:
+                await inst.save_snapshot()
+            except Exception as err:
+                logger.error(f"{err}. 模型[{tag}]短期记忆快照保存失败")
+
+    async def flush_summaries(self) -> None:
+        """等待聊天模型完成剩余的对话摘要（退出前调用）"""
+        for tag, inst in self.model_services.items():
+            if not hasattr(inst, "flush_summary"):
+                continue
+            try:
+                await inst.flush_summary()
+            except Exception as err:
+                logger.error(f"{err}. 模型[{tag}]对话摘要保存失败")
+
+    async def flush_profiles(self) -> None:
+        """写入已刷新但尚未落库的用户资料（退出前调用）"""
+        for tag, inst in self.model_services.items():
+            if not hasattr(inst, "flush_profile"):
+                continue
+            try:
+                await inst.flush_profile()
+            except Exception as err:
+                logger.error(f"{err}. 模型[{tag}]用户资料保存失败")
+
+    def sweep_memories(self) -> dict[str, dict[str, int]]:
+        """清出各聊天模型的空闲会话，并汇报当前短期记忆占用"""
+        footprints = {}
+        for tag, inst in self.model_services.items():
+            if hasattr(inst, "sweep_memory"):
+                footprints[tag] = inst.sweep_memory()
+        return footprints
+
     # 同步获取（初始化完成后才可使用）
     def get(self, model_tag: str) -> Optional[OpenAIBase]:
         return self.model_services.get(model_tag)
@@ -49,8 +87,10 @@ class LLMRegistrar:
 # ---------- 模块级异步单例 ----------
 _reg: Optional[LLMRegistrar] = None
 
-async def get_llm_registrar(bot: BasePlugin) -> LLMRegistrar:
+async def get_llm_registrar(bot: BasePlugin | None = None) -> LLMRegistrar:
+    """获取模型注册器，首次调用（插件初始化时）必须传入 bot"""
     global _reg
     if _reg is None:
+        assert bot is not None, "模型注册器尚未初始化"
         _reg = await LLMRegistrar.create(settings.LOCAL_PROMPT_ROOT, bot)
     return _reg
@@ -2,7 +2,7 @@ import os
 import json
 import re
 from functools import partial
-from typing import Any, Optional, Union
+from typing import Any, AsyncIterator, Optional, Union
 from openai import AsyncOpenAI, OpenAI
 from openai.types.chat import (
     ChatCompletionUserMessageParam,
@@ -14,8 +14,12 @@ from ncatbot.plugin import BasePlugin
 
 from qq_bot.core.tool_manager.tool_registrar import ToolRegistrar
 from qq_bot.utils.util import load_yaml
+from qq_bot.utils.util_text import ThinkTagFilter
 from qq_bot.utils.decorator import function_retry
+from qq_bot.utils.resilience import get_circuit_breaker
 from qq_bot.core.mcp_manager.mcp_register import get_mcp_register
+from qq_bot.core.llm_manager.memory.tokenizer import estimate_message_tokens, estimate_tokens
+from qq_bot.core.llm_manager.scheduler import Priority, llm_scheduler
 
 from qq_bot.utils.config import settings
 
@@ -36,6 +40,8 @@ class OpenAIBase:
         # assert os.path.isfile(prompt_path)
 
         self.retry = retry
+        # 熔断按服务地址区分，使用同一服务的模型共享熔断状态
+        self.endpoint = base_url
         self.configs: dict = load_yaml(prompt_path)
         self._load_config()
 
@@ -107,6 +113,63 @@ class OpenAIBase:
     def format_llm_message(self, content: str) -> ChatCompletionAssistantMessageParam:
         return ChatCompletionAssistantMessageParam(content=content, role="assistant")
 
+    def _build_messages(self, content: Any, kwargs: dict) -> list:
+        # 在对话开头加入角色设定，并取出 kwargs 中的用户个性化系统prompt
+        if isinstance(content, str):
+            messages = [
+                self.base_system_prompt,
+                self.format_user_message(content=content),
+            ]
+        if isinstance(content, list):
+            # 新建列表，不修改调用方传入的历史消息（重试时会重复构建）
+            messages = [self.base_system_prompt, *content]
+        if "custom_system_prompt" in kwargs:
+            if kwargs["custom_system_prompt"]:
+                messages.insert(1, kwargs["custom_system_prompt"])
+            kwargs.pop("custom_system_prompt")
+        return messages
+
+    def _estimate_request_tokens(self, messages: list, kwargs: dict) -> tuple[int, int]:
+        prompt_tokens = sum(
+            estimate_message_tokens(m) for m in messages if isinstance(m, dict)
+        )
+        return prompt_tokens, kwargs.get("max_tokens") or settings.LLM_DEFAULT_MAX_TOKENS
+
+    async def _create_completion(
+        self,
+        messages: list,
+        model: str,
+        priority: Priority = Priority.NORMAL,
+        schedule_key: str | None = None,
+        **kwargs,
+    ):
+        """经全局调度器排队后调用模型（非流式），请求失败时在同一调度名额内重试
+
+        Args:
+            messages (list): 对话消息
+            model (str): 模型名
+            priority (Priority, optional): 调度优先级. Defaults to Priority.NORMAL.
+            schedule_key (str | None, optional): 公平排队的会话键（如 "group:群号"）. Defaults to None.
+        """
+        prompt_tokens, max_tokens = self._estimate_request_tokens(messages, kwargs)
+        return await llm_scheduler.submit(
+            lambda: self._request_completion(messages=messages, model=model, **kwargs),
+            key=schedule_key or self.__model_tag__,
+            priority=priority,
+            tokens=prompt_tokens + max_tokens,
+            usage=lambda completion: completion.usage.total_tokens if completion.usage else None,
+        )
+
+    @function_retry(deadline=settings.LLM_CALL_DEADLINE)
+    async def _request_completion(self, messages: list, model: str, **kwargs):
+        """请求一次模型（非流式）
+
+        重试、熔断与超时只作用于请求本身：排队与限流等待不计入截止时间、不触发熔断，工具调用也不会随重试重复执行。
+        """
+        return await self.async_client.chat.completions.create(
+            messages=messages, model=model, **kwargs
+        )
+
     def _inference(self, content: str, model: Optional[str] = None, **kwargs) -> str:
         if self.is_activate:
             model = model or self.default_model
@@ -117,8 +180,7 @@ class OpenAIBase:
                     self.format_user_message(content=content),
                 ]
             if isinstance(content, list):
-                content.insert(0, self.base_system_prompt)
-                messages = content
+                messages = [self.base_system_prompt, *content]
             completion = self.client.chat.completions.create(
                 messages=messages,
                 model=model,
@@ -133,7 +195,6 @@ class OpenAIBase:
         else:
             return self.default_reply
 
-    @function_retry
     async def _async_inference(
         self, content: Any, model: Optional[str] = None, **kwargs
     ) -> ChatCompletionMessage | None:
@@ -143,22 +204,8 @@ class OpenAIBase:
             ), f"Illegal LLM input type: {type(content)}"
 
             model = model or self.default_model
-            if isinstance(content, str):
-                messages = [
-                    self.base_system_prompt,
-                    self.format_user_message(content=content),
-                ]
-            if isinstance(content, list):
-                content.insert(0, self.base_system_prompt)
-                messages = content
-            if "custom_system_prompt" in kwargs:
-                if kwargs["custom_system_prompt"]:
-                    messages.insert(1, kwargs["custom_system_prompt"])
-                kwargs.pop("custom_system_prompt")
-            completion = await self.async_client.chat.completions.create(
-                messages=messages, model=model, **kwargs
-            )
-            print(completion)
+            messages = self._build_messages(content, kwargs)
+            completion = await self._create_completion(messages=messages, model=model, **kwargs)
             if completion.choices and completion.choices[-1].message:
                 raw = completion.choices[-1].message.content or ""
                 cleaned = re.sub(r"<think>.*?</think>", "", raw, flags=re.DOTALL).strip()
@@ -169,11 +216,64 @@ class OpenAIBase:
         else:
             return self.default_reply
 
+    async def _async_stream_inference(
+        self, content: Any, model: Optional[str] = None, **kwargs
+    ) -> AsyncIterator[str]:
+        """流式调用，模型每生成一段正文即产出（<think> 段落在流中实时去除）
+
+        流式输出一旦开始便无法安全重试，因此不使用 function_retry，只在建立连接时经过熔断器。
+        """
+        if not self.is_activate:
+            yield self.default_reply
+            return
+        assert isinstance(content, str) or isinstance(
+            content, list
+        ), f"Illegal LLM input type: {type(content)}"
+
+        messages = self._build_messages(content, kwargs)
+        priority = kwargs.pop("priority", Priority.NORMAL)
+        schedule_key = kwargs.pop("schedule_key", None) or self.__model_tag__
+        prompt_tokens, max_tokens = self._estimate_request_tokens(messages, kwargs)
+        # 流式请求在整个流读取完毕后才释放调度名额
+        async with llm_scheduler.reserve(
+            schedule_key, priority, prompt_tokens + max_tokens
+        ) as request:
+            with get_circuit_breaker(self.endpoint).guard():
+                stream = await self.async_client.chat.completions.create(
+                    messages=messages, model=model or self.default_model, stream=True, **kwargs
+                )
+            think_filter = ThinkTagFilter()
+            generated = 0
+            async for chunk in stream:
+                if not chunk.choices or not chunk.choices[0].delta.content:
+                    continue
+                generated += estimate_tokens(chunk.choices[0].delta.content)
+                request.used_tokens = prompt_tokens + generated
+                if text := think_filter.feed(chunk.choices[0].delta.content):
+                    yield text
+            if text := think_filter.flush():
+                yield text
+
+    async def _async_summarize(
+        self, content: str, model: Optional[str] = None, **kwargs
+    ) -> str | None:
+        """不带角色设定的单轮调用，用于对话摘要等后台任务"""
+        if not self.is_activate:
+            return None
+        kwargs.setdefault("priority", Priority.BACKGROUND)
+        completion = await self._create_completion(
+            messages=[self.format_user_message(content=content)],
+            model=model or self.default_model,
+            **kwargs,
+        )
+        if completion.choices and completion.choices[-1].message:
+            raw = completion.choices[-1].message.content or ""
+            cleaned = re.sub(r"<think>.*?</think>", "", raw, flags=re.DOTALL).strip()
+            return cleaned or None
+        return None
 
 
 
-
-    @function_retry
     async def _async_tool_inference(
             self,
             user_id: int,
@@ -187,24 +287,13 @@ class OpenAIBase:
             ), f"Illegal LLM input type: {type(content)}"
 
             model = model or self.default_model
-            if isinstance(content, str):
-                messages = [
-                    self.base_system_prompt,
-                    self.format_user_message(content=content),
-                ]
-            if isinstance(content, list):
-                content.insert(0, self.base_system_prompt)
-                messages = content
-            if "custom_system_prompt" in kwargs:
-                if kwargs["custom_system_prompt"]:
-                    messages.insert(1, kwargs["custom_system_prompt"])
-                kwargs.pop("custom_system_prompt")
+            messages = self._build_messages(content, kwargs)
 
             iterations = 0
             max_iterations=5
             while iterations < max_iterations:  # 防止无限循环
                 iterations += 1
-                completion = await self.async_client.chat.completions.create(
+                completion = await self._create_completion(
                     messages=messages, model=model, tools=self.tool_description, **kwargs
                 )
                 if completion.choices and completion.choices[-1].message:
@@ -1,27 +1,35 @@
-from collections import defaultdict
 from datetime import datetime
 import json
-import os
-import ast
-import asyncio
-from typing import Any, Optional
-from itertools import chain
+from typing import AsyncIterator
 from sqlmodel import Session
-from openai.types.chat import ChatCompletionSystemMessageParam
 from ncatbot.plugin import BasePlugin
-from qq_bot.conn.sql.crud.group_message_crud import fetch_all_group_messages
+from qq_bot.conn.sql.crud.group_message_crud import (
+    fetch_max_group_message_id,
+    fetch_max_group_message_id_async,
+    fetch_recent_group_messages,
+    fetch_recent_group_messages_async,
+)
+from qq_bot.conn.sql.crud.summary_crud import select_summaries
+from qq_bot.conn.sql.message_writer import group_message_writer
 from qq_bot.utils.decorator import sql_session
+from qq_bot.core.llm_manager.memory.chatter import ChatterMemoryMixin
+from qq_bot.core.llm_manager.memory.record import CachedGroupMessage
 from qq_bot.utils.models import GroupMessageRecord
-from qq_bot.utils.util_text import parse_text
+from qq_bot.utils.util_text import SentenceStream
 from qq_bot.core.llm_manager.llms.base import OpenAIBase
-from qq_bot.utils.models import PrivateMessageRecord, QUser
 
 from qq_bot.utils.config import settings
-from qq_bot.utils.logging import logger
 
 
-class LLMGroupChatter(OpenAIBase):
+class LLMGroupChatter(ChatterMemoryMixin, OpenAIBase):
     __model_tag__ = settings.GROUP_CHATTER_LLM_CONFIG_NAME
+    memory_scope = "group"
+    message_cls = CachedGroupMessage
+    conversation_field = "group_id"
+    fetch_recent_messages_async = staticmethod(fetch_recent_group_messages_async)
+    fetch_max_message_id = staticmethod(fetch_max_group_message_id)
+    fetch_max_message_id_async = staticmethod(fetch_max_group_message_id_async)
+    message_writer = group_message_writer
 
     def __init__(
         self,
@@ -42,33 +50,25 @@ class LLMGroupChatter(OpenAIBase):
             bot=bot,
             **kwargs,
         )
-        self.cache_len = self.configs.get("message_cache_len", 5)
-        # 群组id 对应的历史消息集合cache
-        self.user_cache: dict[int, list[GroupMessageRecord]] = defaultdict(list)
-        # 消息id 对应的模型回复消息
-        self.llm_cache: dict[int, str] = {}
-        self.user_info: dict[int, QUser] = {}
-        # 用户id 对应的用户个性化系统prompt
-        self.user_system_prompt: dict[int, ChatCompletionSystemMessageParam] = {}
-        self._load_mysql_data()
+        # 流式生成回复，拆句发送时每句生成完毕即可发出
+        self.stream_reply: bool = self.configs.get("stream", False)
+        self._init_memory(self.configs.get("message_cache_len", 5))
+        # 优先从快照恢复，快照不存在或过期时回退到数据库
+        if not self._restore_snapshot() and not self.lazy_load:
+            self._load_mysql_data()
 
     @sql_session
     def _load_mysql_data(self, db: Session | None = None):
         # 加载聊天记录
-        message_rows = fetch_all_group_messages(db)
+        message_rows = fetch_recent_group_messages(db, self.cache_len)
         for row in message_rows:
             self.insert_and_update_history_message(
-                user_message=GroupMessageRecord(
-                    message_id=int(row.message_id),
-                    content=str(row.message),
-                    group_id=int(row.group_id),
-                    sender_id=int(row.sender_id),
-                    at_user_id=int(row.at_user_id) if row.at_user_id is not None else None,
-                    from_bot=bool(row.from_bot),
-                    send_time=str(row.send_time)
-                ),
+                user_message=CachedGroupMessage.from_row(row),
                 llm_message=row.reply_message
             )
+            self.hydrator.mark_loaded(int(row.group_id))
+        group_ids = {int(row.group_id) for row in message_rows}
+        self._load_summary_rows(select_summaries(db, "group", list(group_ids)))
 
         # # 加载账户信息
         # user_rows = fetch_all_users_info(db)
@@ -83,85 +83,54 @@ class LLMGroupChatter(OpenAIBase):
         #         update_time=time_trans_int(str(row.update_time)),
         #     )
 
+    def _summary_text(self, u_msg, l_msg: str | None) -> str:
+        text = f"{str(u_msg.sender_id)[:6]}: {u_msg.content}"
+        return f"{text}\n你: {l_msg}" if l_msg else text
 
-
-
-    def get_history_message(self, group_id: int) -> list:
-        result = []
-        # print("查询前",self.llm_cache)
-        # print(self.user_cache)
-        for u_msg in self.user_cache[group_id]:
-            result.append(
-                self.format_user_message(
-                    content=u_msg.content, name=str(u_msg.sender_id)[:6]
-                )
-            )
-            l_msg: str | None = self.llm_cache.get(u_msg.message_id, None)
-            if l_msg:
-                result.append(self.format_llm_message(l_msg))
-        return result
+    def _format_turn(self, u_msg: CachedGroupMessage, l_msg: str | None) -> list[dict]:
+        turn = [
+            self.format_user_message(content=u_msg.content, name=str(u_msg.sender_id)[:6])
+        ]
+        if l_msg:
+            turn.append(self.format_llm_message(l_msg))
+        return turn
 
     def insert_and_update_history_message(
-        self, user_message: GroupMessageRecord, llm_message: str | None = None
+        self,
+        user_message: GroupMessageRecord | CachedGroupMessage,
+        llm_message: str | None = None,
     ) -> None:
-        group_user_cache = self.user_cache[user_message.group_id]
-
-        # 避免重复插入
-        if any(msg.message_id == user_message.message_id for msg in group_user_cache):
-            return
-
-        if len(group_user_cache) >= self.cache_len:
-            # 记忆长度超出，推出
-            removed_msg = group_user_cache.pop(0)
-            self.llm_cache.pop(removed_msg.message_id, None)
-        group_user_cache.append(user_message)
-
-        # 避免插入空值、避免重复插入
-        if (llm_message is not None) and (user_message.message_id not in self.llm_cache.keys()):
-            self.llm_cache[user_message.message_id] = llm_message
+        if isinstance(user_message, GroupMessageRecord):
+            user_message = CachedGroupMessage.from_record(user_message)
+        # 窗口内部完成去重，记忆长度超出时推出最早的消息及其回复，交给摘要器压缩
+        evicted = self.user_cache[user_message.group_id].append(
+            user_message, llm_message, self._format_turn(user_message, llm_message)
+        )
+        if evicted is not None:
+            removed_msg, pop_llm_message = evicted
+            self.summarizer.push(
+                removed_msg.group_id,
+                removed_msg.send_ts,
+                removed_msg.message_id,
+                self._summary_text(removed_msg, pop_llm_message),
+            )
 
         # logger.info(
         #     f"[{self.__model_tag__}]: 短期记忆已更新 USER[{user_message.content}]"
         #     f"{' -> LLM[' + llm_message + ']' if llm_message else ''}"
         # )
-        # print("插入后",user_message.id,self.llm_cache)
-
-    def reduce_token(chatbot, system, context, myKey):
-        context.append(
-            {
-                "role": "user",
-                "content": "请帮我总结一下上述对话的内容，实现减少tokens的同时，保证对话的质量。在总结中不要加入这一句话。",
-            }
-        )
 
-        response = None  # get_response(system, context, myKey, raw=True)
-
-        statistics = f'本次对话Tokens用量【{response["usage"]["completion_tokens"]+12+12+8} / 4096】'
-        optmz_str = parse_text(
-            f'好的，我们之前聊了:{response["choices"][0]["message"]["content"]}\n\n================\n\n{statistics}'
-        )
-        chatbot.append(
-            (
-                "请帮我总结一下上述对话的内容，实现减少tokens的同时，保证对话的质量。",
-                optmz_str,
-            )
-        )
-
-        context = []
-        context.append({"role": "user", "content": "我们之前聊了什么?"})
-        context.append(
-            {
-                "role": "assistant",
-                "content": f'我们之前聊了：{response["choices"][0]["message"]["content"]}',
-            }
-        )
-        return chatbot, context
-
-    async def run(self, message: GroupMessageRecord, **kwargs) -> str | dict | None:
+    async def _build_history(
+        self, message: GroupMessageRecord, burst: list[GroupMessageRecord] | None = None
+    ) -> list:
         group_id = message.group_id
         user_message = message.content
+        await self.hydrator.ensure(group_id)
 
         history: list = self.get_history_message(group_id)
+        # 同一批合并回复的前几条消息尚未写入短期记忆，按原样排在本条消息之前
+        for burst_message in burst or ():
+            history.extend(self._format_turn(CachedGroupMessage.from_record(burst_message), None))
         history.append(
             self.format_user_message(
                 content=self._set_prompt(
@@ -174,8 +143,27 @@ class LLMGroupChatter(OpenAIBase):
                 name=str(message.sender_id)[:6],
             )
         )
+        return history
 
+    async def run(
+        self,
+        message: GroupMessageRecord,
+        burst: list[GroupMessageRecord] | None = None,
+        **kwargs,
+    ) -> str | dict | None:
+        """生成回复
+
+        Args:
+            message (GroupMessageRecord): 需要回复的消息
+            burst (list[GroupMessageRecord] | None, optional): 与该消息合并回复、在其之前到达的消息. Defaults to None.
+        """
+        history = await self._build_history(message, burst)
+        kwargs.setdefault("schedule_key", f"group:{message.group_id}")
         llm_message = await self._async_inference(content=history, **kwargs)
+        # 推理完成后才写入合并的消息，推理被取消时短期记忆保持不变
+        if llm_message:
+            for burst_message in burst or ():
+                self.insert_and_update_history_message(burst_message)
 
         if llm_message and llm_message.tool_calls:
             tool_call = llm_message.tool_calls[0]
@@ -192,3 +180,31 @@ class LLMGroupChatter(OpenAIBase):
             self.insert_and_update_history_message(message, llm_message.content)
             return llm_message.content
         return None
+
+    async def run_stream(
+        self,
+        message: GroupMessageRecord,
+        burst: list[GroupMessageRecord] | None = None,
+        **kwargs,
+    ) -> AsyncIterator[str]:
+        """流式生成回复，每形成一个完整的句子立即产出，正常生成结束后才将完整回复写入短期记忆
+
+        Args:
+            message (GroupMessageRecord): 需要回复的消息
+            burst (list[GroupMessageRecord] | None, optional): 与该消息合并回复、在其之前到达的消息. Defaults to None.
+        """
+        history = await self._build_history(message, burst)
+        kwargs.setdefault("schedule_key", f"group:{message.group_id}")
+        segmenter = SentenceStream()
+        reply_parts: list[str] = []
+        async for text in self._async_stream_inference(content=history, **kwargs):
+            reply_parts.append(text)
+            for sentence in segmenter.feed(text):
+                yield sentence
+        for sentence in segmenter.flush():
+            yield sentence
+        # 与 run 一致：生成被取消或中断时短期记忆保持不变（被取消的消息会并入下一批重新回复）
+        if reply := "".join(reply_parts).strip():
+            for burst_message in burst or ():
+                self.insert_and_update_history_message(burst_message)
+            self.insert_and_update_history_message(message, reply)
@@ -1,35 +1,48 @@
-from collections import defaultdict
 from datetime import datetime
 import chromadb
 import re
-import time
-import json
-import os
-import ast
-import asyncio
-from typing import Any, Optional
-from itertools import chain
 from ncatbot.core import BotAPI
 from ncatbot.plugin import BasePlugin
 from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from openai.types.chat import ChatCompletionSystemMessageParam
 
 from qq_bot.conn.chroma.base import ChromaEmbeddingFunction, is_id_exists, message_add, messages_query
+from qq_bot.conn.sql.crud.summary_crud import select_summaries
+from qq_bot.conn.sql.message_writer import private_message_writer
 from qq_bot.utils.decorator import sql_session
+from qq_bot.core.llm_manager.memory.chatter import ChatterMemoryMixin, ConversationRows
+from qq_bot.core.llm_manager.memory.profile import ProfileRefresher
+from qq_bot.core.llm_manager.memory.record import CachedPrivateMessage
+from qq_bot.core.llm_manager.memory.window import ConversationWindow
 from qq_bot.utils.models import PrivateMessageRecord, QUser
 from qq_bot.utils.util import search_meme
-from qq_bot.utils.util_text import parse_text,time_trans_int
 from qq_bot.core.llm_manager.llms.base import OpenAIBase
-from qq_bot.conn.sql.crud.private_message_crud import fetch_all_private_messages
-from qq_bot.conn.sql.crud.user_crud import fetch_all_users_info, insert_users,update_users
+from qq_bot.core.llm_manager.scheduler import Priority
+from qq_bot.conn.sql.crud.private_message_crud import (
+    fetch_max_private_message_id,
+    fetch_max_private_message_id_async,
+    fetch_recent_private_messages,
+    fetch_recent_private_messages_async,
+)
+from qq_bot.conn.sql.crud.user_crud import (
+    update_users_async,
+    user_profiles,
+)
 from qq_bot.utils.config import settings
 from qq_bot.utils.logging import logger
-from qq_bot.conn.sql.session import LocalSessionSync
 
 
 
-class LLMPrivateChatter(OpenAIBase):
+class LLMPrivateChatter(ChatterMemoryMixin, OpenAIBase):
     __model_tag__ = settings.PRIVATE_CHATTER_LLM_CONFIG_NAME
+    memory_scope = "private"
+    message_cls = CachedPrivateMessage
+    conversation_field = "sender_id"
+    fetch_recent_messages_async = staticmethod(fetch_recent_private_messages_async)
+    fetch_max_message_id = staticmethod(fetch_max_private_message_id)
+    fetch_max_message_id_async = staticmethod(fetch_max_private_message_id_async)
+    message_writer = private_message_writer
 
     def __init__(
         self,
@@ -50,15 +63,7 @@ class LLMPrivateChatter(OpenAIBase):
             bot=bot,
             **kwargs,
         )
-        self.cache_len = self.configs.get("message_cache_len", 20)
-        # 群组id 对应的历史消息集合cache
-        self.user_cache: dict[int, list[PrivateMessageRecord]] = defaultdict(list)
-        # 消息id 对应的模型回复消息
-        self.llm_cache: dict[int, str] = {}
-        # 用户id 对应的用户信息
-        self.user_info: dict[int, QUser] = {}
-        # 用户id 对应的用户个性化系统prompt
-        self.user_system_prompt: dict[int, ChatCompletionSystemMessageParam] = {}
+        self._init_memory(self.configs.get("message_cache_len", 20))
         chroma_client = chromadb.PersistentClient(path="./chromadb")
 
 
@@ -81,77 +86,100 @@ class LLMPrivateChatter(OpenAIBase):
                 )
             )
 
-
-        self._load_mysql_data()
+        # 用户资料在后台刷新与落库，不占用回复耗时
+        self.profile_refresher = ProfileRefresher(
+            fetch=self._fetch_profile,
+            persist=self._persist_profiles,
+            on_refreshed=self._on_profile_refreshed,
+            interval=settings.PROFILE_REFRESH_INTERVAL,
+            rate=settings.PROFILE_REFRESH_RATE,
+            burst=settings.PROFILE_REFRESH_BURST,
+            batch_size=settings.SQL_WRITE_BATCH_SIZE,
+            flush_interval=settings.SQL_WRITE_FLUSH_INTERVAL,
+            name=self.__model_tag__,
+        )
+        # 优先从快照恢复，快照不存在或过期时回退到数据库
+        if not self._restore_snapshot() and not self.lazy_load:
+            self._load_mysql_data()
 
     @sql_session
     def _load_mysql_data(self, db: Session | None = None):
         # 加载聊天记录
-        message_rows = fetch_all_private_messages(db)
+        message_rows = fetch_recent_private_messages(db, self.cache_len)
         for row in message_rows:
             self.insert_and_update_history_message(
-                user_message=PrivateMessageRecord(
-                    message_id=int(row.message_id),
-                    user_id=int(row.sender_id),
-                    content=row.message,
-                    from_bot=bool(row.from_bot),
-                    send_time=str(row.send_time),
-                ),
+                user_message=CachedPrivateMessage.from_row(row),
                 llm_message=row.reply_message
             )
 
-        # 加载账户信息
-        user_rows = fetch_all_users_info(db)
-        for row in user_rows:
-            self.user_info[int(row.user_id)] = QUser(
-                user_id=int(row.user_id),
-                nikename=row.nikename,
-                sex=row.sex,
-                age=row.age,
-                long_nick=row.long_nick,
-                location=row.location,
-                update_time=time_trans_int(str(row.update_time)),
-            )
+        # 加载账户信息（仅加载已缓存会话的用户，其他用户在首条消息到达时按需加载）
+        user_ids = {int(row.sender_id) for row in message_rows}
+        self.user_info.update(user_profiles.get_many(db, user_ids))
+        for user_id in user_ids:
+            self.hydrator.mark_loaded(user_id)
+        self._load_summary_rows(select_summaries(db, "private", list(user_ids)))
 
-
-    def get_history_message(self, user_id: int) -> list:
-        result = []
-        for u_msg in self.user_cache[user_id]:
-            result.append(
-                self.format_user_message(
-                    content=u_msg.content, name=str(u_msg.user_id)[:6]
-                )
-            )
-            l_msg: str | None = self.llm_cache.get(u_msg.message_id, None)
-            if l_msg:
-                result.append(self.format_llm_message(l_msg))
-        return result
+    @sql_session
+    async def _fetch_conversation_rows(
+        self, user_id: int, db: AsyncSession | None = None
+    ) -> ConversationRows:
+        rows = await self._select_conversation_rows(db, user_id)
+        return rows._replace(users=await user_profiles.get_many_async(db, [user_id]))
+
+    def _on_conversation_evicted(self, user_id: int, window: ConversationWindow) -> None:
+        super()._on_conversation_evicted(user_id, window)
+        self.user_info.pop(user_id, None)
+        self.user_system_prompt.pop(user_id, None)
+
+    def _load_memory(self, payload: dict) -> None:
+        super()._load_memory(payload)
+        # 快照中已有资料的用户无需再从数据库加载
+        for uid in payload["user_info"]:
+            self.hydrator.mark_loaded(uid)
+
+    def _summary_text(self, u_msg, l_msg: str | None) -> str:
+        text = f"用户: {u_msg.content}"
+        return f"{text}\n你: {l_msg}" if l_msg else text
+
+    def _format_turn(self, u_msg: CachedPrivateMessage, l_msg: str | None) -> list[dict]:
+        turn = [
+            self.format_user_message(content=u_msg.content, name=str(u_msg.user_id)[:6])
+        ]
+        if l_msg:
+            turn.append(self.format_llm_message(l_msg))
+        return turn
 
     def insert_and_update_history_message(
-        self, user_message: PrivateMessageRecord, llm_message: str | None = None
+        self,
+        user_message: PrivateMessageRecord | CachedPrivateMessage,
+        llm_message: str | None = None,
     ) -> None:
-        group_user_cache = self.user_cache[user_message.user_id]
-
-        # 避免重复插入
-        if any(msg.message_id == user_message.message_id for msg in group_user_cache):
+        if isinstance(user_message, PrivateMessageRecord):
+            user_message = CachedPrivateMessage.from_record(user_message)
+        window = self.user_cache[user_message.user_id]
+        if user_message.message_id in window:
+            # 避免重复插入
             return
 
-        if len(group_user_cache) >= self.cache_len:
-            # 记忆长度超出，推出
-            removed_msg = group_user_cache.pop(0)
-            pop_llm_message = self.llm_cache.pop(removed_msg.message_id, "")
+        # 记忆长度超出时，窗口推出最早的消息及其回复，转存到向量库
+        evicted = window.append(
+            user_message, llm_message, self._format_turn(user_message, llm_message)
+        )
+        if evicted is not None:
+            removed_msg, pop_llm_message = evicted
+            self.summarizer.push(
+                removed_msg.user_id,
+                removed_msg.send_ts,
+                removed_msg.message_id,
+                self._summary_text(removed_msg, pop_llm_message),
+            )
             if not is_id_exists(self.chroma_collection,str(removed_msg.message_id)):
                 message_add(
                     collection=self.chroma_collection,
-                    document=f"{removed_msg.send_time}|{str(removed_msg.user_id)[:6]}|{removed_msg.content}\nassistant|{pop_llm_message}",
+                    document=f"{removed_msg.send_time}|{str(removed_msg.user_id)[:6]}|{removed_msg.content}\nassistant|{pop_llm_message or ''}",
                     id=str(removed_msg.message_id),
                     metadata={"user_id": str(removed_msg.user_id)}
                 )
-        group_user_cache.append(user_message)
-
-        # 避免插入空值、避免重复插入
-        if (llm_message is not None) and (user_message.message_id not in self.llm_cache.keys()):
-            self.llm_cache[user_message.message_id] = llm_message
 
         logger.info(
             f"[{self.__model_tag__}]: 短期记忆已更新 USER[{user_message.content}]"
@@ -161,17 +189,37 @@ class LLMPrivateChatter(OpenAIBase):
     async def update_users_info(
             self, user_id: int,api: BotAPI | None = None,
     ) -> None:
+        await self.hydrator.ensure(user_id)
         if user_id not in self.user_info:
-            sender = await QUser.from_private(user_id, api)
-            self.user_info[user_id] = sender
-            self.update_user_system_prompt(user_id)
-            with LocalSessionSync() as db:
-                insert_users(db, sender)
-        elif  int(time.time()) - self.user_info[user_id].update_time >= 60:
-            await QUser.update_private(self.user_info[user_id], api)
+            # 新用户先使用空资料，真实资料由后台刷新后补上
+            self.user_info[user_id] = QUser(user_id=user_id, update_time=0)
+        if user_id not in self.user_system_prompt:
             self.update_user_system_prompt(user_id)
-            with LocalSessionSync() as db:
-                update_users(db, [self.user_info[user_id]])
+        self.profile_refresher.request(user_id, self.user_info[user_id], api)
+
+    async def _fetch_profile(self, user_id: int, api: BotAPI | None) -> QUser | None:
+        current = self.user_info.get(user_id)
+        profile = current.model_copy() if current else QUser(user_id=user_id, update_time=0)
+        last_update = profile.update_time
+        await QUser.update_private(profile, api)
+        # 接口调用失败时资料不会被修改
+        return profile if profile.update_time != last_update else None
+
+    def _on_profile_refreshed(self, profile: QUser) -> None:
+        # 会话已被清出时不再回填内存，下次加载时从数据库读取
+        if profile.user_id not in self.user_info:
+            return
+        self.user_info[profile.user_id] = profile
+        self.update_user_system_prompt(profile.user_id)
+
+    @sql_session
+    async def _persist_profiles(
+        self, users: list[QUser], db: AsyncSession | None = None
+    ) -> None:
+        await update_users_async(db, users)
+
+    async def flush_profile(self) -> None:
+        await self.profile_refresher.close()
 
     def update_user_system_prompt(self, user_id: int) -> None:
         temp_system_prompt = "You are a helpful assistant."
@@ -191,37 +239,6 @@ class LLMPrivateChatter(OpenAIBase):
         )
 
 
-    def reduce_token(chatbot, system, context, myKey):
-        context.append(
-            {
-                "role": "user",
-                "content": "请帮我总结一下上述对话的内容，实现减少tokens的同时，保证对话的质量。在总结中不要加入这一句话。",
-            }
-        )
-
-        response = None  # get_response(system, context, myKey, raw=True)
-
-        statistics = f'本次对话Tokens用量【{response["usage"]["completion_tokens"]+12+12+8} / 4096】'
-        optmz_str = parse_text(
-            f'好的，我们之前聊了:{response["choices"][0]["message"]["content"]}\n\n================\n\n{statistics}'
-        )
-        chatbot.append(
-            (
-                "请帮我总结一下上述对话的内容，实现减少tokens的同时，保证对话的质量。",
-                optmz_str,
-            )
-        )
-
-        context = []
-        context.append({"role": "user", "content": "我们之前聊了什么?"})
-        context.append(
-            {
-                "role": "assistant",
-                "content": f'我们之前聊了：{response["choices"][0]["message"]["content"]}',
-            }
-        )
-        return chatbot, context
-
     def standardize_llm_messages(self, content: str) -> list[dict]:
         def _extract_meme(temp_content: str) -> tuple[list,str]:
             # 提取所有 [] 里的内容（不含括号本身）
@@ -243,6 +260,7 @@ class LLMPrivateChatter(OpenAIBase):
     async def run(self, message: PrivateMessageRecord, **kwargs) -> str | dict | None:
         user_id = message.user_id
         user_message = message.content
+        await self.hydrator.ensure(user_id)
 
         history: list = self.get_history_message(user_id)
 
@@ -261,6 +279,8 @@ class LLMPrivateChatter(OpenAIBase):
                 name=str(message.user_id)[:6],
             )
         )
+        kwargs.setdefault("priority", Priority.PRIVATE)
+        kwargs.setdefault("schedule_key", f"private:{user_id}")
         if settings.MCP_ACTIVATE:
             llm_message = await self._async_tool_inference(user_id=user_id,content=history, custom_system_prompt=self.user_system_prompt.get(user_id,None), **kwargs)
         else:
@@ -0,0 +1,273 @@
+import asyncio
+import json
+import os
+from abc import ABC, abstractmethod
+from collections.abc import Callable, Hashable
+from datetime import datetime
+from typing import Any, NamedTuple
+
+from openai.types.chat import ChatCompletionSystemMessageParam
+from qq_bot.conn.sql.crud.summary_crud import select_summaries_async, upsert_summary_async
+from qq_bot.conn.sql.write_behind import WriteBehindQueue
+from qq_bot.core.llm_manager.memory.history import HistoryUsage
+from qq_bot.core.llm_manager.memory.hydration import ConversationHydrator
+from qq_bot.core.llm_manager.memory.snapshot import read_snapshot, write_snapshot
+from qq_bot.core.llm_manager.memory.store import ConversationStore
+from qq_bot.core.llm_manager.memory.summary import (
+    DEFAULT_SUMMARY_PROMPT,
+    ConversationSummarizer,
+)
+from qq_bot.core.llm_manager.memory.tokenizer import estimate_message_tokens
+from qq_bot.core.llm_manager.memory.window import ConversationWindow
+from qq_bot.utils.config import settings
+from qq_bot.utils.decorator import sql_session
+from qq_bot.utils.logging import logger
+from qq_bot.utils.models import QUser
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+
+class ConversationRows(NamedTuple):
+    """懒加载一个会话时从数据库读取的数据"""
+
+    messages: list
+    summaries: list
+    users: dict[int, QUser]
+
+
+class ChatterMemoryMixin(ABC):
+    """聊天模型短期记忆的公共实现（群聊与私聊共用）
+
+    包括按会话的历史消息窗口、懒加载、滚动摘要、快照保存与恢复以及空闲会话清出。
+    与 OpenAIBase 一同继承，子类需提供以下类属性与方法：
+
+    - memory_scope: 会话类型（"group" / "private"），对应摘要表的 scope
+    - message_cls: 窗口中缓存的消息类型（实现 from_row / from_tuple / to_tuple）
+    - conversation_field: 读取最近消息时按会话过滤的字段名
+    - fetch_recent_messages_async / fetch_max_message_id / fetch_max_message_id_async: 消息表的 CRUD 函数
+    - message_writer: 该类消息的写回队列，加载会话前先写入队列中的消息
+    - _format_turn / insert_and_update_history_message（抽象方法，未实现时无法实例化）
+    """
+
+    memory_scope: str
+    message_cls: type
+    conversation_field: str
+    fetch_recent_messages_async: Callable
+    fetch_max_message_id: Callable
+    fetch_max_message_id_async: Callable
+    message_writer: WriteBehindQueue
+
+    def _init_memory(self, window_size: int) -> None:
+        self.cache_len = window_size
+        # 会话id 对应的历史消息窗口（用户消息及其模型回复）
+        self.user_cache = ConversationStore(
+            window_size=self.cache_len,
+            max_turns=settings.CHATTER_MEMORY_MAX_TURNS,
+            max_bytes=settings.CHATTER_MEMORY_MAX_BYTES,
+            idle_ttl=settings.CHATTER_MEMORY_IDLE_TTL,
+            on_evict=self._on_conversation_evicted,
+            name=self.__model_tag__,
+        )
+        # 用户id 对应的用户信息与个性化系统prompt
+        self.user_info: dict[int, QUser] = {}
+        self.user_system_prompt: dict[int, ChatCompletionSystemMessageParam] = {}
+        # 历史消息的 token 预算（为空时不限制），以及各会话最近一次组装历史的用量
+        self.history_token_budget: int | None = self.configs.get("history_token_budget")
+        self.history_usage: dict[int, HistoryUsage] = {}
+        # 懒加载模式下，会话的短期记忆在该会话第一条消息到达时才从数据库拉取
+        self.lazy_load: bool = self.configs.get("lazy_load", False)
+        self.hydrator = ConversationHydrator(
+            self._hydrate_conversation, name=self.__model_tag__
+        )
+        # 窗口推出的对话由（较便宜的）模型在后台滚动压缩为摘要，置于历史消息开头
+        summary_conf: dict = self.configs.get("summary") or {}
+        self.summary_model: str | None = summary_conf.get("model") or None
+        self.summary_max_tokens: int = summary_conf.get("max_tokens", 300)
+        self.summary_prompt: str = summary_conf.get("prompt") or DEFAULT_SUMMARY_PROMPT
+        self.summarizer = ConversationSummarizer(
+            summarize=self._summarize_turns,
+            persist=self._persist_summary,
+            trigger_turns=(
+                summary_conf.get("trigger_turns", 4)
+                if summary_conf.get("activate", False)
+                else 0
+            ),
+            name=self.__model_tag__,
+        )
+        self.snapshot_path = os.path.join(
+            settings.CHATTER_SNAPSHOT_ROOT, f"{self.__model_tag__}.snapshot"
+        )
+
+    async def _select_conversation_rows(
+        self, db: AsyncSession, key: Hashable
+    ) -> ConversationRows:
+        message_rows = await self.fetch_recent_messages_async(
+            db, self.cache_len, **{self.conversation_field: key}
+        )
+        summary_rows = await select_summaries_async(db, self.memory_scope, [key])
+        return ConversationRows(message_rows, summary_rows, {})
+
+    @sql_session
+    async def _fetch_conversation_rows(
+        self, key: Hashable, db: AsyncSession | None = None
+    ) -> ConversationRows:
+        return await self._select_conversation_rows(db, key)
+
+    async def _hydrate_conversation(self, key: Hashable) -> None:
+        # 会话被清出时可能仍有消息在写回队列中，先写入数据库，避免重新加载的历史缺少最近几轮
+        await self.message_writer.flush()
+        rows = await self._fetch_conversation_rows(key)
+        self._load_summary_rows(rows.summaries)
+        # 加载期间可能已有新消息写入窗口，需排在数据库历史之后
+        existing = self.user_cache.pop(key)
+        for row in rows.messages:
+            self.insert_and_update_history_message(
+                user_message=self.message_cls.from_row(row),
+                llm_message=row.reply_message,
+            )
+        for u_msg, l_msg in existing or ():
+            self.insert_and_update_history_message(u_msg, l_msg)
+        for uid, user in rows.users.items():
+            self.user_info.setdefault(uid, user)
+
+    def _on_conversation_evicted(self, key: Hashable, window: ConversationWindow) -> None:  # noqa: ARG002
+        # 消息在回复后已落库，清出后下次访问时由 hydrator 重新从数据库加载
+        self.hydrator.forget(key)
+        self.summarizer.forget(key)
+        self.history_usage.pop(key, None)
+
+    def sweep_memory(self) -> dict[str, int]:
+        """清出空闲及超出容量的会话，返回当前缓存占用"""
+        self.user_cache.sweep()
+        footprint = self.user_cache.footprint()
+        logger.info(
+            f"[{self.__model_tag__}]: 短期记忆占用 会话{footprint['conversations']}个 / "
+            f"{footprint['turns']}轮 / 约{footprint['bytes'] / 1024 / 1024:.1f}MB"
+        )
+        return footprint
+
+    def _dump_memory(self) -> dict:
+        return {
+            "user_cache": {
+                key: [(*m.to_tuple(), reply) for m, reply in window]
+                for key, window in self.user_cache.items()
+            },
+            "user_info": {uid: u.model_dump() for uid, u in self.user_info.items()},
+            "summaries": self.summarizer.dump(),
+        }
+
+    def _load_memory(self, payload: dict) -> None:
+        for conversation_id, (summary, covered_until, *covered_ids) in payload.get(
+            "summaries", {}
+        ).items():
+            # 旧版快照只记录了覆盖到的时间戳
+            self.summarizer.load(
+                conversation_id,
+                summary,
+                covered_until,
+                covered_ids[0] if covered_ids else (),
+            )
+        for key, messages in payload["user_cache"].items():
+            window = self.user_cache[key]
+            for *fields, reply in messages:
+                record = self.message_cls.from_tuple(fields)
+                window.append(record, reply, self._format_turn(record, reply))
+            self.hydrator.mark_loaded(key)
+        for uid, data in payload["user_info"].items():
+            self.user_info[uid] = QUser.model_construct(**data)
+
+    @sql_session
+    def _restore_snapshot(self, db: Session | None = None) -> bool:
+        payload = read_snapshot(
+            self.snapshot_path,
+            max_age=settings.CHATTER_SNAPSHOT_MAX_AGE,
+            watermark=self.fetch_max_message_id(db),
+        )
+        if payload is None:
+            return False
+        self._load_memory(payload)
+        logger.info(f"[{self.__model_tag__}]: 已从快照恢复{len(self.user_cache)}个会话")
+        return True
+
+    @sql_session
+    async def _fetch_watermark(self, db: AsyncSession | None = None) -> int | None:
+        return await self.fetch_max_message_id_async(db)
+
+    async def save_snapshot(self) -> None:
+        # 先读水位线再导出记忆，保证快照不会漏掉水位线之前的消息
+        watermark = await self._fetch_watermark()
+        payload = self._dump_memory()
+        await asyncio.to_thread(write_snapshot, self.snapshot_path, payload, watermark)
+        logger.info(f"[{self.__model_tag__}]: 短期记忆快照已保存 -> {self.snapshot_path}")
+
+    def _load_summary_rows(self, rows: list) -> None:
+        for row in rows:
+            self.summarizer.load(
+                int(row.conversation_id),
+                row.summary,
+                int(row.covered_until.timestamp()),
+                json.loads(row.covered_message_ids or "[]"),
+            )
+
+    async def _summarize_turns(
+        self, summary: str | None, dialogue: list[str]
+    ) -> str | None:
+        content = self._set_prompt(
+            input={"summary": summary or "无", "dialogue": "\n".join(dialogue)},
+            prompt=self.summary_prompt,
+        )
+        return await self._async_summarize(
+            content, model=self.summary_model, max_tokens=self.summary_max_tokens
+        )
+
+    @sql_session
+    async def _persist_summary(
+        self,
+        key: Hashable,
+        summary: str,
+        covered_until: int,
+        covered_ids: list[int],
+        db: AsyncSession | None = None,
+    ) -> None:
+        await upsert_summary_async(
+            db,
+            self.memory_scope,
+            key,
+            summary,
+            datetime.fromtimestamp(covered_until),
+            covered_ids,
+        )
+
+    async def flush_summary(self) -> None:
+        await self.summarizer.flush()
+
+    def get_history_message(self, key: Hashable) -> list:
+        # 窗口内已增量维护格式化后的消息，从最新的一轮开始按 token 预算向前截取
+        budget = self.history_token_budget
+        summary_message = None
+        if summary := self.summarizer.get(key):
+            summary_message = ChatCompletionSystemMessageParam(
+                content=f"此前对话的摘要：{summary}", role="system"
+            )
+            # 摘要占用的 token 从历史预算中扣除
+            if budget:
+                budget = max(budget - estimate_message_tokens(summary_message), 1)
+        usage = self.user_cache[key].prompt_history(budget)
+        self.history_usage[key] = usage
+        logger.debug(
+            f"[{self.__model_tag__}]: 会话[{key}]历史消息 {usage.turns}轮 / "
+            f"{usage.tokens} tokens（舍弃{usage.dropped_turns}轮）"
+        )
+        if summary_message is not None:
+            usage.messages.insert(0, summary_message)
+        return usage.messages
+
+    @abstractmethod
+    def _format_turn(self, u_msg: Any, l_msg: str | None) -> list[dict]:
+        """将一轮对话（用户消息及模型回复）格式化为提示词消息"""
+
+    @abstractmethod
+    def insert_and_update_history_message(
+        self, user_message: Any, llm_message: str | None = None
+    ) -> None:
+        """将一轮对话写入短期记忆"""
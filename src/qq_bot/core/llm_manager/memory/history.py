@@ -0,0 +1,8 @@
+from typing import NamedTuple
+
+
+class HistoryUsage(NamedTuple):
+    messages: list[dict]
+    tokens: int  # 历史消息估算的 token 数
+    turns: int  # 纳入 prompt 的对话轮数
+    dropped_turns: int  # 因超出预算被舍弃的较早轮数
@@ -0,0 +1,54 @@
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+
+from qq_bot.utils.logging import logger
+
+
+class ConversationHydrator:
+    """会话短期记忆的按需加载器
+
+    每个会话（群号 / 用户id）首次被访问时调用 loader 从数据库拉取最近的消息窗口，
+    同一会话并发到达的首条消息共享同一次加载，加载失败时下一次访问会重试。
+
+    Args:
+        loader (Callable[[Hashable], Awaitable[None]]): 加载单个会话的协程函数
+        name (str, optional): 日志中显示的名称. Defaults to "".
+    """
+
+    def __init__(
+        self, loader: Callable[[Hashable], Awaitable[None]], name: str = ""
+    ) -> None:
+        self._loader = loader
+        self._name = name
+        self._loaded: set[Hashable] = set()
+        self._inflight: dict[Hashable, asyncio.Task] = {}
+
+    def is_loaded(self, key: Hashable) -> bool:
+        return key in self._loaded
+
+    def mark_loaded(self, key: Hashable) -> None:
+        self._loaded.add(key)
+
+    def forget(self, key: Hashable) -> None:
+        """会话被清出内存后调用，下次访问时重新加载"""
+        self._loaded.discard(key)
+
+    async def ensure(self, key: Hashable) -> None:
+        if key in self._loaded:
+            return
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._load(key))
+            self._inflight[key] = task
+        # shield: 某个等待者被取消时不影响其他等待同一次加载的消息
+        await asyncio.shield(task)
+
+    async def _load(self, key: Hashable) -> None:
+        try:
+            await self._loader(key)
+            self._loaded.add(key)
+            logger.info(f"[{self._name}]: 会话[{key}]短期记忆已加载")
+        except Exception as err:
+            logger.error(f"[{self._name}]: 会话[{key}]短期记忆加载失败: {err}")
+        finally:
+            self._inflight.pop(key, None)
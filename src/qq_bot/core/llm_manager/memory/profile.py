@@ -0,0 +1,130 @@
+import asyncio
+import contextlib
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from cachetools import TTLCache
+from qq_bot.conn.sql.write_behind import WriteBehindQueue
+from qq_bot.utils.logging import logger
+from qq_bot.utils.models import QUser
+from qq_bot.utils.rate_limit import TokenBucket
+
+
+class ProfileRefresher:
+    """用户资料后台刷新
+
+    消息处理时只登记刷新请求，不等待 OneBot 接口与数据库，刷新在后台任务中完成：
+    同一用户在排队期间的多次请求合并为一次；距上次刷新（或上次尝试）不足 interval 秒的请求直接忽略；
+    接口调用经令牌桶限流；刷新成功的资料经写回队列批量落库。
+
+    Args:
+        fetch (Callable[[int, Any], Awaitable[QUser | None]]): 拉取用户最新资料（用户id, api），失败时返回 None
+        persist (Callable[[list[QUser]], Awaitable[None]]): 批量写入用户资料
+        on_refreshed (Callable[[QUser], None] | None, optional): 刷新成功后的回调（更新内存中的资料）. Defaults to None.
+        interval (int, optional): 资料的有效期（秒）. Defaults to 600.
+        rate (float, optional): 每秒最多调用接口的次数. Defaults to 2.
+        burst (int, optional): 接口调用允许的突发次数. Defaults to 5.
+        batch_size (int, optional): 每批最多写入的条数. Defaults to 100.
+        flush_interval (float, optional): 一批数据最长等待时间（秒）. Defaults to 1.0.
+        name (str, optional): 日志中显示的名称. Defaults to "".
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[int, Any], Awaitable[QUser | None]],
+        persist: Callable[[list[QUser]], Awaitable[None]],
+        on_refreshed: Callable[[QUser], None] | None = None,
+        interval: int = 600,
+        rate: float = 2,
+        burst: int = 5,
+        batch_size: int = 100,
+        flush_interval: float = 1.0,
+        name: str = "",
+    ) -> None:
+        self._fetch = fetch
+        self._on_refreshed = on_refreshed
+        self.interval = interval
+        self._name = name
+        self._bucket = TokenBucket(rate=rate, capacity=burst)
+        self._writer: WriteBehindQueue[QUser] = WriteBehindQueue(
+            writer=persist,
+            batch_size=batch_size,
+            flush_interval=flush_interval,
+            name=f"{name}.profile",
+        )
+        # 排队中的用户及其最近一次请求携带的 api，dict 保证按请求顺序刷新
+        self._pending: dict[int, Any] = {}
+        # 最近尝试过刷新的用户（无论成败），有效期内不再重复请求接口
+        self._attempted: TTLCache[int, bool] = TTLCache(maxsize=1024 * 10, ttl=interval)
+        self._wakeup: asyncio.Event | None = None
+        self._worker: asyncio.Task | None = None
+
+    def is_stale(self, profile: QUser | None) -> bool:
+        return (
+            profile is None
+            or int(time.time()) - (profile.update_time or 0) >= self.interval
+        )
+
+    def request(self, user_id: int, profile: QUser | None, api: Any = None) -> bool:
+        """登记一次刷新请求（不阻塞），资料仍在有效期内、已在排队或近期已尝试时忽略
+
+        Args:
+            user_id (int): 用户id
+            profile (QUser | None): 当前缓存的资料
+            api (Any, optional): 调用接口使用的 BotAPI. Defaults to None.
+
+        Returns:
+            bool: 是否加入了刷新队列
+        """
+        if not self.is_stale(profile) or user_id in self._attempted:
+            return False
+        if user_id in self._pending:
+            self._pending[user_id] = api or self._pending[user_id]
+            return False
+        self._pending[user_id] = api
+        self._ensure_worker()
+        self._wakeup.set()
+        return True
+
+    def _ensure_worker(self) -> None:
+        if self._worker is None or self._worker.done():
+            self._wakeup = self._wakeup or asyncio.Event()
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            if not self._pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            await self._bucket.acquire()
+            user_id = next(iter(self._pending))
+            api = self._pending.pop(user_id)
+            self._attempted[user_id] = True
+            await self._refresh(user_id, api)
+
+    async def _refresh(self, user_id: int, api: Any) -> None:
+        try:
+            profile = await self._fetch(user_id, api)
+        except Exception as err:
+            logger.warning(f"{err}. [{self._name}]: 用户[{user_id}]资料刷新失败")
+            return
+        if profile is None:
+            return
+        if self._on_refreshed is not None:
+            self._on_refreshed(profile)
+        self._writer.put(profile)
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    async def close(self) -> None:
+        """停止刷新（丢弃仍在排队的请求），并写入已刷新但未落库的资料（退出前调用）"""
+        if self._worker is not None and not self._worker.done():
+            self._worker.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._worker
+        self._worker = None
+        self._pending.clear()
+        await self._writer.close()
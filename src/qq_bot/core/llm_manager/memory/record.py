@@ -0,0 +1,166 @@
+from datetime import datetime
+from typing import Any
+
+from qq_bot.utils.models import GroupMessageRecord, PrivateMessageRecord
+from qq_bot.utils.util_text import time_trans_int, time_trans_str
+
+
+def _optional_int(value: Any) -> int | None:
+    return None if value is None else int(value)
+
+
+def _to_timestamp(value: Any) -> int:
+    # 数据库行为 datetime，pydantic 记录为 "%Y-%m-%d %H:%M:%S" 字符串
+    if isinstance(value, datetime):
+        return int(value.timestamp())
+    if isinstance(value, str):
+        return time_trans_int(value)
+    return int(value)
+
+
+class CachedGroupMessage:
+    """短期记忆中缓存的群聊消息
+
+    使用 __slots__ 并以整数时间戳保存发送时间，相比 GroupMessageRecord 省去了
+    pydantic 的实例字典与校验开销。仅在与外部接口交互时转换为 GroupMessageRecord。
+    """
+
+    __slots__ = (
+        "message_id",
+        "content",
+        "group_id",
+        "sender_id",
+        "at_user_id",
+        "from_bot",
+        "send_ts",
+    )
+
+    def __init__(
+        self,
+        message_id: int,
+        content: str,
+        group_id: int,
+        sender_id: int,
+        at_user_id: int | None,
+        from_bot: bool,
+        send_ts: int,
+    ) -> None:
+        self.message_id = message_id
+        self.content = content
+        self.group_id = group_id
+        self.sender_id = sender_id
+        self.at_user_id = at_user_id
+        self.from_bot = from_bot
+        self.send_ts = send_ts
+
+    @property
+    def send_time(self) -> str:
+        return time_trans_str(self.send_ts)
+
+    def get_datetime(self) -> datetime:
+        return datetime.fromtimestamp(self.send_ts)
+
+    @classmethod
+    def from_row(cls, row: Any) -> "CachedGroupMessage":
+        """由数据库行直接构造（数据已由表结构约束，不再校验）"""
+        return cls(
+            int(row.message_id),
+            row.message,
+            int(row.group_id),
+            int(row.sender_id),
+            _optional_int(row.at_user_id),
+            bool(row.from_bot),
+            _to_timestamp(row.send_time),
+        )
+
+    @classmethod
+    def from_record(cls, record: GroupMessageRecord) -> "CachedGroupMessage":
+        return cls(
+            record.message_id,
+            record.content,
+            record.group_id,
+            record.sender_id,
+            record.at_user_id,
+            record.from_bot,
+            _to_timestamp(record.send_time),
+        )
+
+    def to_tuple(self) -> tuple:
+        return (
+            self.message_id,
+            self.content,
+            self.group_id,
+            self.sender_id,
+            self.at_user_id,
+            self.from_bot,
+            self.send_ts,
+        )
+
+    @classmethod
+    def from_tuple(cls, data: tuple) -> "CachedGroupMessage":
+        message_id, content, group_id, sender_id, at_user_id, from_bot, send_ts = data
+        return cls(
+            message_id,
+            content,
+            group_id,
+            sender_id,
+            at_user_id,
+            from_bot,
+            send_ts,
+        )
+
+
+class CachedPrivateMessage:
+    """短期记忆中缓存的私聊消息，字段与 PrivateMessageRecord 一致，发送时间为整数时间戳"""
+
+    __slots__ = ("message_id", "user_id", "content", "from_bot", "send_ts")
+
+    def __init__(
+        self,
+        message_id: int,
+        user_id: int,
+        content: str,
+        from_bot: bool,
+        send_ts: int,
+    ) -> None:
+        self.message_id = message_id
+        self.user_id = user_id
+        self.content = content
+        self.from_bot = from_bot
+        self.send_ts = send_ts
+
+    @property
+    def send_time(self) -> str:
+        return time_trans_str(self.send_ts)
+
+    def get_datetime(self) -> datetime:
+        return datetime.fromtimestamp(self.send_ts)
+
+    @classmethod
+    def from_row(cls, row: Any) -> "CachedPrivateMessage":
+        """由数据库行直接构造（数据已由表结构约束，不再校验）"""
+        return cls(
+            int(row.message_id),
+            int(row.sender_id),
+            row.message,
+            bool(row.from_bot),
+            _to_timestamp(row.send_time),
+        )
+
+    @classmethod
+    def from_record(cls, record: PrivateMessageRecord) -> "CachedPrivateMessage":
+        return cls(
+            record.message_id,
+            record.user_id,
+            record.content,
+            record.from_bot,
+            _to_timestamp(record.send_time),
+        )
+
+    def to_tuple(self) -> tuple:
+        return (self.message_id, self.user_id, self.content, self.from_bot, self.send_ts)
+
+    @classmethod
+    def from_tuple(cls, data: tuple) -> "CachedPrivateMessage":
+        message_id, user_id, content, from_bot, send_ts = data
+        return cls(message_id, user_id, content, from_bot, send_ts)
@@ -0,0 +1,71 @@
+import mmap
+import os
+import pickle
+import time
+from pathlib import Path
+from typing import Any
+
+from qq_bot.utils.logging import logger
+
+SNAPSHOT_VERSION = 3
+
+
+def write_snapshot(path: str, payload: dict[str, Any], watermark: int | None) -> None:
+    """将短期记忆写入二进制快照（先写临时文件再原子替换）
+
+    Args:
+        path (str): 快照文件路径
+        payload (dict[str, Any]): 仅包含内置类型的记忆数据
+        watermark (int | None): 快照时消息表的最大主键，用于判断快照是否过期
+    """
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    data = {
+        "version": SNAPSHOT_VERSION,
+        "created_at": int(time.time()),
+        "watermark": watermark,
+        "payload": payload,
+    }
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+    Path(tmp_path).replace(path)
+
+
+def read_snapshot(
+    path: str, max_age: int, watermark: int | None
+) -> dict[str, Any] | None:
+    """通过内存映射读取快照，快照不存在或已过期时返回 None
+
+    Args:
+        path (str): 快照文件路径
+        max_age (int): 快照最长有效期（秒）
+        watermark (int | None): 当前消息表的最大主键，与快照记录不一致时视为过期
+
+    Returns:
+        dict[str, Any] | None: 快照中的记忆数据
+    """
+    if not os.path.isfile(path):
+        return None
+
+    try:
+        with (
+            open(path, "rb") as f,
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm,
+        ):
+            data = pickle.loads(mm)
+    except Exception as err:
+        logger.warning(f"快照读取失败，回退到数据库加载: {path} -> {err}")
+        return None
+
+    if data.get("version") != SNAPSHOT_VERSION:
+        logger.info(f"快照版本不一致，回退到数据库加载: {path}")
+        return None
+    if int(time.time()) - data.get("created_at", 0) > max_age:
+        logger.info(f"快照已超过有效期，回退到数据库加载: {path}")
+        return None
+    if data.get("watermark") != watermark:
+        logger.info(
+            f"快照之后存在新消息[{data.get('watermark')} -> {watermark}]，回退到数据库加载: {path}"
+        )
+        return None
+    return data["payload"]
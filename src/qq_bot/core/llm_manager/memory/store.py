@@ -0,0 +1,119 @@
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable, ItemsView, Iterator
+
+from qq_bot.core.llm_manager.memory.window import ConversationWindow
+from qq_bot.utils.logging import logger
+
+
+class ConversationStore:
+    """按会话管理消息窗口，支持 LRU / 空闲过期清出与全局容量上限
+
+    会话按最近访问顺序排列，sweep 时先清出空闲超过 idle_ttl 的会话，
+    再按 LRU 顺序清出会话直到总轮数与估算内存都回到上限以内。
+    消息在回复后已写入数据库，被清出的会话下次访问时重新从数据库加载。
+
+    Args:
+        window_size (int): 每个会话窗口的长度
+        max_turns (int, optional): 所有会话合计保留的对话轮数上限，0 表示不限制. Defaults to 0.
+        max_bytes (int, optional): 所有会话合计估算内存上限（字节），0 表示不限制. Defaults to 0.
+        idle_ttl (int, optional): 会话空闲多久（秒）后被清出，0 表示不过期. Defaults to 0.
+        on_evict (Callable[[Hashable, ConversationWindow], None] | None, optional): 会话被清出时的回调. Defaults to None.
+        name (str, optional): 日志中显示的名称. Defaults to "".
+    """
+
+    def __init__(
+        self,
+        window_size: int,
+        max_turns: int = 0,
+        max_bytes: int = 0,
+        idle_ttl: int = 0,
+        on_evict: Callable[[Hashable, ConversationWindow], None] | None = None,
+        name: str = "",
+    ) -> None:
+        self.window_size = window_size
+        self.max_turns = max_turns
+        self.max_bytes = max_bytes
+        self.idle_ttl = idle_ttl
+        self._on_evict = on_evict
+        self._name = name
+        self._windows: OrderedDict[Hashable, ConversationWindow] = OrderedDict()
+        self._last_access: dict[Hashable, float] = {}
+
+    def __getitem__(self, key: Hashable) -> ConversationWindow:
+        """获取（不存在时创建）会话窗口，并标记为最近访问"""
+        window = self._windows.get(key)
+        if window is None:
+            window = ConversationWindow(self.window_size)
+            self._windows[key] = window
+        else:
+            self._windows.move_to_end(key)
+        self._last_access[key] = time.monotonic()
+        return window
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._windows
+
+    def __len__(self) -> int:
+        return len(self._windows)
+
+    def __iter__(self) -> Iterator[Hashable]:
+        return iter(self._windows)
+
+    def items(self) -> ItemsView[Hashable, ConversationWindow]:
+        return self._windows.items()
+
+    def get(self, key: Hashable) -> ConversationWindow | None:
+        """获取会话窗口，不创建也不更新访问时间"""
+        return self._windows.get(key)
+
+    def pop(self, key: Hashable) -> ConversationWindow | None:
+        """直接移除会话窗口（不触发清出回调）"""
+        self._last_access.pop(key, None)
+        return self._windows.pop(key, None)
+
+    def evict(self, key: Hashable) -> None:
+        window = self.pop(key)
+        if window is not None and self._on_evict is not None:
+            self._on_evict(key, window)
+
+    def sweep(self) -> list[Hashable]:
+        """清出空闲会话以及超出容量上限的最久未访问会话
+
+        Returns:
+            list[Hashable]: 被清出的会话
+        """
+        evicted: list[Hashable] = []
+
+        if self.idle_ttl > 0:
+            deadline = time.monotonic() - self.idle_ttl
+            # OrderedDict 按访问顺序排列，遇到第一个未过期的会话即可停止
+            for key in list(self._windows):
+                if self._last_access.get(key, 0) > deadline:
+                    break
+                self.evict(key)
+                evicted.append(key)
+
+        footprint = self.footprint()
+        turns, size = footprint["turns"], footprint["bytes"]
+        while len(self._windows) > 1 and (
+            (self.max_turns > 0 and turns > self.max_turns)
+            or (self.max_bytes > 0 and size > self.max_bytes)
+        ):
+            key, window = next(iter(self._windows.items()))
+            turns -= len(window)
+            size -= window.approx_bytes
+            self.evict(key)
+            evicted.append(key)
+
+        if evicted:
+            logger.info(f"[{self._name}]: 已清出{len(evicted)}个会话的短期记忆")
+        return evicted
+
+    def footprint(self) -> dict[str, int]:
+        """当前缓存占用：会话数、对话轮数、估算内存字节数"""
+        return {
+            "conversations": len(self._windows),
+            "turns": sum(len(w) for w in self._windows.values()),
+            "bytes": sum(w.approx_bytes for w in self._windows.values()),
+        }
@@ -0,0 +1,155 @@
+import asyncio
+from collections import defaultdict
+from collections.abc import Awaitable, Callable, Hashable, Iterable
+
+from qq_bot.utils.logging import logger
+
+DEFAULT_SUMMARY_PROMPT = """请将以下对话压缩为一段简洁的摘要，保留人物、事件、偏好与未完成的约定，不超过200字。
+已有摘要：
+${summary}
+新增对话：
+${dialogue}
+只输出摘要内容。"""
+
+
+class ConversationSummarizer:
+    """会话滚动摘要
+
+    窗口推出的对话轮先进入待摘要队列，累计 trigger_turns 轮后在后台任务中
+    将「已有摘要 + 新推出的对话」压缩为新的摘要并落库。
+    同一会话同时只运行一个摘要任务，摘要失败时保留待摘要内容，等待下次触发重试。
+    摘要的覆盖范围记录为最后一轮的发送时间戳及该秒内已覆盖的消息 id，
+    时间戳只精确到秒，同一秒内尚未摘要的对话不会因此被跳过。
+
+    Args:
+        summarize (Callable[[str | None, list[str]], Awaitable[str | None]]): 由已有摘要与新增对话生成摘要
+        persist (Callable[[Hashable, str, int, list[int]], Awaitable[None]]): 持久化摘要（会话, 摘要, 已覆盖到的发送时间戳, 该秒内已覆盖的消息id）
+        trigger_turns (int, optional): 累计多少轮被推出的对话后触发摘要，0 表示不启用. Defaults to 4.
+        name (str, optional): 日志中显示的名称. Defaults to "".
+    """
+
+    def __init__(
+        self,
+        summarize: Callable[[str | None, list[str]], Awaitable[str | None]],
+        persist: Callable[[Hashable, str, int, list[int]], Awaitable[None]],
+        trigger_turns: int = 4,
+        name: str = "",
+    ) -> None:
+        self._summarize = summarize
+        self._persist = persist
+        self.trigger_turns = trigger_turns
+        self._name = name
+        self._summaries: dict[Hashable, str] = {}
+        # 已覆盖到的 (发送时间戳, 该秒内已覆盖的消息id)
+        self._covered: dict[Hashable, tuple[int, frozenset[int]]] = {}
+        # 待摘要的 (发送时间戳, 消息id, 对话文本)
+        self._pending: dict[Hashable, list[tuple[int, int, str]]] = defaultdict(list)
+        self._tasks: dict[Hashable, asyncio.Task] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.trigger_turns > 0
+
+    def get(self, key: Hashable) -> str | None:
+        return self._summaries.get(key)
+
+    def load(
+        self,
+        key: Hashable,
+        summary: str,
+        covered_until: int,
+        covered_ids: Iterable[int] = (),
+    ) -> None:
+        """从数据库或快照恢复会话摘要"""
+        self._summaries[key] = summary
+        self._covered[key] = (covered_until, frozenset(int(i) for i in covered_ids))
+
+    def dump(self) -> dict[Hashable, tuple[str, int, list[int]]]:
+        dumped = {}
+        for key, summary in self._summaries.items():
+            covered_until, covered_ids = self._covered.get(key, (0, frozenset()))
+            dumped[key] = (summary, covered_until, sorted(covered_ids))
+        return dumped
+
+    def forget(self, key: Hashable) -> None:
+        """丢弃会话的内存状态并取消进行中的摘要任务（摘要已落库，重新加载会话时一并恢复）"""
+        task = self._tasks.pop(key, None)
+        if task is not None:
+            task.cancel()
+        self._summaries.pop(key, None)
+        self._covered.pop(key, None)
+        self._pending.pop(key, None)
+
+    def is_covered(self, key: Hashable, send_ts: int, message_id: int) -> bool:
+        """对话是否已被摘要覆盖"""
+        covered_until, covered_ids = self._covered.get(key, (0, frozenset()))
+        return send_ts < covered_until or (
+            send_ts == covered_until and message_id in covered_ids
+        )
+
+    def push(self, key: Hashable, send_ts: int, message_id: int, text: str) -> None:
+        """加入一轮被窗口推出的对话，已被摘要覆盖的对话会被忽略"""
+        if not self.enabled or self.is_covered(key, send_ts, message_id):
+            return
+        pending = self._pending[key]
+        pending.append((send_ts, message_id, text))
+        if len(pending) >= self.trigger_turns:
+            self._schedule(key)
+
+    def _schedule(self, key: Hashable) -> None:
+        if key in self._tasks:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # 启动阶段没有事件循环，等待下一次推出时再触发
+            return
+        task = loop.create_task(self._compact(key))
+        self._tasks[key] = task
+        task.add_done_callback(lambda t: self._discard_task(key, t))
+
+    def _discard_task(self, key: Hashable, task: asyncio.Task) -> None:
+        # 任务被 forget 取消后可能已有新任务接替，只移除自己
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+
+    async def _compact(self, key: Hashable, force: bool = False) -> None:
+        while (pending := self._pending.get(key)) and (
+            force or len(pending) >= self.trigger_turns
+        ):
+            batch = pending[:]
+            try:
+                summary = await self._summarize(
+                    self._summaries.get(key), [text for _, _, text in batch]
+                )
+            except Exception as err:
+                logger.error(f"{err}. [{self._name}]: 会话[{key}]摘要生成失败")
+                summary = None
+            if not summary:
+                return
+            if self._pending.get(key) is not pending:
+                # 摘要期间会话已被清出（或清出后重新加载），结果作废
+                return
+
+            covered_until, covered_ids = self._covered.get(key, (0, frozenset()))
+            for send_ts, message_id, _ in batch:
+                if send_ts > covered_until:
+                    covered_until, covered_ids = send_ts, frozenset((message_id,))
+                elif send_ts == covered_until:
+                    covered_ids = covered_ids | {message_id}
+            self._summaries[key] = summary
+            self._covered[key] = (covered_until, covered_ids)
+            # 摘要期间可能有新的对话加入，只移除本次已摘要的部分
+            del pending[: len(batch)]
+            try:
+                await self._persist(key, summary, covered_until, sorted(covered_ids))
+            except Exception as err:
+                logger.error(f"{err}. [{self._name}]: 会话[{key}]摘要保存失败")
+            logger.info(f"[{self._name}]: 会话[{key}]已压缩{len(batch)}轮对话到摘要")
+
+    async def flush(self) -> None:
+        """等待进行中的摘要任务，并将剩余的待摘要对话全部压缩（退出前调用）"""
+        if self._tasks:
+            await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        for key in list(self._pending):
+            await self._compact(key, force=True)
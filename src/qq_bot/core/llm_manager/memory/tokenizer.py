@@ -0,0 +1,32 @@
+import math
+import re
+from typing import Any
+
+# 中日韩文字及全角标点，在常见 BPE 词表中大多一字一 token
+_CJK_PATTERN = re.compile(r"[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uff00-\uffef]")
+# 其他字符（英文、数字、半角符号）平均约 4 个字符一个 token
+_CHARS_PER_TOKEN = 4
+# 每条 chat 消息的 role / name 等结构开销
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: str | None) -> int:
+    """离线估算文本的 token 数（不依赖网络与分词模型）"""
+    if not text:
+        return 0
+    cjk = len(_CJK_PATTERN.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / _CHARS_PER_TOKEN)
+
+
+def estimate_message_tokens(message: dict[str, Any]) -> int:
+    """估算一条 ChatCompletion*MessageParam 的 token 数"""
+    content = message.get("content")
+    if isinstance(content, list):
+        content = "".join(
+            part.get("text", "") for part in content if isinstance(part, dict)
+        )
+    return (
+        MESSAGE_OVERHEAD_TOKENS
+        + estimate_tokens(content)
+        + estimate_tokens(message.get("name"))
+    )
@@ -0,0 +1,148 @@
+import sys
+from collections import deque
+from collections.abc import Iterator
+from itertools import islice
+from typing import Any
+
+from qq_bot.core.llm_manager.memory.history import HistoryUsage
+from qq_bot.core.llm_manager.memory.tokenizer import estimate_message_tokens
+
+# 每轮对话除文本外的固定内存开销估计（slots 消息记录、prompt 字典、容器槽位）
+TURN_OVERHEAD_BYTES = 640
+
+
+class ConversationWindow:
+    """单个会话的定长消息窗口（环形缓冲）
+
+    用户消息按到达顺序存放在 deque 中，配合 message_id 集合去重，
+    模型回复与用户消息按 message_id 配对保存，随消息一起被推出。
+    同时增量维护已格式化的 prompt 消息列表及每轮的 token 数，组装历史时只需切片复制。
+    插入、去重、推出均为 O(1)。
+
+    Args:
+        maxlen (int): 窗口内最多保留的用户消息条数
+    """
+
+    __slots__ = (
+        "maxlen",
+        "_messages",
+        "_ids",
+        "_replies",
+        "_prompt",
+        "_turn_sizes",
+        "_turn_tokens",
+        "_turn_bytes",
+        "_bytes",
+    )
+
+    def __init__(self, maxlen: int) -> None:
+        self.maxlen = maxlen
+        self._messages: deque = deque()
+        self._ids: set[int] = set()
+        self._replies: dict[int, str] = {}
+        # 扁平的 prompt 消息列表，以及每轮（用户消息 + 回复）占用的条数与 token 数
+        self._prompt: deque[dict] = deque()
+        self._turn_sizes: deque[int] = deque()
+        self._turn_tokens: deque[int] = deque()
+        # 每轮以及整个窗口估算占用的内存字节数
+        self._turn_bytes: deque[int] = deque()
+        self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    def __contains__(self, message_id: int) -> bool:
+        return message_id in self._ids
+
+    def __iter__(self) -> Iterator[tuple[Any, str | None]]:
+        """按时间顺序遍历 (用户消息, 模型回复)"""
+        for message in self._messages:
+            yield message, self._replies.get(message.message_id)
+
+    def append(
+        self,
+        message: Any,
+        reply: str | None = None,
+        prompt: list[dict] | None = None,
+    ) -> tuple[Any, str | None] | None:
+        """插入一条用户消息及其模型回复（重复的消息会被忽略）
+
+        Args:
+            message (Any): 带有 message_id 属性的消息记录
+            reply (str | None, optional): 模型回复. Defaults to None.
+            prompt (list[dict] | None, optional): 本轮已格式化的 prompt 消息. Defaults to None.
+
+        Returns:
+            tuple[Any, str | None] | None: 因窗口已满而被推出的 (用户消息, 模型回复)
+        """
+        message_id = message.message_id
+        if message_id in self._ids:
+            return None
+
+        evicted = None
+        if len(self._messages) >= self.maxlen:
+            removed = self._messages.popleft()
+            self._ids.discard(removed.message_id)
+            evicted = (removed, self._replies.pop(removed.message_id, None))
+            for _ in range(self._turn_sizes.popleft()):
+                self._prompt.popleft()
+            self._turn_tokens.popleft()
+            self._bytes -= self._turn_bytes.popleft()
+
+        prompt = prompt or []
+        self._messages.append(message)
+        self._ids.add(message_id)
+        if reply is not None:
+            self._replies[message_id] = reply
+        self._prompt.extend(prompt)
+        self._turn_sizes.append(len(prompt))
+        self._turn_tokens.append(sum(estimate_message_tokens(m) for m in prompt))
+        turn_bytes = (
+            TURN_OVERHEAD_BYTES
+            + sys.getsizeof(getattr(message, "content", ""))
+            + (sys.getsizeof(reply) if reply is not None else 0)
+        )
+        self._turn_bytes.append(turn_bytes)
+        self._bytes += turn_bytes
+        return evicted
+
+    @property
+    def approx_bytes(self) -> int:
+        return self._bytes
+
+    def reply_of(self, message_id: int) -> str | None:
+        return self._replies.get(message_id)
+
+    def messages(self) -> list:
+        return list(self._messages)
+
+    def prompt_history(self, budget: int | None = None) -> HistoryUsage:
+        """按 token 预算截取 prompt 历史
+
+        从最新的一轮开始向前累计，直到下一轮会超出预算为止，保证纳入的历史是连续的。
+
+        Args:
+            budget (int | None, optional): 历史消息的 token 预算，为空或不大于 0 时不限制. Defaults to None.
+
+        Returns:
+            HistoryUsage: 截取后的历史消息（新列表，消息字典与窗口共享）及 token 用量
+        """
+        turns = len(self._turn_tokens)
+        used = 0
+        kept = 0
+        skipped = len(self._prompt)
+        for tokens, size in zip(
+            reversed(self._turn_tokens), reversed(self._turn_sizes), strict=False
+        ):
+            if budget and budget > 0 and used + tokens > budget:
+                break
+            used += tokens
+            kept += 1
+            skipped -= size
+
+        return HistoryUsage(
+            messages=list(islice(self._prompt, skipped, None)),
+            tokens=used,
+            turns=kept,
+            dropped_turns=turns - kept,
+        )
@@ -0,0 +1,267 @@
+import asyncio
+import heapq
+import itertools
+from collections import defaultdict, deque
+from collections.abc import AsyncIterator, Awaitable, Callable, Hashable
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from typing import TypeVar
+
+from qq_bot.utils.config import settings
+from qq_bot.utils.logging import logger
+from qq_bot.utils.rate_limit import TokenBucket
+
+T = TypeVar("T")
+
+
+class Priority(IntEnum):
+    """请求优先级，数值越小越先调度"""
+
+    MENTION = 0  # 群聊中 @ 或回复机器人
+    PRIVATE = 1  # 私聊
+    NORMAL = 2  # 群聊随机搭话等
+    BACKGROUND = 3  # 对话摘要等后台任务
+
+
+class LLMRequest:
+    __slots__ = (
+        "key",
+        "priority",
+        "tokens",
+        "used_tokens",
+        "tag",
+        "granted",
+        "enqueued_at",
+    )
+
+    def __init__(self, key: Hashable, priority: Priority, tokens: int) -> None:
+        self.key = key
+        self.priority = priority
+        # 预估的 token 用量（提示词 + 最大输出），请求完成后可写入实际用量 used_tokens 以校正 TPM
+        self.tokens = tokens
+        self.used_tokens: int | None = None
+        self.tag = 0.0
+        self.granted: asyncio.Future | None = None
+        self.enqueued_at = 0.0
+
+
+class LLMRequestScheduler:
+    """全局大模型请求调度
+
+    所有模型请求先排队，再由调度任务按以下规则放行：
+    - 优先级高的队列先调度（@/回复机器人 > 私聊 > 群聊随机搭话 > 后台任务）；
+    - 同一优先级内按会话做加权公平排队（按预估 token 计费的虚拟完成时间），单个会话刷屏不会饿死其他会话；
+    - 同时进行的请求数不超过 max_concurrency，并受每分钟请求数（RPM）与 token 数（TPM）的令牌桶限制。
+
+    Args:
+        max_concurrency (int, optional): 最大并发请求数. Defaults to 8.
+        rpm (int, optional): 每分钟最多请求数，0 表示不限制. Defaults to 0.
+        tpm (int, optional): 每分钟最多 token 数，0 表示不限制. Defaults to 0.
+        weights (dict[Hashable, float] | None, optional): 会话权重（默认 1），权重越大分得的份额越多. Defaults to None.
+        name (str, optional): 日志中显示的名称. Defaults to "llm".
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 8,
+        rpm: int = 0,
+        tpm: int = 0,
+        weights: dict[Hashable, float] | None = None,
+        name: str = "llm",
+    ) -> None:
+        self.max_concurrency = max_concurrency
+        self.weights = weights or {}
+        self._name = name
+        self._rpm = TokenBucket(rate=rpm / 60, capacity=rpm) if rpm else None
+        self._tpm = TokenBucket(rate=tpm / 60, capacity=tpm) if tpm else None
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._queues: list[list] = [[] for _ in Priority]
+        self._seq = itertools.count()
+        self._vtime = 0.0
+        self._finish: dict[Hashable, float] = {}
+        self._wakeup = asyncio.Event()
+        self._dispatcher: asyncio.Task | None = None
+        self._in_flight = 0
+        self._completed = 0
+        self._waits: dict[Priority, deque[float]] = defaultdict(
+            lambda: deque(maxlen=1000)
+        )
+
+    def _enqueue(self, request: LLMRequest) -> None:
+        # 加权公平排队：同一会话的请求虚拟完成时间依次累加，权重越大增长越慢
+        weight = self.weights.get(request.key, 1.0)
+        start = max(self._vtime, self._finish.get(request.key, 0.0))
+        request.tag = start + max(request.tokens, 1) / weight
+        self._finish[request.key] = request.tag
+        heapq.heappush(
+            self._queues[request.priority], (request.tag, next(self._seq), request)
+        )
+        self._wakeup.set()
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.get_running_loop().create_task(self._dispatch())
+
+    def _pop(self) -> LLMRequest | None:
+        for queue in self._queues:
+            while queue:
+                _, _, request = heapq.heappop(queue)
+                if not request.granted.done():
+                    return request
+        return None
+
+    def _tpm_charge(self, request: LLMRequest) -> int:
+        # 放行时预扣的 TPM 令牌数
+        return min(request.tokens, self._tpm.capacity)
+
+    def _refund(self, request: LLMRequest) -> None:
+        # 已放行但未发出的请求归还并发槽、RPM 与预扣的 TPM 令牌
+        self._slots.release()
+        if self._rpm is not None:
+            self._rpm.refund(1)
+        if self._tpm is not None:
+            self._tpm.refund(self._tpm_charge(request))
+
+    def _queued(self) -> int:
+        return sum(
+            1 for queue in self._queues for _, _, r in queue if not r.granted.done()
+        )
+
+    async def _dispatch(self) -> None:
+        while True:
+            if not self._queued():
+                self._wakeup.clear()
+                # 长期空闲时清理会话的虚拟时间，避免无限增长
+                self._finish = {k: v for k, v in self._finish.items() if v > self._vtime}
+                await self._wakeup.wait()
+                continue
+
+            await self._slots.acquire()
+            if self._rpm is not None:
+                await self._rpm.acquire()
+            # 拿到并发槽与 RPM 令牌后才选择请求，期间到达的高优先级请求可以插队
+            request = self._pop()
+            if request is None:
+                self._slots.release()
+                if self._rpm is not None:
+                    self._rpm.refund(1)
+                continue
+            if self._tpm is not None:
+                await self._tpm.acquire(self._tpm_charge(request))
+            if request.granted.done():
+                # 等待 TPM 期间请求方已放弃
+                self._refund(request)
+                continue
+            self._vtime = max(self._vtime, request.tag)
+            request.granted.set_result(None)
+
+    @asynccontextmanager
+    async def reserve(
+        self,
+        key: Hashable = None,
+        priority: Priority = Priority.NORMAL,
+        tokens: int = 0,
+    ) -> AsyncIterator[LLMRequest]:
+        """排队获取一次请求的执行权，退出上下文时释放（流式请求需在读取完整个流后退出）
+
+        Args:
+            key (Hashable, optional): 公平排队的会话键（如 "group:群号"）. Defaults to None.
+            priority (Priority, optional): 优先级. Defaults to Priority.NORMAL.
+            tokens (int, optional): 预估 token 用量. Defaults to 0.
+
+        Yields:
+            LLMRequest: 本次请求，可写入 used_tokens 校正 TPM
+        """
+        loop = asyncio.get_running_loop()
+        request = LLMRequest(key, priority, tokens)
+        request.granted = loop.create_future()
+        request.enqueued_at = loop.time()
+        self._enqueue(request)
+        try:
+            await request.granted
+        except asyncio.CancelledError:
+            # 已被放行但请求方取消时，归还并发槽与预扣的令牌
+            if request.granted.done() and not request.granted.cancelled():
+                self._refund(request)
+            raise
+
+        wait = loop.time() - request.enqueued_at
+        self._waits[priority].append(wait)
+        if wait > 5:
+            logger.warning(
+                f"[{self._name}]: 请求排队{wait:.1f}s priority={priority.name} key={key}"
+            )
+        self._in_flight += 1
+        try:
+            yield request
+        finally:
+            self._in_flight -= 1
+            self._completed += 1
+            self._slots.release()
+            if self._tpm is not None and request.used_tokens is not None:
+                # 按实际用量校正预扣的 token（多退少补）
+                used = request.used_tokens - self._tpm_charge(request)
+                if used >= 0:
+                    self._tpm.consume(used)
+                else:
+                    self._tpm.refund(-used)
+
+    async def submit(
+        self,
+        call: Callable[[], Awaitable[T]],
+        key: Hashable = None,
+        priority: Priority = Priority.NORMAL,
+        tokens: int = 0,
+        usage: Callable[[T], int | None] | None = None,
+    ) -> T:
+        """排队执行一次请求
+
+        Args:
+            call (Callable[[], Awaitable[T]]): 发起请求的函数
+            key (Hashable, optional): 公平排队的会话键. Defaults to None.
+            priority (Priority, optional): 优先级. Defaults to Priority.NORMAL.
+            tokens (int, optional): 预估 token 用量. Defaults to 0.
+            usage (Callable[[T], int | None] | None, optional): 从结果中读取实际 token 用量. Defaults to None.
+
+        Returns:
+            T: 请求结果
+        """
+        async with self.reserve(key, priority, tokens) as request:
+            result = await call()
+            if usage is not None:
+                request.used_tokens = usage(result)
+            return result
+
+    def stats(self) -> dict:
+        """当前队列深度、并发数与各优先级的排队耗时（秒）"""
+        depth = {p.name: 0 for p in Priority}
+        by_key: dict[Hashable, int] = defaultdict(int)
+        for priority, queue in zip(Priority, self._queues, strict=False):
+            for _, _, request in queue:
+                if not request.granted.done():
+                    depth[priority.name] += 1
+                    by_key[request.key] += 1
+
+        waits = {}
+        for priority, samples in self._waits.items():
+            ordered = sorted(samples)
+            waits[priority.name] = {
+                "avg": sum(ordered) / len(ordered),
+                "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+                "max": ordered[-1],
+            }
+        return {
+            "in_flight": self._in_flight,
+            "completed": self._completed,
+            "queued": depth,
+            "queued_by_key": dict(sorted(by_key.items(), key=lambda kv: -kv[1])[:10]),
+            "wait": waits,
+            "rpm_available": self._rpm.tokens if self._rpm else None,
+            "tpm_available": self._tpm.tokens if self._tpm else None,
+        }
+
+
+llm_scheduler = LLMRequestScheduler(
+    max_concurrency=settings.LLM_MAX_CONCURRENCY,
+    rpm=settings.LLM_RPM,
+    tpm=settings.LLM_TPM,
+    weights=settings.LLM_SCHEDULER_WEIGHTS,
+)
@@ -13,31 +13,23 @@ class NewsProvider:
         self.sources: dict[str, str] = sources
         self.sources_name: list[str] = list(sources.keys())
 
-    @function_retry(times=3)
+    @function_retry(times=3, endpoint=lambda self: self.url, default=None)
     def get_news(self, source_name: str | None = None, max_len: int = 8) -> dict:
         # 未注明信源、或是无效信源时，随机抽
         if (not source_name) or (source_name not in self.sources_name):
             source_name = random.choice(self.sources_name)
         source = self.sources[source_name]
         url = f"{self.url}{source}"
-        try:
-            response = requests.get(url)
-            if response.status_code == 200:
-                data = json.loads(response.text)
-                if data["code"] == 200:
-                    # source_name = data["message"]
-                    source_news = data["obj"][:max_len]
-                    logger.info(
-                        f"收集实时热搜 -> 信源[{source_name}] 数量：{len(source_news)}"
-                    )
-                    return (source_name, source_news)
-                logger.error(f"[{source_name}]热搜收集失败 -> 目标站点访问失败")
-                return None
-
-            logger.error(f"[{source_name}]热搜收集失败 -> 信源API访问失败")
-
-        except Exception as err:
-            logger.error(f"收集[{source_name}]热搜时发生一个错误: {err}")
+        # 网络错误与 5xx 交给 function_retry 退避重试并计入熔断
+        response = requests.get(url, timeout=settings.RESOURCE_REQUEST_TIMEOUT)
+        response.raise_for_status()
+        data = json.loads(response.text)
+        if data["code"] == 200:
+            # source_name = data["message"]
+            source_news = data["obj"][:max_len]
+            logger.info(f"收集实时热搜 -> 信源[{source_name}] 数量：{len(source_news)}")
+            return (source_name, source_news)
+        logger.error(f"[{source_name}]热搜收集失败 -> 目标站点访问失败")
         return None
 
 
@@ -4,6 +4,7 @@ import random
 from typing import Generator
 import requests
 
+from qq_bot.utils.decorator import function_retry
 from qq_bot.utils.config import settings
 
 
@@ -14,37 +15,48 @@ class RandomPicProvider:
         self.api_v2 = api_v2
         os.makedirs(cache_root, exist_ok=True)
 
+    def _save(self, url: str, content: bytes) -> str:
+        file_path = os.path.join(self.cache_root, url.split("/")[-1])
+        with open(file_path, "wb") as f:
+            f.write(content)
+        return file_path
+
+    @function_retry(times=3, endpoint=lambda self: self.api_v1, default=(None, None))
     def load(self) -> tuple[str | None, str | None]:
         sort = random.choices(["setu", "ws"], weights=[0.6, 0.4], k=1)[0]
-        response = requests.post(self.api_v1, params={"sort": sort})
-        if response.status_code == 200:
-            url = response.url
-            pic_response = requests.get(url)
+        response = requests.post(
+            self.api_v1, params={"sort": sort}, timeout=settings.RESOURCE_REQUEST_TIMEOUT
+        )
+        response.raise_for_status()
+        url = response.url
+        pic_response = requests.get(url, timeout=settings.RESOURCE_REQUEST_TIMEOUT)
+        pic_response.raise_for_status()
+        return self._save(url, pic_response.content), url
 
-            # 确保请求成功
-            if pic_response.status_code == 200:
-                file_path = os.path.join(self.cache_root, url.split("/")[-1])
-                with open(file_path, "wb") as f:
-                    f.write(pic_response.content)
-                return file_path, url
-        return None, None
+    @function_retry(times=3, endpoint=lambda self: self.api_v2, default=[])
+    def _r18_urls(self, num: int) -> list[str]:
+        response = requests.post(
+            self.api_v2,
+            params={"r18": 1, "num": num},
+            timeout=settings.RESOURCE_REQUEST_TIMEOUT,
+        )
+        response.raise_for_status()
+        return [r["url"] for r in json.loads(response.text)]
+
+    @function_retry(times=3, endpoint="random_pic_image", default=None)
+    def _download(self, url: str) -> str | None:
+        pic_response = requests.get(url, timeout=settings.RESOURCE_REQUEST_TIMEOUT)
+        pic_response.raise_for_status()
+        return self._save(url, pic_response.content)
 
     def load_r18(
         self, num: int = 1
     ) -> Generator[tuple[str | None, str | None], None, None]:
-        response = requests.post(self.api_v2, params={"r18": 1, "num": num})
-        if response.status_code == 200:
-            urls = [r["url"] for r in json.loads(response.text)]
-
-            for url in urls:
-                pic_response = requests.get(url)
-
-                # 确保请求成功
-                if pic_response.status_code == 200:
-                    file_path = os.path.join(self.cache_root, url.split("/")[-1])
-                    with open(file_path, "wb") as f:
-                        f.write(pic_response.content)
-                    yield file_path, url
+        for url in self._r18_urls(num):
+            file_path = self._download(url)
+            # 确保请求成功
+            if file_path:
+                yield file_path, url
 
 
 random_pic_provider = RandomPicProvider(
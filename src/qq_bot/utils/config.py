@@ -15,6 +15,15 @@ class SysSetting(BaseSettings):
 class DBSetting(BaseSettings):
     # sql db
     SQL_DATABASE_URI: str = ""
+    # 聊天记录异步批量写入（攒够条数或到达间隔秒数即提交一批）
+    SQL_WRITE_BATCH_SIZE: int = 100
+    SQL_WRITE_FLUSH_INTERVAL: float = 1.0
+    # 批量写入时每条多行 INSERT 的行数
+    SQL_BULK_INSERT_CHUNK_SIZE: int = 500
+    # 用户资料缓存（不存在的用户使用更短的负缓存有效期，单位秒）
+    USER_CACHE_MAXSIZE: int = 10240
+    USER_CACHE_TTL: int = 600
+    USER_CACHE_NEGATIVE_TTL: int = 60
 
     # vector db
     VECTOR_STORE_URL: str = ""
@@ -33,6 +42,7 @@ class DBSetting(BaseSettings):
     MINIO_JM_BOCKET_NAME: str = ""
     MINIO_RANDOM_PIC_BOCKET_NAME: str = ""
     MINIO_RANDOM_SETU_BOCKET_NAME: str = ""
+    MINIO_ARCHIVE_BOCKET_NAME: str = ""
 
     # chroma db
     CHROMADB: str = "./chromadb"
@@ -76,11 +86,67 @@ class ServiceSetting(BaseSettings):
     BOT_COMMAND_GROUP_RANDOM_SETU: str = "来点涩图"
 
     BOT_COMMAND_PRIVATE_DIARY: str = "#今日日记"
+    BOT_COMMAND_PRIVATE_MEMBER_SYNC: str = "#同步群成员"  # 仅 ROOT 可用，参数为群号（空格分隔，省略时同步全部群）
     DIARY_PATH: str = "./"
 
+    # 短期记忆快照（用于快速重启）
+    CHATTER_SNAPSHOT_ROOT: str = "./cache/snapshot"
+    CHATTER_SNAPSHOT_INTERVAL: str = "10m"
+    CHATTER_SNAPSHOT_MAX_AGE: int = 3600
+
+    # 短期记忆容量（按会话 LRU 清出，0 表示不限制）
+    CHATTER_MEMORY_MAX_TURNS: int = 20000
+    CHATTER_MEMORY_MAX_BYTES: int = 64 * 1024 * 1024
+    CHATTER_MEMORY_IDLE_TTL: int = 24 * 3600
+    CHATTER_MEMORY_SWEEP_INTERVAL: str = "5m"
+
+    # 聊天记录冷数据归档（storage 为 local 或 minio）
+    ARCHIVE_ROOT: str = "./archive"
+    ARCHIVE_STORAGE: str = "local"
+    ARCHIVE_AFTER_DAYS: int = 90
+    ARCHIVE_BATCH_SIZE: int = 5000
+    ARCHIVE_INTERVAL: str = "24h"
+
+    # 用户资料后台刷新（有效期秒数，以及每秒最多调用接口次数与突发次数）
+    PROFILE_REFRESH_INTERVAL: int = 600
+    PROFILE_REFRESH_RATE: float = 2.0
+    PROFILE_REFRESH_BURST: int = 5
+
+    # 群成员资料定期同步（群号列表为空时同步机器人所在的全部群）
+    GROUP_MEMBER_SYNC_INTERVAL: str = "12h"
+    GROUP_MEMBER_SYNC_GROUPS: list[int] = []
+
     # 聊天意愿
     CHAT_WILLINGNESS: float = 0.05
 
+    # 群聊调用模型前的本地门控（各群聊天意愿的键为群号；分类器格式为 "模块路径:对象名"，为空时使用关键词分类器）
+    GROUP_CHAT_WILLINGNESS: dict[str, float] = {}
+    GROUP_GATE_KEYWORDS: list[str] = []
+    GROUP_GATE_COMMAND_PREFIXES: list[str] = ["/", "#"]
+    GROUP_GATE_CLASSIFIER: str = ""
+    GROUP_GATE_MIN_LENGTH: int = 2
+    GROUP_GATE_COOLDOWN: float = 10
+    GROUP_GATE_MAX_PER_MINUTE: int = 6
+    # 群消息合并回复：静默多少秒视为一批结束（0 表示不合并），以及一批最长等待秒数
+    GROUP_DEBOUNCE_QUIET: float = 1.5
+    GROUP_DEBOUNCE_MAX_WAIT: float = 6.0
+
+    # 全局大模型请求调度（RPM/TPM 为 0 表示不限制；权重的键为 "group:群号" 或 "private:QQ号"，默认 1）
+    LLM_MAX_CONCURRENCY: int = 8
+    LLM_RPM: int = 0
+    LLM_TPM: int = 0
+    LLM_SCHEDULER_WEIGHTS: dict[str, float] = {}
+    LLM_DEFAULT_MAX_TOKENS: int = 512
+    LLM_SCHEDULER_STATS_INTERVAL: str = "10m"
+
+    # 外部调用的重试与熔断（退避秒数；连续失败多少次熔断、熔断多少秒后试探；单次模型调用含重试的截止秒数）
+    RETRY_BACKOFF_BASE: float = 0.5
+    RETRY_BACKOFF_MAX: float = 8.0
+    CIRCUIT_FAILURE_THRESHOLD: int = 5
+    CIRCUIT_RECOVERY_TIMEOUT: float = 30.0
+    LLM_CALL_DEADLINE: float = 90.0
+    RESOURCE_REQUEST_TIMEOUT: float = 10.0
+
     # 第三方资源收集
     JM_CACHE_ROOT: str = "./cache/jm"
     JM_OPTION: str = "./configs/jm/option.yml"
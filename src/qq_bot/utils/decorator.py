@@ -1,59 +1,185 @@
 import asyncio
 import functools
 import inspect
-from typing import Callable
+import time
+from typing import Any, Callable
 from ncatbot.core.message import BaseMessage, GroupMessage, PrivateMessage
 from qq_bot.conn.sql.session import LocalSessionSync,LocalSessionAsync
 
 from qq_bot.utils.logging import logger
 from qq_bot.utils.config import settings
+from qq_bot.utils.resilience import (
+    backoff_delay,
+    current_deadline,
+    get_circuit_breaker,
+    is_retryable,
+    retry_after,
+)
 from qq_bot.utils.util_text import get_data_from_message
 
 
 PRINTABLE_TYPES = (int, float, str, bool, list, dict, tuple, type(None))
 
 
-def function_retry(times=None):
+_RAISE = object()
+
+
+class _RetryCall:
+    """function_retry 的一次调用（含多次尝试）的状态"""
+
+    def __init__(self, policy: dict, func_path: str, max_times: int, endpoint: str) -> None:
+        self.policy = policy
+        self.func_path = func_path
+        self.max_times = max_times
+        self.breaker = get_circuit_breaker(endpoint)
+        self.attempt = 0
+        deadline = current_deadline()
+        if policy["deadline"] is not None:
+            own = time.monotonic() + policy["deadline"]
+            deadline = own if deadline is None else min(deadline, own)
+        self.deadline = deadline
+
+    def remaining(self) -> float | None:
+        return None if self.deadline is None else self.deadline - time.monotonic()
+
+    def begin(self) -> float | None:
+        """开始一次尝试，返回本次尝试可用的时间（秒）"""
+        self.attempt += 1
+        remaining = self.remaining()
+        if remaining is not None and remaining <= 0:
+            raise TimeoutError(f"调用超过截止时间: function -> {self.func_path}")
+        return remaining
+
+    def _next_delay(self, reason: str, hint: float | None = None) -> float | None:
+        # 返回下次尝试前的等待时间，不再重试时返回 None
+        if self.attempt >= self.max_times:
+            logger.warning(f"重试未能解决问题: function -> {self.func_path} ({reason})")
+            return None
+        delay = backoff_delay(self.attempt, self.policy["backoff_base"], self.policy["backoff_max"])
+        if hint is not None:
+            delay = max(delay, hint)
+        remaining = self.remaining()
+        if remaining is not None and delay >= remaining:
+            logger.warning(f"截止时间前无法再次重试: function -> {self.func_path} ({reason})")
+            return None
+        logger.warning(
+            f"重试[{self.attempt}/{self.max_times}]: function -> {self.func_path} "
+            f"{delay:.2f}s后重试 ({reason})"
+        )
+        return delay
+
+    def on_error(self, err: Exception) -> float:
+        """尝试抛出异常：可重试时返回等待时间，否则重新抛出"""
+        if not is_retryable(err):
+            raise err
+        delay = self._next_delay(f"{type(err).__name__}: {err}", retry_after(err))
+        if delay is None:
+            raise err
+        return delay
+
+    def on_result(self, result: Any) -> float | None:
+        """尝试返回结果：需要重试时返回等待时间，否则返回 None"""
+        if result is not None or not self.policy["retry_on_none"]:
+            return None
+        return self._next_delay("返回为空")
+
+    def give_up(self, err: Exception) -> Any:
+        if self.policy["default"] is _RAISE:
+            raise err
+        logger.error(f"{err}. 调用失败: function -> {self.func_path}")
+        return self.policy["default"]
+
+
+def function_retry(
+    times: int | Callable | None = None,
+    *,
+    endpoint: str | Callable[[Any], str] | None = None,
+    deadline: float | None = None,
+    backoff_base: float | None = None,
+    backoff_max: float | None = None,
+    retry_on_none: bool = True,
+    default: Any = _RAISE,
+):
     """重试装饰器，兼容函数、类函数、同步/异步函数
 
+    - 返回 None 或抛出暂时性故障（网络错误、超时、429、5xx）时，按指数退避加随机抖动重试，其他异常直接抛出；
+    - 同一端点连续出现暂时性故障后熔断，熔断期间调用直接失败（CircuitOpenError），冷却后放行一次试探；
+    - 截止时间（装饰器的 deadline 与 call_deadline 上下文取更早者）不足以再次重试时停止，异步调用的单次尝试也会被超时取消。
+
     Args:
-        times (_type_, optional): 重试次数. Defaults to None.
+        times (int | None, optional): 最多尝试次数，为空时类方法读取实例的 retry 属性，否则为 3. Defaults to None.
+        endpoint (str | Callable[[Any], str] | None, optional): 熔断器的端点名，或由实例得到端点名的函数；
+            为空时读取实例的 endpoint 属性，都没有时使用函数名. Defaults to None.
+        deadline (float | None, optional): 整个调用（含重试）的最长耗时（秒）. Defaults to None.
+        backoff_base (float | None, optional): 退避基础时长（秒），为空时读取配置. Defaults to None.
+        backoff_max (float | None, optional): 单次退避的最长时长（秒），为空时读取配置. Defaults to None.
+        retry_on_none (bool, optional): 返回 None 时是否重试. Defaults to True.
+        default (Any, optional): 最终失败（异常、熔断、超过截止时间）时返回的值，不设置时抛出异常. Defaults to 抛出异常.
     """
+    policy = {
+        "deadline": deadline,
+        "backoff_base": backoff_base if backoff_base is not None else settings.RETRY_BACKOFF_BASE,
+        "backoff_max": backoff_max if backoff_max is not None else settings.RETRY_BACKOFF_MAX,
+        "retry_on_none": retry_on_none,
+        "default": default,
+    }
 
     def decorator(func):
         is_coroutine = asyncio.iscoroutinefunction(func)
+        params = list(inspect.signature(func).parameters)
+        is_method = bool(params) and params[0] in ("self", "cls")
+
+        def new_call(args: tuple) -> _RetryCall:
+            self = args[0] if is_method and args else None
+            func_path = f"{type(self).__name__ + '.' if self is not None else ''}{func.__name__}"
+            if isinstance(times, int):
+                max_times = times
+            else:
+                max_times = getattr(self, "retry", None) or 3
+            if callable(endpoint):
+                name = endpoint(self)
+            else:
+                name = endpoint or getattr(self, "endpoint", None) or func_path
+            return _RetryCall(policy, func_path, max(1, int(max_times)), str(name))
 
         @functools.wraps(func)
         async def async_wrapper(*args, **kwargs):
-            is_method = len(args) > 0 and inspect.isclass(type(args[0]))
-            max_times = getattr(args[0], "times", 3) if is_method else (times or 3)
-
-            self = args[0] if is_method else None
-            func_path = f"{type(self).__name__ + '.' if self else ''}{func.__name__}"
-
-            for attempt in range(1, max_times + 1):
-                result = await func(*args, **kwargs)
-                if result is not None:
-                    return result
-                logger.warning(f"重试[{attempt}/{max_times}]: function -> {func_path}")
-            logger.warning(f"重试未能解决问题: function -> {func_path}")
-            return None
+            call = new_call(args)
+            try:
+                while True:
+                    timeout = call.begin()
+                    try:
+                        with call.breaker.guard():
+                            result = await asyncio.wait_for(func(*args, **kwargs), timeout)
+                    except Exception as err:
+                        delay = call.on_error(err)
+                    else:
+                        delay = call.on_result(result)
+                        if delay is None:
+                            return result
+                    await asyncio.sleep(delay)
+            except Exception as err:
+                return call.give_up(err)
 
         @functools.wraps(func)
         def sync_wrapper(*args, **kwargs):
-            is_method = len(args) > 0 and inspect.isclass(type(args[0]))
-            max_times = getattr(args[0], "times", 3) if is_method else (times or 3)
-
-            self = args[0] if is_method else None
-            func_path = f"{type(self).__name__ + '.' if self else ''}{func.__name__}"
-
-            for attempt in range(1, max_times + 1):
-                result = func(*args, **kwargs)
-                if result is not None:
-                    return result
-                logger.warning(f"RETRY[{attempt}/{max_times}]: function -> {func_path}")
-            logger.warning(f"RETRY CAN NOT FIX ERROR: function -> {func_path}")
-            return None
+            call = new_call(args)
+            try:
+                while True:
+                    # 同步调用无法中途取消，截止时间只用于决定是否继续重试
+                    call.begin()
+                    try:
+                        with call.breaker.guard():
+                            result = func(*args, **kwargs)
+                    except Exception as err:
+                        delay = call.on_error(err)
+                    else:
+                        delay = call.on_result(result)
+                        if delay is None:
+                            return result
+                    time.sleep(delay)
+            except Exception as err:
+                return call.give_up(err)
 
         return async_wrapper if is_coroutine else sync_wrapper
 
@@ -174,9 +300,8 @@ def sql_session(func: Callable):
 
         @functools.wraps(func)
         async def async_wrapper(*args, **kwargs):
-            with LocalSessionAsync() as db:
-                kwargs["db"] = db
-                return await func(*args, **kwargs)
+            async with LocalSessionAsync() as db:
+                return await func(*args, db=db, **kwargs)
 
         return async_wrapper  # type: ignore
     else:
@@ -1,9 +1,11 @@
 from datetime import datetime
+from typing import Awaitable
 from pydantic import BaseModel
 from ncatbot.core import BotAPI, GroupMessage, PrivateMessage
 import time
 from qq_bot.conn.sql.models import UserV1
 from qq_bot.utils.util_text import trans_int, trans_str, time_trans_str
+from qq_bot.utils.logging import logger
 
 
 class QUser(BaseModel):
@@ -15,6 +17,36 @@ class QUser(BaseModel):
     location: str | None = None
     update_time: int
 
+    @staticmethod
+    def _stranger_fields(data: dict) -> dict:
+        return {
+            "nikename": data.get("nick"),
+            "sex": data.get("sex"),
+            "age": data.get("age"),
+            "long_nick": data.get("longNick"),
+            "location": f"{data.get('country', '')}{data.get('province', '')}{data.get('city', '')}",
+        }
+
+    @staticmethod
+    def _member_fields(data: dict) -> dict:
+        return {
+            "nikename": data.get("nickname"),
+            "sex": data.get("sex"),
+            "age": data.get("age"),
+        }
+
+    @staticmethod
+    async def _call_api(call: Awaitable[dict]) -> dict | None:
+        # 接口异常与调用失败都视为无数据，由调用方回退到默认资料
+        try:
+            result = await call
+        except Exception as err:
+            logger.warning(f"{err}. 获取用户信息失败")
+            return None
+        if result and result.get("status") == "ok" and result.get("data"):
+            return result["data"]
+        return None
+
     @classmethod
     async def from_group(
         cls,
@@ -23,24 +55,20 @@ class QUser(BaseModel):
         nikename: str | None = None,
         api: BotAPI | None = None,
     ) -> "QUser":
-        if (
-            api
-            and (
-                at_user_info := await api.get_group_member_info(
-                    group_id=group_id, user_id=user_id, no_cache=False
-                )
+        if api and (
+            data := await cls._call_api(
+                api.get_group_member_info(group_id=group_id, user_id=user_id, no_cache=False)
             )
-            and at_user_info["status"] == "ok"
         ):
-            return cls(
-                user_id=at_user_info["data"]["user_id"],
-                nikename=at_user_info["data"]["nikename"],
-                sex=at_user_info["data"]["sex"],
-                age=at_user_info["data"]["age"],
-                update_time=int(time.time())
-            )
+            return cls.from_member_info(data)
         return cls(user_id=user_id, nikename=nikename,update_time=int(time.time()))
 
+    @classmethod
+    def from_member_info(cls, data: dict) -> "QUser":
+        """由 OneBot 群成员信息（get_group_member_info / get_group_member_list 的单项）构建"""
+        return cls(
+            user_id=data["user_id"], update_time=int(time.time()), **cls._member_fields(data)
+        )
 
     @classmethod
     async def from_private(
@@ -48,21 +76,11 @@ class QUser(BaseModel):
             user_id: int,
             api: BotAPI | None = None,
     ) -> "QUser":
-        if (
-                api
-                and (
-                at_user_info := api.get_stranger_info_sync(user_id=user_id)
-        )
-                and at_user_info["status"] == "ok"
-        ):
+        if api and (data := await cls._call_api(api.get_stranger_info(user_id=user_id))):
             return cls(
-                user_id=at_user_info["data"]["user_id"],
-                nikename=at_user_info["data"]["nick"],
-                sex=at_user_info["data"]["sex"],
-                age=at_user_info["data"]["age"],
-                long_nick=at_user_info["data"]["longNick"],
-                location=f"{at_user_info['data']['country']}{at_user_info['data']['province']}{at_user_info['data']['city']}",
-                update_time=int(time.time())
+                user_id=data.get("user_id", user_id),
+                update_time=int(time.time()),
+                **cls._stranger_fields(data),
             )
         return cls(user_id=user_id,update_time=int(time.time()))
 
@@ -72,22 +90,11 @@ class QUser(BaseModel):
             q: "QUser",
             api: BotAPI | None = None,
     ):
-        if (
-                api
-                and (
-                at_user_info := await api.get_stranger_info(user_id=q.user_id)
-        )
-                and at_user_info["status"] == "ok"
-        ):
-            q.nikename=at_user_info["data"]["nick"]
-            q.sex=at_user_info["data"]["sex"]
-            q.age=at_user_info["data"]["age"]
-            q.long_nick=at_user_info["data"]["longNick"]
-            q.location=f"{at_user_info['data']['country']}{at_user_info['data']['province']}{at_user_info['data']['city']}"
+        if api and (data := await cls._call_api(api.get_stranger_info(user_id=q.user_id))):
+            for field, value in cls._stranger_fields(data).items():
+                setattr(q, field, value)
             q.update_time=int(time.time())
 
-
-
     @classmethod
     async def from_sql_model(cls, data: UserV1 | None) -> "QUser":
         return (
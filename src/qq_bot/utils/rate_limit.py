@@ -0,0 +1,67 @@
+import asyncio
+import time
+
+
+class TokenBucket:
+    """令牌桶限流
+
+    令牌以每秒 rate 个的速度补充，最多积累 capacity 个（允许的突发量）。
+    acquire 在令牌不足时按先来先到的顺序等待。
+
+    Args:
+        rate (float): 每秒补充的令牌数
+        capacity (float | None, optional): 桶容量，为空时等于 rate（至少为 1）. Defaults to None.
+    """
+
+    def __init__(self, rate: float, capacity: float | None = None) -> None:
+        if rate <= 0:
+            raise ValueError(f"令牌补充速度必须大于0: {rate}")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    @property
+    def tokens(self) -> float:
+        """当前可用的令牌数（可能为负，表示已透支）"""
+        self._refill()
+        return self._tokens
+
+    def wait_time(self, tokens: float = 1) -> float:
+        """距离可取出 tokens 个令牌还需等待的秒数"""
+        self._refill()
+        return max(0.0, (tokens - self._tokens) / self.rate)
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        """令牌充足时立即取出并返回 True，否则不等待直接返回 False"""
+        self._refill()
+        if self._tokens < tokens:
+            return False
+        self._tokens -= tokens
+        return True
+
+    async def acquire(self, tokens: float = 1) -> None:
+        """取出 tokens 个令牌，不足时等待"""
+        if tokens > self.capacity:
+            raise ValueError(f"单次申请的令牌数超过桶容量: {tokens} > {self.capacity}")
+        async with self._lock:
+            while not self.try_acquire(tokens):
+                await asyncio.sleep(self.wait_time(tokens))
+
+    def consume(self, tokens: float) -> None:
+        """直接扣除令牌（允许透支），用于事后才知道实际用量的场景"""
+        self._refill()
+        self._tokens -= tokens
+
+    def refund(self, tokens: float) -> None:
+        """归还已取出但未使用的令牌，归还后不超过桶容量"""
+        self._refill()
+        self._tokens = min(self.capacity, self._tokens + tokens)
@@ -0,0 +1,213 @@
+import asyncio
+import random
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import openai
+import requests
+from qq_bot.utils.config import settings
+from qq_bot.utils.logging import logger
+
+# 视为暂时性故障的 HTTP 状态码（另加全部 5xx）
+RETRYABLE_STATUS = {408, 409, 425, 429}
+# 视为暂时性故障的异常（网络不通、超时、连接中断等）
+RETRYABLE_EXCEPTIONS = (
+    TimeoutError,
+    ConnectionError,
+    asyncio.TimeoutError,
+    openai.APIConnectionError,
+    requests.ConnectionError,
+    requests.Timeout,
+    requests.exceptions.ChunkedEncodingError,
+)
+
+_call_deadline: ContextVar[float | None] = ContextVar("call_deadline", default=None)
+
+
+class CircuitOpenError(RuntimeError):
+    """端点处于熔断状态，调用被直接拒绝"""
+
+    def __init__(self, endpoint: str, retry_after: float) -> None:
+        super().__init__(f"端点[{endpoint}]已熔断，{retry_after:.1f}s后允许试探")
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+
+
+def _status_code(err: BaseException) -> int | None:
+    # openai.APIStatusError 直接带 status_code，requests.HTTPError 的状态码在 response 上
+    status = getattr(err, "status_code", None)
+    if status is None:
+        status = getattr(getattr(err, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def is_retryable(err: BaseException) -> bool:
+    """异常是否为暂时性故障（值得重试，并计入熔断）"""
+    if isinstance(err, CircuitOpenError):
+        return False
+    status = _status_code(err)
+    if status is not None:
+        return status in RETRYABLE_STATUS or status >= 500
+    return isinstance(err, RETRYABLE_EXCEPTIONS)
+
+
+def retry_after(err: BaseException) -> float | None:
+    """读取服务端建议的重试等待时间（Retry-After 响应头，秒）"""
+    headers = getattr(getattr(err, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        return max(0.0, float(headers.get("retry-after")))
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """第 attempt 次失败后的等待时间：指数退避 + 全随机抖动，避免大量调用同时重试"""
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+@contextmanager
+def call_deadline(seconds: float) -> Iterator[None]:
+    """为上下文内经 function_retry 的调用设置截止时间（与外层截止时间取更早者）
+
+    Args:
+        seconds (float): 距截止时间的秒数
+    """
+    deadline = time.monotonic() + seconds
+    current = _call_deadline.get()
+    token = _call_deadline.set(deadline if current is None else min(current, deadline))
+    try:
+        yield
+    finally:
+        _call_deadline.reset(token)
+
+
+def current_deadline() -> float | None:
+    """当前上下文的截止时间（time.monotonic），未设置时为 None"""
+    return _call_deadline.get()
+
+
+class CircuitBreaker:
+    """端点级熔断器
+
+    连续 failure_threshold 次暂时性故障后熔断（open），熔断期间调用直接失败；
+    recovery_timeout 秒后进入半开（half_open），只放行一次试探调用：成功则恢复（closed），失败则重新熔断。
+
+    Args:
+        name (str): 端点名
+        failure_threshold (int, optional): 触发熔断的连续失败次数. Defaults to 5.
+        recovery_timeout (float, optional): 熔断后多久允许试探（秒）. Defaults to 30.
+    """
+
+    def __init__(
+        self, name: str, failure_threshold: int = 5, recovery_timeout: float = 30
+    ) -> None:
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self._state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        # 同步调用可能运行在线程池中
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if (
+                self._state == "open"
+                and time.monotonic() - self._opened_at >= self.recovery_timeout
+            ):
+                return "half_open"
+            return self._state
+
+    def retry_after(self) -> float:
+        """距允许试探还需等待的秒数"""
+        with self._lock:
+            if self._state != "open":
+                return 0.0
+            return max(0.0, self._opened_at + self.recovery_timeout - time.monotonic())
+
+    def allow(self) -> bool:
+        """是否放行本次调用（半开状态下只放行一次试探）"""
+        with self._lock:
+            if self._state == "closed":
+                return True
+            if self._state == "open":
+                if time.monotonic() - self._opened_at < self.recovery_timeout:
+                    return False
+                self._state = "half_open"
+                self._probing = False
+            if self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state != "closed":
+                logger.info(f"[circuit]: 端点[{self.name}]恢复")
+            self._state = "closed"
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == "half_open" or self._failures >= self.failure_threshold:
+                if self._state != "open":
+                    logger.warning(
+                        f"[circuit]: 端点[{self.name}]连续失败{self._failures}次，熔断{self.recovery_timeout}s"
+                    )
+                self._state = "open"
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+    def release(self) -> None:
+        """调用被取消，未能判断端点状态时归还试探名额"""
+        with self._lock:
+            self._probing = False
+
+    @contextmanager
+    def guard(self) -> Iterator[None]:
+        """包裹一次调用：熔断时抛出 CircuitOpenError，并按调用结果更新熔断状态
+
+        只有暂时性故障计为失败；其他异常（如 4xx）说明端点仍有响应，计为成功。
+        """
+        if not self.allow():
+            raise CircuitOpenError(self.name, self.retry_after())
+        try:
+            yield
+        except Exception as err:
+            if is_retryable(err):
+                self.record_failure()
+            else:
+                self.record_success()
+            raise
+        except BaseException:
+            self.release()
+            raise
+        else:
+            self.record_success()
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(endpoint: str) -> CircuitBreaker:
+    """获取端点的熔断器（同一端点共享）"""
+    with _breakers_lock:
+        breaker = _breakers.get(endpoint)
+        if breaker is None:
+            breaker = _breakers[endpoint] = CircuitBreaker(
+                endpoint,
+                failure_threshold=settings.CIRCUIT_FAILURE_THRESHOLD,
+                recovery_timeout=settings.CIRCUIT_RECOVERY_TIMEOUT,
+            )
+        return breaker
@@ -84,6 +84,91 @@ def auto_split_sentence(
         return split_sentence_en(text)
 
 
+class SentenceStream:
+    """增量分句
+
+    持续输入模型流式输出的文本片段，每当缓冲区中出现完整的句子（其后已有下一句的开头）时立即产出，
+    分句规则与 auto_split_sentence 一致。未指定语言时按已输入的全部文本判定。
+    """
+
+    def __init__(self, language: Literal["zh", "en", None] = None) -> None:
+        self.language = language
+        self._buffer = ""
+        self._zh_chars = 0
+        self._en_chars = 0
+
+    def _detect(self, text: str) -> Literal["zh", "en", None]:
+        self._zh_chars += len(re.findall(r"[\u4e00-\u9fff]", text))
+        self._en_chars += len(re.findall(r"[a-zA-Z]", text))
+        if self._zh_chars > self._en_chars:
+            return "zh"
+        elif self._en_chars > self._zh_chars:
+            return "en"
+
+    def feed(self, text: str) -> list[str]:
+        """输入一段文本，返回新形成的完整句子"""
+        language = self.language or self._detect(text)
+        self._buffer += text
+        parts = auto_split_sentence(self._buffer, language)
+        if len(parts) <= 1:
+            return []
+        # 最后一段可能尚未结束，保留其在缓冲区中的原文（含内部空白）
+        self._buffer = self._buffer[self._buffer.rfind(parts[-1]):]
+        return parts[:-1]
+
+    def flush(self) -> list[str]:
+        """输入结束，返回缓冲区中剩余的句子"""
+        language = self.language or self._detect("")
+        parts = auto_split_sentence(self._buffer, language) if self._buffer.strip() else []
+        self._buffer = ""
+        return parts
+
+
+class ThinkTagFilter:
+    """流式去除 <think>...</think> 段落，标签可能被拆分在相邻的多个片段中"""
+
+    OPEN_TAG = "<think>"
+    CLOSE_TAG = "</think>"
+
+    def __init__(self) -> None:
+        self._buffer = ""
+        self._in_think = False
+
+    @staticmethod
+    def _partial_tag_len(text: str, tag: str) -> int:
+        # 文本末尾与标签开头重合的最大长度（可能是被截断的标签）
+        for size in range(min(len(text), len(tag) - 1), 0, -1):
+            if text.endswith(tag[:size]):
+                return size
+        return 0
+
+    def feed(self, chunk: str) -> str:
+        """输入一个片段，返回可以输出的正文"""
+        self._buffer += chunk
+        visible = []
+        while True:
+            tag = self.CLOSE_TAG if self._in_think else self.OPEN_TAG
+            index = self._buffer.find(tag)
+            if index >= 0:
+                if not self._in_think:
+                    visible.append(self._buffer[:index])
+                self._buffer = self._buffer[index + len(tag):]
+                self._in_think = not self._in_think
+                continue
+            split = len(self._buffer) - self._partial_tag_len(self._buffer, tag)
+            if not self._in_think:
+                visible.append(self._buffer[:split])
+            self._buffer = self._buffer[split:]
+            return "".join(visible)
+
+    def flush(self) -> str:
+        """输入结束，返回剩余的正文（未闭合的 think 段落被丢弃）"""
+        rest = "" if self._in_think else self._buffer
+        self._buffer = ""
+        self._in_think = False
+        return rest
+
+
 def typing_time_calculate(text: str, language: Literal["zh", "en", None] = None) -> float:
     language = language if language else language_classifity(text)
     typing_time = len(text) / 3.0 / (5.0 if language == "en" else 1.0)
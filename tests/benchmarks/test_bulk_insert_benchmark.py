@@ -0,0 +1,59 @@
+import time
+
+import pytest
+from qq_bot.conn.sql.crud.group_message_crud import (
+    insert_group_message,
+    insert_group_messages,
+)
+from qq_bot.conn.sql.models import GroupMessageV1
+from qq_bot.conn.sql.session import LocalSessionSync
+from qq_bot.utils.logging import logger
+from qq_bot.utils.models import GroupMessageRecord
+from sqlalchemy import delete
+
+pytestmark = [pytest.mark.benchmark, pytest.mark.usefixtures("sql_schema")]
+
+MESSAGES = 2000
+
+
+def _clear() -> None:
+    with LocalSessionSync() as db:
+        db.execute(delete(GroupMessageV1))
+        db.commit()
+
+
+def test_bulk_insert_is_faster_than_single_row_insert():
+    messages = [
+        GroupMessageRecord(
+            message_id=i,
+            content=f"第{i}条消息",
+            group_id=1000 + i % 10,
+            sender_id=2000 + i % 50,
+            from_bot=False,
+            send_time="2024-01-01 12:00:00",
+        )
+        for i in range(MESSAGES)
+    ]
+    replies = [f"第{i}条回复" for i in range(MESSAGES)]
+
+    _clear()
+    start = time.perf_counter()
+    with LocalSessionSync() as db:
+        for message, reply in zip(messages, replies, strict=False):
+            insert_group_message(db, message, reply)
+    single = time.perf_counter() - start
+
+    _clear()
+    start = time.perf_counter()
+    with LocalSessionSync() as db:
+        ids = insert_group_messages(db, messages, replies)
+    bulk = time.perf_counter() - start
+    _clear()
+
+    logger.info(
+        f"写入{MESSAGES}条群聊记录: insert_group_message {MESSAGES / single:.0f}条/s, "
+        f"insert_group_messages {MESSAGES / bulk:.0f}条/s"
+    )
+
+    assert len(ids) == MESSAGES
+    assert bulk * 5 < single
@@ -0,0 +1,67 @@
+import time
+
+import pytest
+from qq_bot.core.llm_manager.memory.record import CachedGroupMessage
+from qq_bot.core.llm_manager.memory.tokenizer import estimate_message_tokens
+from qq_bot.core.llm_manager.memory.window import ConversationWindow
+from qq_bot.utils.logging import logger
+
+pytestmark = pytest.mark.benchmark
+
+WINDOW_SIZE = 50
+BUDGET = 1500
+ROUNDS = 2000
+
+
+def _format_turn(message: CachedGroupMessage, reply: str | None) -> list[dict]:
+    turn = [
+        {"role": "user", "content": message.content, "name": str(message.sender_id)[:6]}
+    ]
+    if reply:
+        turn.append({"role": "assistant", "content": reply})
+    return turn
+
+
+def _reformat_history(window: ConversationWindow, budget: int) -> list[dict]:
+    # 增量维护之前的做法：每次组装都重新格式化整个窗口并逐轮估算 token
+    turns = [_format_turn(m, reply) for m, reply in window]
+    selected: list[list[dict]] = []
+    used = 0
+    for turn in reversed(turns):
+        cost = sum(estimate_message_tokens(m) for m in turn)
+        if used + cost > budget:
+            break
+        selected.append(turn)
+        used += cost
+    return [m for turn in reversed(selected) for m in turn]
+
+
+def _timed(func) -> float:
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        for _ in range(ROUNDS):
+            func()
+        best = min(best, (time.perf_counter() - start) / ROUNDS)
+    return best
+
+
+def test_prompt_assembly_reuses_formatted_turns():
+    window = ConversationWindow(WINDOW_SIZE)
+    for i in range(WINDOW_SIZE):
+        message = CachedGroupMessage(
+            i, f"第{i}条消息，" * 5, 1, 1234567890, None, False, 1700000000 + i
+        )
+        reply = f"第{i}条回复，" * 5
+        window.append(message, reply, _format_turn(message, reply))
+
+    assert window.prompt_history(BUDGET).messages == _reformat_history(window, BUDGET)
+
+    incremental = _timed(lambda: window.prompt_history(BUDGET))
+    reformat = _timed(lambda: _reformat_history(window, BUDGET))
+    logger.info(
+        f"历史消息组装耗时({WINDOW_SIZE}轮): 增量维护 {incremental * 1e6:.1f}us, "
+        f"每次重新格式化 {reformat * 1e6:.1f}us"
+    )
+
+    assert incremental * 2 < reformat
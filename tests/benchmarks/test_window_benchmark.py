@@ -0,0 +1,47 @@
+import time
+
+import pytest
+from qq_bot.core.llm_manager.memory.record import CachedGroupMessage
+from qq_bot.core.llm_manager.memory.window import ConversationWindow
+from qq_bot.utils.logging import logger
+
+pytestmark = pytest.mark.benchmark
+
+INSERTS = 20000
+
+
+def _insert_cost(window_size: int) -> float:
+    """窗口已满时每次插入（含推出最旧一轮）的平均耗时（秒），取多次中最快的一次"""
+    best = float("inf")
+    for _ in range(3):
+        window = ConversationWindow(window_size)
+        turns = [
+            (
+                CachedGroupMessage(i, f"msg {i}", 1, 10, None, False, 1700000000 + i),
+                f"reply {i}",
+                [
+                    {"role": "user", "content": f"msg {i}", "name": "10"},
+                    {"role": "assistant", "content": f"reply {i}"},
+                ],
+            )
+            for i in range(window_size + INSERTS)
+        ]
+        for message, reply, prompt in turns[:window_size]:
+            window.append(message, reply, prompt)
+
+        start = time.perf_counter()
+        for message, reply, prompt in turns[window_size:]:
+            window.append(message, reply, prompt)
+        best = min(best, (time.perf_counter() - start) / INSERTS)
+    return best
+
+
+def test_window_insert_cost_is_independent_of_window_size():
+    small = _insert_cost(16)
+    large = _insert_cost(8192)
+    logger.info(
+        f"ConversationWindow 插入耗时: size=16 {small * 1e6:.2f}us, size=8192 {large * 1e6:.2f}us"
+    )
+
+    # 环形缓冲的插入与推出为 O(1)，窗口放大 512 倍时单次插入耗时应基本不变
+    assert large < small * 3
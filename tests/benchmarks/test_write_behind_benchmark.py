@@ -0,0 +1,88 @@
+import time
+
+import pytest
+from qq_bot.conn.sql.crud.group_message_crud import (
+    insert_group_message_async,
+    insert_group_messages_async,
+)
+from qq_bot.conn.sql.models import GroupMessageV1
+from qq_bot.conn.sql.session import LocalSessionAsync
+from qq_bot.conn.sql.write_behind import WriteBehindQueue
+from qq_bot.utils.logging import logger
+from qq_bot.utils.models import GroupMessageRecord
+from sqlalchemy import delete
+
+pytestmark = [pytest.mark.benchmark, pytest.mark.usefixtures("sql_schema")]
+
+MESSAGES = 1000
+
+
+def _records() -> list[tuple[GroupMessageRecord, str]]:
+    return [
+        (
+            GroupMessageRecord(
+                message_id=i,
+                content=f"第{i}条消息",
+                group_id=1000 + i % 10,
+                sender_id=2000 + i % 50,
+                from_bot=False,
+                send_time="2024-01-01 12:00:00",
+            ),
+            "" if i % 3 else f"第{i}条回复",
+        )
+        for i in range(MESSAGES)
+    ]
+
+
+async def _clear() -> None:
+    async with LocalSessionAsync() as db:
+        await db.exec(delete(GroupMessageV1))
+        await db.commit()
+
+
+async def _write_inline(items: list[tuple[GroupMessageRecord, str]]) -> float:
+    # 写回队列之前的做法：消息处理协程逐条开会话、插入并提交
+    start = time.perf_counter()
+    for message, reply in items:
+        async with LocalSessionAsync() as db:
+            await insert_group_message_async(db, message, reply)
+    return time.perf_counter() - start
+
+
+async def _write_behind(
+    items: list[tuple[GroupMessageRecord, str]],
+) -> tuple[float, float]:
+    async def writer(batch: list[tuple[GroupMessageRecord, str]]) -> None:
+        async with LocalSessionAsync() as db:
+            await insert_group_messages_async(
+                db, [m for m, _ in batch], [r for _, r in batch]
+            )
+
+    queue = WriteBehindQueue(
+        writer, batch_size=100, flush_interval=0.05, name="benchmark"
+    )
+    start = time.perf_counter()
+    for item in items:
+        queue.put(item)
+    enqueued = time.perf_counter() - start
+    await queue.close()
+    return enqueued, time.perf_counter() - start
+
+
+async def test_write_behind_throughput():
+    items = _records()
+
+    await _clear()
+    inline = await _write_inline(items)
+    await _clear()
+    enqueued, drained = await _write_behind(items)
+    await _clear()
+
+    logger.info(
+        f"写入{MESSAGES}条群聊记录: 逐条提交 {MESSAGES / inline:.0f}条/s, "
+        f"写回队列 {MESSAGES / drained:.0f}条/s（入队 {enqueued / MESSAGES * 1e6:.1f}us/条）"
+    )
+
+    # 批量写入的吞吐应明显高于逐条提交，消息处理协程只承担入队开销
+    assert drained * 3 < inline
+    assert enqueued / MESSAGES < inline / MESSAGES / 10
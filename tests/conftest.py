@@ -1,3 +1,23 @@
+import os
+import tempfile
+
+import pytest
+
+# 导入 qq_bot 时会按配置创建数据库引擎，测试统一使用临时 SQLite 数据库
+os.environ.setdefault(
+    "SQL_DATABASE_URI", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'qqbot_test.db')}"
+)
+os.environ.setdefault("DEBUG", "false")
+
+
+@pytest.fixture(scope="session")
+def sql_schema() -> None:
+    """在测试数据库上执行全部迁移"""
+    from qq_bot.conn.sql.migrations import run_migrations
+
+    run_migrations()
+
+
 # from collections.abc import Generator
 # from typing import Optional
 
@@ -0,0 +1,105 @@
+import pytest
+from qq_bot.conn.sql.crud.group_message_crud import (
+    _group_message_chunks,
+    _match_ids,
+    _reselect_ids_stmt,
+    delete_group_messages,
+    insert_group_messages,
+    insert_group_messages_async,
+)
+from qq_bot.conn.sql.models import GroupMessageV1
+from qq_bot.conn.sql.session import LocalSessionAsync, LocalSessionSync
+from qq_bot.utils.models import GroupMessageRecord
+from sqlalchemy import delete, event
+
+pytestmark = pytest.mark.usefixtures("sql_schema")
+
+
+def _messages(count: int, group_id: int = 1000) -> list[GroupMessageRecord]:
+    return [
+        GroupMessageRecord(
+            message_id=i,
+            content=f"消息{i}",
+            group_id=group_id,
+            sender_id=2000 + i,
+            at_user_id=3000 if i % 2 else None,
+            from_bot=i % 3 == 0,
+            send_time="2024-01-01 12:00:00",
+        )
+        for i in range(count)
+    ]
+
+
+@pytest.fixture(autouse=True)
+def _clear_group_messages():
+    yield
+    with LocalSessionSync() as db:
+        db.execute(delete(GroupMessageV1))
+        db.commit()
+
+
+def test_insert_group_messages_returns_ids_in_order():
+    messages = _messages(7)
+    with LocalSessionSync() as db:
+        ids = insert_group_messages(
+            db, messages, [f"回复{i}" for i in range(7)], chunk_size=3
+        )
+        rows = {row.id: row for row in db.exec(GroupMessageV1.__table__.select()).all()}
+
+    assert len(ids) == 7
+    assert ids == sorted(ids)
+    for row_id, message in zip(ids, messages, strict=False):
+        row = rows[row_id]
+        assert row.message_id == str(message.message_id)
+        assert row.message == message.content
+        assert row.sender_id == str(message.sender_id)
+        assert row.at_user_id == message.str_at_user_id()
+        assert row.from_bot == (1 if message.from_bot else 0)
+        assert row.reply_message == f"回复{message.message_id}"
+
+
+async def test_insert_group_messages_async_returns_ids():
+    async with LocalSessionAsync() as db:
+        ids = await insert_group_messages_async(db, _messages(5), [""] * 5, chunk_size=2)
+
+    assert len(set(ids)) == 5
+
+
+def test_insert_group_messages_rejects_mismatched_replies():
+    with LocalSessionSync() as db, pytest.raises(AssertionError):
+        insert_group_messages(db, _messages(2), [""])
+
+
+def test_reselect_ids_matches_rows_of_the_statement():
+    # MySQL 路径：不依赖主键连续，从本语句第一行的主键开始按 (group_id, message_id) 回查
+    with LocalSessionSync() as db:
+        insert_group_messages(db, _messages(3, group_id=1), [""] * 3)
+        messages = _messages(4, group_id=2)
+        messages[3] = messages[0]  # 同一条消息重复写入
+        ids = insert_group_messages(db, messages, [""] * 4)
+        chunk = next(_group_message_chunks(messages, [""] * 4, None))
+        rows = db.execute(_reselect_ids_stmt(chunk, ids[0])).all()
+
+    assert _match_ids(rows, chunk) == ids
+
+
+def test_delete_group_messages_stays_under_sqlite_variable_limit():
+    statements = []
+
+    def record(_conn, _cursor, _statement, parameters, _context, _executemany):
+        statements.append(parameters)
+
+    with LocalSessionSync() as db:
+        ids = insert_group_messages(db, _messages(1000), [""] * 1000)
+        db.commit()
+        event.listen(db.bind, "before_cursor_execute", record)
+        try:
+            deleted = delete_group_messages(db, ids)
+        finally:
+            event.remove(db.bind, "before_cursor_execute", record)
+        db.commit()
+        remaining = db.exec(GroupMessageV1.__table__.select()).all()
+
+    assert deleted == 1000
+    assert remaining == []
+    assert max(len(params) for params in statements) <= 900
@@ -0,0 +1,62 @@
+import pytest
+from qq_bot.conn.sql.crud.private_message_crud import (
+    fetch_all_private_messages,
+    fetch_all_private_messages_async,
+    insert_private_messages,
+    insert_private_messages_async,
+)
+from qq_bot.conn.sql.models import PrivateMessageV1
+from qq_bot.conn.sql.session import LocalSessionAsync, LocalSessionSync
+from qq_bot.utils.models import PrivateMessageRecord
+from sqlalchemy import delete
+
+pytestmark = pytest.mark.usefixtures("sql_schema")
+
+
+def _messages(count: int) -> list[PrivateMessageRecord]:
+    return [
+        PrivateMessageRecord(
+            message_id=i,
+            user_id=100 + i % 2,
+            content=f"消息{i}",
+            from_bot=False,
+            send_time="2024-01-01 12:00:00",
+        )
+        for i in range(count)
+    ]
+
+
+@pytest.fixture(autouse=True)
+def _clear_private_messages():
+    yield
+    with LocalSessionSync() as db:
+        db.execute(delete(PrivateMessageV1))
+        db.commit()
+
+
+def test_insert_private_messages_in_chunks():
+    messages = _messages(7)
+    with LocalSessionSync() as db:
+        insert_private_messages(
+            db, messages, [f"回复{i}" for i in range(7)], chunk_size=3
+        )
+        rows = fetch_all_private_messages(db)
+
+    assert [row.message_id for row in rows] == [str(i) for i in range(7)]
+    assert [row.reply_message for row in rows] == [f"回复{i}" for i in range(7)]
+    assert rows[1].sender_id == "101"
+
+
+def test_insert_private_messages_skips_empty_batch():
+    with LocalSessionSync() as db:
+        insert_private_messages(db, [], [])
+        assert fetch_all_private_messages(db) == []
+
+
+async def test_insert_private_messages_async_in_chunks():
+    messages = _messages(5)
+    async with LocalSessionAsync() as db:
+        await insert_private_messages_async(db, messages, [""] * 5, chunk_size=2)
+        rows = await fetch_all_private_messages_async(db)
+
+    assert [row.message_id for row in rows] == [str(i) for i in range(5)]
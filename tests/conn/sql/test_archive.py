@@ -0,0 +1,122 @@
+from datetime import datetime, timedelta
+
+import pytest
+from qq_bot.conn.sql import archive
+from qq_bot.conn.sql.archive import LocalArchiveStorage, archive_messages, read_archive
+from qq_bot.conn.sql.crud.group_message_crud import insert_group_messages
+from qq_bot.conn.sql.models import GroupMessageV1
+from qq_bot.conn.sql.session import LocalSessionSync
+from qq_bot.utils.models import GroupMessageRecord
+from sqlalchemy import delete, func, select
+
+pytestmark = pytest.mark.usefixtures("sql_schema")
+
+OLD_DAY = datetime.now().replace(hour=12, minute=0, second=0, microsecond=0) - timedelta(
+    days=200
+)
+
+
+def _messages() -> list[GroupMessageRecord]:
+    # 三天的旧消息（每天 4 条，分属两个群）以及一条未到归档时间的消息
+    messages = [
+        GroupMessageRecord(
+            message_id=i,
+            content=f"消息{i}",
+            group_id=1000 + i % 2,
+            sender_id=2000 + i,
+            at_user_id=3000 if i % 3 == 0 else None,
+            from_bot=i % 4 == 0,
+            send_time=f"{OLD_DAY + timedelta(days=i // 4, minutes=i):%Y-%m-%d %H:%M:%S}",
+        )
+        for i in range(12)
+    ]
+    messages.append(
+        GroupMessageRecord(
+            message_id=99,
+            content="新消息",
+            group_id=1000,
+            sender_id=2000,
+            from_bot=False,
+            send_time=f"{datetime.now():%Y-%m-%d %H:%M:%S}",
+        )
+    )
+    return messages
+
+
+@pytest.fixture(autouse=True)
+def _group_messages():
+    with LocalSessionSync() as db:
+        db.execute(delete(GroupMessageV1))
+        insert_group_messages(db, _messages(), [f"回复{i}" for i in range(13)])
+    yield
+    with LocalSessionSync() as db:
+        db.execute(delete(GroupMessageV1))
+        db.commit()
+
+
+def test_archive_round_trip(tmp_path):
+    storage = LocalArchiveStorage(str(tmp_path))
+    messages = _messages()[:12]
+
+    assert (
+        archive_messages("group", older_than_days=90, batch_size=3, storage=storage) == 12
+    )
+
+    with LocalSessionSync() as db:
+        remaining = db.execute(select(GroupMessageV1.message_id)).scalars().all()
+    assert remaining == ["99"]
+
+    rows = list(read_archive("group", storage=storage))
+    assert [row["message_id"] for row in rows] == [str(m.message_id) for m in messages]
+    for row, message in zip(rows, messages, strict=False):
+        assert row["group_id"] == str(message.group_id)
+        assert row["at_user_id"] == message.str_at_user_id()
+        assert row["message"] == message.content
+        assert row["from_bot"] == (1 if message.from_bot else 0)
+        assert row["send_time"] == message.get_datetime()
+        assert row["reply_message"] == f"回复{message.message_id}"
+
+
+def test_read_archive_filters(tmp_path):
+    storage = LocalArchiveStorage(str(tmp_path))
+    archive_messages("group", older_than_days=90, storage=storage)
+
+    second_day = OLD_DAY + timedelta(days=1)
+    rows = list(
+        read_archive(
+            "group",
+            group_id=1001,
+            start_time=second_day.replace(hour=0),
+            end_time=second_day.replace(hour=23),
+            storage=storage,
+        )
+    )
+
+    assert [row["message_id"] for row in rows] == ["5", "7"]
+
+
+def test_archive_flushes_earlier_days_when_a_new_day_starts(tmp_path, monkeypatch):
+    storage = LocalArchiveStorage(str(tmp_path))
+    table = archive._TABLES["group"]
+    read = []
+    written = []
+
+    def iter_rows(*args, **kwargs):
+        for row in table.iter_rows(*args, **kwargs):
+            read.append(row.id)
+            yield row
+
+    def put(key: str, data: bytes) -> None:
+        written.append((key.split("/")[1], len(read)))
+        LocalArchiveStorage.put(storage, key, data)
+
+    monkeypatch.setitem(archive._TABLES, "group", table._replace(iter_rows=iter_rows))
+    monkeypatch.setattr(storage, "put", put)
+
+    archive_messages("group", older_than_days=90, batch_size=100, storage=storage)
+
+    # 每天的分区在读到下一天的第一行时就已写出，而不是等全部读完
+    days = [f"dt={OLD_DAY + timedelta(days=d):%Y-%m-%d}" for d in range(3)]
+    assert written == [(days[0], 5), (days[1], 9), (days[2], 12)]
+    with LocalSessionSync() as db:
+        assert db.execute(select(func.count()).select_from(GroupMessageV1)).scalar() == 1
@@ -0,0 +1,40 @@
+from qq_bot.conn.sql import models  # 注册全部表
+from qq_bot.conn.sql.migrations import MIGRATIONS, _v1_tables, run_migrations
+from sqlalchemy import create_engine, inspect
+from sqlmodel import SQLModel
+
+
+def _schema(engine) -> dict[str, tuple[set[str], set[str]]]:
+    inspector = inspect(engine)
+    return {
+        table: (
+            {column["name"] for column in inspector.get_columns(table)},
+            {index["name"] for index in inspector.get_indexes(table)},
+        )
+        for table in inspector.get_table_names()
+    }
+
+
+def _model_schema() -> dict[str, tuple[set[str], set[str]]]:
+    return {
+        table.name: ({c.name for c in table.columns}, {i.name for i in table.indexes})
+        for table in SQLModel.metadata.sorted_tables
+    }
+
+
+def test_migrations_build_current_schema(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'fresh.db'}")
+
+    assert run_migrations(engine) == [m.version for m in MIGRATIONS]
+    assert _schema(engine) == _model_schema()
+    assert run_migrations(engine) == []
+
+
+def test_migrations_upgrade_database_created_before_versioning(tmp_path):
+    # 引入迁移前由 create_all 建好的库：表已存在，v1 跳过，后续版本补齐索引与新列
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    _v1_tables().create_all(engine)
+
+    run_migrations(engine)
+
+    assert _schema(engine) == _model_schema()
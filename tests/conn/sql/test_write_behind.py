@@ -0,0 +1,49 @@
+import asyncio
+
+from qq_bot.conn.sql.write_behind import WriteBehindQueue
+
+
+class _Writer:
+    def __init__(self) -> None:
+        self.batches: list[list[int]] = []
+
+    async def __call__(self, batch: list[int]) -> None:
+        await asyncio.sleep(0.01)
+        self.batches.append(batch)
+
+
+async def test_queue_batches_items():
+    writer = _Writer()
+    queue = WriteBehindQueue(writer, batch_size=2, flush_interval=10)
+
+    for i in range(5):
+        queue.put(i)
+    await queue.close()
+
+    assert writer.batches == [[0, 1], [2, 3], [4]]
+
+
+async def test_flush_writes_pending_items_without_waiting_for_interval():
+    writer = _Writer()
+    queue = WriteBehindQueue(writer, batch_size=100, flush_interval=10)
+
+    queue.put(1)
+    queue.put(2)
+    await asyncio.wait_for(queue.flush(), 1)
+
+    assert writer.batches == [[1, 2]]
+
+    queue.put(3)
+    await asyncio.wait_for(queue.flush(), 1)
+    await queue.close()
+
+    assert writer.batches == [[1, 2], [3]]
+
+
+async def test_flush_without_pending_items_returns_immediately():
+    writer = _Writer()
+    queue = WriteBehindQueue(writer)
+
+    await asyncio.wait_for(queue.flush(), 1)
+
+    assert writer.batches == []
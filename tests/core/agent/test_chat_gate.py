@@ -0,0 +1,88 @@
+from types import SimpleNamespace
+
+from qq_bot.core.agent.chat_gate import GroupChatGate, KeywordClassifier
+from qq_bot.utils.models import GroupMessageRecord
+
+BOT_ID = 10000
+
+
+def _message(
+    content: str, at_user_id: int | None = None, sender_id: int = 20000
+) -> GroupMessageRecord:
+    return GroupMessageRecord(
+        message_id=1,
+        content=content,
+        group_id=1,
+        sender_id=sender_id,
+        at_user_id=at_user_id,
+        from_bot=False,
+        send_time="2024-01-01 12:00:00",
+    )
+
+
+def _gate(**kwargs) -> GroupChatGate:
+    options = {
+        "bot_id": BOT_ID,
+        "command_prefixes": ["/tool"],
+        "willingness": 0.0,
+        "cooldown": 0,
+        "max_per_minute": 2,
+    }
+    options.update(kwargs)
+    return GroupChatGate(**options)
+
+
+def test_gate_filters_messages_outside_conversation():
+    gate = _gate()
+
+    assert gate.decide(_message("  ")).reason == "empty"
+    assert gate.decide(_message("hello", sender_id=BOT_ID)).reason == "self"
+    decision = gate.decide(_message("/tool run"))
+    assert not decision.allowed
+    assert decision.filtered
+
+
+def test_gate_rejects_unaddressed_message_without_willingness():
+    decision = _gate().decide(_message("今天天气不错"))
+
+    assert not decision.allowed
+    assert not decision.filtered
+    assert decision.reason.startswith("willingness")
+
+
+def test_gate_always_allows_mention_even_when_rate_limited():
+    gate = _gate(willingness=1.0)
+    assert gate.decide(_message("第一条")).allowed
+    assert gate.decide(_message("第二条")).allowed
+    assert gate.decide(_message("第三条")).reason.startswith("rate_limited")
+
+    decision = gate.decide(_message("你好", at_user_id=BOT_ID))
+
+    assert decision.allowed
+    assert decision.addressed
+
+
+def test_gate_allows_reply_to_bot_message():
+    gate = _gate(max_per_minute=0)
+    gate.remember_bot_message(42)
+    origin = SimpleNamespace(message=[{"type": "reply", "data": {"id": "42"}}])
+
+    decision = gate.decide(_message("嗯"), origin)
+
+    assert decision.allowed
+    assert decision.reason == "reply"
+
+
+def test_gate_applies_cooldown_to_random_replies():
+    gate = _gate(willingness=1.0, cooldown=60, max_per_minute=0)
+
+    assert gate.decide(_message("第一条")).allowed
+    assert gate.decide(_message("第二条")).reason.startswith("cooldown")
+
+
+def test_keyword_classifier_scores_keywords_and_questions():
+    classifier = KeywordClassifier(["小助手"], keyword_weight=0.5, question_weight=0.2)
+
+    assert classifier(_message("小助手在吗")) == 0.7
+    assert classifier(_message("吃了吗")) == 0.2
+    assert classifier(_message("没事")) == 0.0
@@ -0,0 +1,91 @@
+import asyncio
+
+from qq_bot.core.agent.debounce import MessageDebouncer
+
+
+class _Recorder:
+    def __init__(self, infer_delay: float = 0.0, deliver_delay: float = 0.0) -> None:
+        self.infer_delay = infer_delay
+        self.deliver_delay = deliver_delay
+        self.inferred: list[list[str]] = []
+        self.delivered: list[list[str]] = []
+
+    async def infer(self, _key, items: list[str]) -> str:
+        await asyncio.sleep(self.infer_delay)
+        self.inferred.append(list(items))
+        return "+".join(items)
+
+    async def deliver(self, _key, items: list[str], _result: str) -> None:
+        await asyncio.sleep(self.deliver_delay)
+        self.delivered.append(list(items))
+
+
+async def _idle(debouncer: MessageDebouncer, key) -> None:
+    while debouncer._bursts.get(key) is not None:
+        await asyncio.sleep(0.01)
+
+
+async def test_debouncer_merges_messages_within_quiet_window():
+    recorder = _Recorder()
+    debouncer = MessageDebouncer(recorder.infer, recorder.deliver, quiet=0.05, max_wait=1)
+
+    debouncer.submit(1, "a")
+    debouncer.submit(1, "b")
+    assert debouncer.is_active(1)
+    await _idle(debouncer, 1)
+
+    assert recorder.delivered == [["a", "b"]]
+    assert not debouncer.is_active(1)
+
+
+async def test_debouncer_cancels_stale_inference_and_merges_new_message():
+    recorder = _Recorder(infer_delay=0.1)
+    debouncer = MessageDebouncer(recorder.infer, recorder.deliver, quiet=0.02, max_wait=1)
+
+    debouncer.submit(1, "a")
+    await asyncio.sleep(0.05)
+    debouncer.submit(1, "b")
+    await _idle(debouncer, 1)
+
+    assert recorder.inferred == [["a", "b"]]
+    assert recorder.delivered == [["a", "b"]]
+
+
+async def test_debouncer_keeps_delivery_order_after_cancelled_batch():
+    recorder = _Recorder(infer_delay=0.05, deliver_delay=0.2)
+    debouncer = MessageDebouncer(recorder.infer, recorder.deliver, quiet=0.01, max_wait=1)
+
+    debouncer.submit(1, "a")
+    # 第一批开始发送后，第二批的推理被第三条消息取消，合并后的批次仍须等待第一批发送完毕
+    await asyncio.sleep(0.1)
+    debouncer.submit(1, "b")
+    await asyncio.sleep(0.05)
+    debouncer.submit(1, "c")
+    await asyncio.sleep(0.05)
+    assert recorder.delivered == []
+    await _idle(debouncer, 1)
+
+    assert recorder.delivered == [["a"], ["b", "c"]]
+
+
+async def test_debouncer_continues_after_inference_error():
+    calls = []
+
+    async def infer(_key, items):
+        calls.append(items)
+        if len(calls) == 1:
+            raise RuntimeError("boom")
+        return "ok"
+
+    delivered = []
+
+    async def deliver(_key, items, _result):
+        delivered.append(items)
+
+    debouncer = MessageDebouncer(infer, deliver, quiet=0.01, max_wait=1)
+    debouncer.submit(1, "a")
+    await _idle(debouncer, 1)
+    debouncer.submit(1, "b")
+    await _idle(debouncer, 1)
+
+    assert delivered == [["b"]]
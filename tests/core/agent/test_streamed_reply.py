@@ -0,0 +1,103 @@
+import asyncio
+
+import pytest
+from qq_bot.core.agent import agent_server
+from qq_bot.core.agent.agent_server import send_reply_sentences, start_streamed_reply
+
+
+@pytest.fixture(autouse=True)
+def _no_typing_delay(monkeypatch):
+    monkeypatch.setattr(agent_server, "typing_time_calculate", lambda _text: 0.0)
+
+
+class _Sentences:
+    def __init__(self, sentences: list[str]) -> None:
+        self.sentences = sentences
+        self.read = 0
+        self.closed = False
+
+    async def stream(self):
+        try:
+            for sentence in self.sentences:
+                self.read += 1
+                yield sentence
+        finally:
+            self.closed = True
+
+
+async def test_start_streamed_reply_waits_for_first_sentence():
+    source = _Sentences(["。", "你好。", "今天天气不错。", "再见"])
+
+    reply = await start_streamed_reply(source.stream())
+
+    assert source.read == 2
+    sent = []
+
+    async def send(part):
+        sent.append(part)
+
+    assert await send_reply_sentences(reply, send) == ["你好", "今天天气不错", "再见"]
+    assert sent == ["你好", "今天天气不错", "再见"]
+    assert reply.text == "你好。今天天气不错。再见"
+
+
+async def test_start_streamed_reply_returns_none_for_empty_stream():
+    source = _Sentences(["", "。"])
+
+    assert await start_streamed_reply(source.stream()) is None
+    assert source.closed
+
+
+async def test_streamed_reply_drains_stream_without_waiting_for_sends():
+    source = _Sentences(["你好。", "第二句。", "第三句。"])
+    reply = await start_streamed_reply(source.stream())
+
+    # 尚未开始发送，后台已读完整个流（底层的调度名额随之释放）
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    assert source.closed
+    assert source.read == 3
+
+    async def send(_part):
+        raise RuntimeError("发送失败")
+
+    with pytest.raises(RuntimeError):
+        await send_reply_sentences(reply, send)
+    await reply.aclose()
+
+    assert reply.text == "你好。"
+
+
+async def test_streamed_reply_close_cancels_pending_stream():
+    started = asyncio.Event()
+    closed = []
+
+    async def stream():
+        try:
+            yield "你好。"
+            started.set()
+            await asyncio.Event().wait()
+            yield "不会生成"
+        finally:
+            closed.append(True)
+
+    reply = await start_streamed_reply(stream())
+    await started.wait()
+    await reply.aclose()
+
+    assert closed == [True]
+
+
+async def test_streamed_reply_raises_stream_error():
+    async def stream():
+        yield "你好。"
+        raise RuntimeError("连接中断")
+
+    reply = await start_streamed_reply(stream())
+
+    async def consume():
+        return [sentence async for sentence in reply]
+
+    with pytest.raises(RuntimeError):
+        await consume()
+    assert reply.text == "你好。"
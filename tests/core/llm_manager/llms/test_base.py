@@ -0,0 +1,89 @@
+from types import SimpleNamespace
+
+from qq_bot.core.llm_manager.llms.base import OpenAIBase
+
+
+def _llm() -> OpenAIBase:
+    llm = OpenAIBase.__new__(OpenAIBase)
+    llm.base_system_prompt = {"role": "system", "content": "persona"}
+    return llm
+
+
+def test_build_messages_does_not_mutate_history():
+    history = [{"role": "user", "content": "hi"}]
+    kwargs = {"custom_system_prompt": {"role": "system", "content": "custom"}}
+
+    first = _llm()._build_messages(history, kwargs)
+    second = _llm()._build_messages(history, {})
+
+    assert history == [{"role": "user", "content": "hi"}]
+    assert [m["content"] for m in first] == ["persona", "custom", "hi"]
+    assert [m["content"] for m in second] == ["persona", "hi"]
+    assert kwargs == {}
+
+
+def test_build_messages_wraps_text_as_user_message():
+    messages = _llm()._build_messages("hello", {})
+
+    assert messages == [
+        {"role": "system", "content": "persona"},
+        {"role": "user", "content": "hello"},
+    ]
+
+
+def _completion(content: str = "", tool_calls: list | None = None) -> SimpleNamespace:
+    message = SimpleNamespace(content=content, tool_calls=tool_calls)
+    return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+
+class _Completions:
+    def __init__(self, responses: list) -> None:
+        self.responses = responses
+        self.calls = 0
+
+    async def create(self, **_kwargs):
+        response = self.responses[self.calls]
+        self.calls += 1
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+class _LocalTools:
+    def __init__(self) -> None:
+        self.tools = {"reminder_schedule": None}
+        self.calls = 0
+
+    async def run(self, _tool_name: str, **_args) -> str:
+        self.calls += 1
+        return "ok"
+
+
+async def test_tool_inference_retries_only_the_failed_request(monkeypatch):
+    monkeypatch.setattr("qq_bot.utils.resilience.random.uniform", lambda *_: 0)
+    tool_call = SimpleNamespace(
+        id="call-1", function=SimpleNamespace(name="reminder_schedule", arguments="{}")
+    )
+    completions = _Completions(
+        [
+            _completion(tool_calls=[tool_call]),
+            TimeoutError(),
+            _completion("好的"),
+        ]
+    )
+    llm = _llm()
+    llm.is_activate = True
+    llm.default_model = "model"
+    llm.endpoint = "test-retry-endpoint"
+    llm.retry = 3
+    llm.tool_description = []
+    llm.mcp_tools = SimpleNamespace(tools={})
+    llm.local_tools = _LocalTools()
+    llm.async_client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+
+    message = await llm._async_tool_inference(user_id=1, content="提醒我")
+
+    assert message.content == "好的"
+    assert completions.calls == 3
+    # 第二次请求失败重试时，已执行的工具不会再次执行
+    assert llm.local_tools.calls == 1
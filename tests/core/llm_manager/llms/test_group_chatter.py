@@ -0,0 +1,57 @@
+import asyncio
+
+from qq_bot.core.llm_manager.llms.group_chatter import LLMGroupChatter
+from qq_bot.utils.models import GroupMessageRecord
+
+
+def _message(message_id: int) -> GroupMessageRecord:
+    return GroupMessageRecord(
+        message_id=message_id,
+        content=f"msg {message_id}",
+        group_id=1,
+        sender_id=20000,
+        from_bot=False,
+        send_time="2024-01-01 12:00:00",
+    )
+
+
+def _chatter(
+    chunks: list[str], block: asyncio.Event | None = None
+) -> tuple[LLMGroupChatter, list]:
+    chatter = LLMGroupChatter.__new__(LLMGroupChatter)
+    remembered = []
+
+    async def build_history(_message, _burst=None):
+        return []
+
+    async def stream(**_kwargs):
+        for chunk in chunks:
+            yield chunk
+        if block is not None:
+            await block.wait()
+
+    chatter._build_history = build_history
+    chatter._async_stream_inference = stream
+    chatter.insert_and_update_history_message = lambda m, reply=None: remembered.append(
+        (m.message_id, reply)
+    )
+    return chatter, remembered
+
+
+async def test_run_stream_remembers_reply_after_stream_finishes():
+    chatter, remembered = _chatter(["你好。", "再见"])
+
+    sentences = [s async for s in chatter.run_stream(_message(2), burst=[_message(1)])]
+
+    assert sentences == ["你好。", "再见"]
+    assert remembered == [(1, None), (2, "你好。再见")]
+
+
+async def test_run_stream_keeps_memory_when_cancelled():
+    chatter, remembered = _chatter(["你好。", "还没"], block=asyncio.Event())
+    stream = chatter.run_stream(_message(2), burst=[_message(1)])
+
+    assert await stream.__anext__() == "你好。"
+    await stream.aclose()
+
+    assert remembered == []
@@ -0,0 +1,84 @@
+from qq_bot.core.llm_manager.memory.record import CachedGroupMessage
+from qq_bot.core.llm_manager.memory.store import ConversationStore
+from qq_bot.core.llm_manager.memory.window import ConversationWindow
+
+
+def _message(
+    message_id: int, group_id: int = 1, content: str = "hi"
+) -> CachedGroupMessage:
+    return CachedGroupMessage(message_id, content, group_id, 10, None, False, 1700000000)
+
+
+def _turn(message_id: int, reply: str | None = None) -> list[dict]:
+    prompt = [{"role": "user", "content": f"msg {message_id}"}]
+    if reply is not None:
+        prompt.append({"role": "assistant", "content": reply})
+    return prompt
+
+
+def _fill(window: ConversationWindow, count: int, start: int = 0) -> None:
+    for i in range(start, start + count):
+        window.append(_message(i), f"reply {i}", _turn(i, f"reply {i}"))
+
+
+def test_store_creates_windows_on_access():
+    store = ConversationStore(window_size=3)
+
+    window = store[1]
+
+    assert window.maxlen == 3
+    assert 1 in store
+    assert store.get(2) is None
+    assert 2 not in store
+
+
+def test_store_sweep_evicts_least_recently_used_over_turn_limit():
+    evicted = []
+    store = ConversationStore(
+        window_size=10, max_turns=4, on_evict=lambda key, _window: evicted.append(key)
+    )
+    for key in (1, 2, 3):
+        _fill(store[key], 2)
+    store[1]  # 访问后会话 1 变为最近使用
+
+    assert store.sweep() == [2]
+    assert evicted == [2]
+    assert list(store) == [3, 1]
+    assert store.footprint()["turns"] == 4
+
+
+def test_store_sweep_evicts_idle_conversations(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(
+        "qq_bot.core.llm_manager.memory.store.time.monotonic", lambda: now[0]
+    )
+    store = ConversationStore(window_size=3, idle_ttl=60)
+    _fill(store[1], 1)
+    now[0] += 50
+    _fill(store[2], 1)
+    now[0] += 20
+
+    assert store.sweep() == [1]
+    assert list(store) == [2]
+
+
+def test_store_keeps_last_conversation_over_limit():
+    store = ConversationStore(window_size=10, max_turns=1)
+    _fill(store[1], 5)
+
+    assert store.sweep() == []
+    assert 1 in store
+
+
+def test_store_pop_skips_evict_callback():
+    evicted = []
+    store = ConversationStore(
+        window_size=3, on_evict=lambda key, _window: evicted.append(key)
+    )
+    _fill(store[1], 1)
+
+    assert store.pop(1) is not None
+    store.evict(2)
+
+    assert evicted == []
+    assert len(store) == 0
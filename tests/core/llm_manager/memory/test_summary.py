@@ -0,0 +1,129 @@
+import asyncio
+
+from qq_bot.core.llm_manager.memory.summary import ConversationSummarizer
+
+
+class _Recorder:
+    def __init__(self, block: asyncio.Event | None = None) -> None:
+        self.block = block
+        self.calls: list[tuple[str | None, list[str]]] = []
+        self.persisted: list[tuple] = []
+
+    async def summarize(self, summary: str | None, dialogue: list[str]) -> str:
+        self.calls.append((summary, dialogue))
+        if self.block is not None:
+            await self.block.wait()
+        return f"summary {len(self.calls)}"
+
+    async def persist(
+        self, key, summary: str, covered_until: int, covered_ids: list[int]
+    ) -> None:
+        self.persisted.append((key, summary, covered_until, covered_ids))
+
+
+async def test_summarizer_compacts_after_trigger_turns():
+    recorder = _Recorder()
+    summarizer = ConversationSummarizer(
+        recorder.summarize, recorder.persist, trigger_turns=2
+    )
+
+    summarizer.push(1, 100, 11, "a")
+    summarizer.push(1, 101, 12, "b")
+    await summarizer.flush()
+
+    assert recorder.calls == [(None, ["a", "b"])]
+    assert summarizer.get(1) == "summary 1"
+    assert recorder.persisted == [(1, "summary 1", 101, [12])]
+
+
+async def test_summarizer_keeps_same_second_turns_not_yet_covered():
+    recorder = _Recorder()
+    summarizer = ConversationSummarizer(
+        recorder.summarize, recorder.persist, trigger_turns=2
+    )
+    summarizer.push(1, 100, 11, "a")
+    summarizer.push(1, 100, 12, "b")
+    await summarizer.flush()
+
+    # 同一秒内已覆盖的消息被忽略，未覆盖的仍会进入摘要
+    summarizer.push(1, 100, 12, "b")
+    summarizer.push(1, 100, 13, "c")
+    summarizer.push(1, 99, 10, "old")
+    await summarizer.flush()
+
+    assert recorder.calls[1] == ("summary 1", ["c"])
+    assert recorder.persisted[-1][2:] == (100, [11, 12, 13])
+
+
+async def test_summarizer_restores_coverage_from_dump():
+    recorder = _Recorder()
+    summarizer = ConversationSummarizer(
+        recorder.summarize, recorder.persist, trigger_turns=1
+    )
+    summarizer.load(1, "saved", 100, ["11"])
+
+    assert summarizer.dump() == {1: ("saved", 100, [11])}
+    assert summarizer.is_covered(1, 100, 11)
+    assert not summarizer.is_covered(1, 100, 12)
+    assert summarizer.is_covered(1, 99, 12)
+    assert not summarizer.is_covered(2, 0, 1)
+
+
+async def test_summarizer_forget_cancels_inflight_summary():
+    block = asyncio.Event()
+    recorder = _Recorder(block)
+    summarizer = ConversationSummarizer(
+        recorder.summarize, recorder.persist, trigger_turns=1
+    )
+
+    summarizer.push(1, 100, 11, "a")
+    await asyncio.sleep(0)
+    assert recorder.calls == [(None, ["a"])]
+
+    summarizer.forget(1)
+    block.set()
+    await summarizer.flush()
+
+    assert summarizer.get(1) is None
+    assert recorder.persisted == []
+
+
+async def test_summarizer_discards_result_for_reloaded_conversation():
+    block = asyncio.Event()
+    recorder = _Recorder(block)
+    summarizer = ConversationSummarizer(
+        recorder.summarize, recorder.persist, trigger_turns=1
+    )
+    summarizer.push(1, 100, 11, "a")
+    await asyncio.sleep(0)
+
+    # 摘要进行中会话被清出后重新加载，后台结果不能覆盖重新加载的状态
+    task = summarizer._tasks.pop(1)
+    summarizer.forget(1)
+    summarizer.load(1, "reloaded", 100, [11])
+    block.set()
+    await task
+
+    assert summarizer.get(1) == "reloaded"
+    assert recorder.persisted == []
+
+
+async def test_summarizer_keeps_pending_turns_when_summary_fails():
+    calls = []
+
+    async def summarize(_summary, dialogue):
+        calls.append(dialogue)
+        return
+
+    async def persist(*_args):
+        raise AssertionError("摘要失败时不应落库")
+
+    summarizer = ConversationSummarizer(summarize, persist, trigger_turns=1)
+    summarizer.push(1, 100, 11, "a")
+    await summarizer.flush()
+
+    summarizer.push(1, 101, 12, "b")
+    await summarizer.flush()
+
+    assert calls[-1] == ["a", "b"]
+    assert summarizer.get(1) is None
@@ -0,0 +1,104 @@
+from qq_bot.core.llm_manager.memory.record import CachedGroupMessage
+from qq_bot.core.llm_manager.memory.window import ConversationWindow
+
+
+def _message(
+    message_id: int, group_id: int = 1, content: str = "hi"
+) -> CachedGroupMessage:
+    return CachedGroupMessage(message_id, content, group_id, 10, None, False, 1700000000)
+
+
+def _turn(message_id: int, reply: str | None = None) -> list[dict]:
+    prompt = [{"role": "user", "content": f"msg {message_id}"}]
+    if reply is not None:
+        prompt.append({"role": "assistant", "content": reply})
+    return prompt
+
+
+def _fill(window: ConversationWindow, count: int, start: int = 0) -> None:
+    for i in range(start, start + count):
+        window.append(_message(i), f"reply {i}", _turn(i, f"reply {i}"))
+
+
+def test_window_keeps_latest_turns_and_evicts_oldest():
+    window = ConversationWindow(maxlen=3)
+    _fill(window, 3)
+
+    evicted = window.append(_message(3), "reply 3", _turn(3, "reply 3"))
+
+    assert evicted is not None
+    assert evicted[0].message_id == 0
+    assert evicted[1] == "reply 0"
+    assert [m.message_id for m in window.messages()] == [1, 2, 3]
+    assert 0 not in window
+    assert window.reply_of(0) is None
+    assert window.reply_of(3) == "reply 3"
+
+
+def test_window_ignores_duplicate_message():
+    window = ConversationWindow(maxlen=3)
+    _fill(window, 2)
+
+    assert window.append(_message(1), "other", _turn(1, "other")) is None
+    assert len(window) == 2
+    assert window.reply_of(1) == "reply 1"
+
+
+def test_window_iterates_messages_with_replies_in_order():
+    window = ConversationWindow(maxlen=4)
+    window.append(_message(0), None, _turn(0))
+    window.append(_message(1), "reply 1", _turn(1, "reply 1"))
+
+    assert [(m.message_id, reply) for m, reply in window] == [(0, None), (1, "reply 1")]
+
+
+def test_prompt_history_follows_evictions():
+    window = ConversationWindow(maxlen=2)
+    _fill(window, 3)
+
+    usage = window.prompt_history()
+
+    assert usage.turns == 2
+    assert usage.dropped_turns == 0
+    assert [m["content"] for m in usage.messages] == [
+        "msg 1",
+        "reply 1",
+        "msg 2",
+        "reply 2",
+    ]
+
+
+def test_prompt_history_drops_oldest_turns_over_budget():
+    window = ConversationWindow(maxlen=5)
+    _fill(window, 5)
+    full = window.prompt_history()
+    per_turn = full.tokens // full.turns
+
+    usage = window.prompt_history(budget=per_turn * 2)
+
+    assert usage.turns == 2
+    assert usage.dropped_turns == 3
+    assert usage.tokens <= per_turn * 2
+    assert usage.messages == full.messages[-4:]
+
+
+def test_prompt_history_returns_a_copy():
+    window = ConversationWindow(maxlen=2)
+    _fill(window, 2)
+
+    window.prompt_history().messages.clear()
+
+    assert len(window.prompt_history().messages) == 4
+
+
+def test_window_tracks_approx_bytes():
+    window = ConversationWindow(maxlen=2)
+    _fill(window, 2)
+    size = window.approx_bytes
+
+    window.append(_message(2, content="x" * 10000), None, _turn(2))
+
+    assert window.approx_bytes > size
+    window.append(_message(3), None, _turn(3))
+    window.append(_message(4), None, _turn(4))
+    assert window.approx_bytes < size + 10000
@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+from qq_bot.core.llm_manager.scheduler import LLMRequestScheduler, Priority
+
+
+async def test_scheduler_limits_concurrency():
+    scheduler = LLMRequestScheduler(max_concurrency=2)
+    running = 0
+    peak = 0
+
+    async def call():
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return "ok"
+
+    results = await asyncio.gather(*(scheduler.submit(call, key=i) for i in range(6)))
+
+    assert results == ["ok"] * 6
+    assert peak == 2
+    assert scheduler.stats()["completed"] == 6
+
+
+async def test_scheduler_prefers_higher_priority():
+    scheduler = LLMRequestScheduler(max_concurrency=1)
+    order = []
+    release = asyncio.Event()
+
+    async def hold():
+        await release.wait()
+
+    async def call(name):
+        order.append(name)
+
+    blocker = asyncio.create_task(scheduler.submit(hold))
+    await asyncio.sleep(0)
+    waiting = [
+        asyncio.create_task(
+            scheduler.submit(lambda: call("background"), priority=Priority.BACKGROUND)
+        ),
+        asyncio.create_task(
+            scheduler.submit(lambda: call("normal"), priority=Priority.NORMAL)
+        ),
+        asyncio.create_task(
+            scheduler.submit(lambda: call("mention"), priority=Priority.MENTION)
+        ),
+    ]
+    await asyncio.sleep(0)
+    release.set()
+    await asyncio.gather(blocker, *waiting)
+
+    assert order == ["mention", "normal", "background"]
+
+
+async def test_scheduler_shares_slots_fairly_between_keys():
+    scheduler = LLMRequestScheduler(max_concurrency=1)
+    order = []
+    release = asyncio.Event()
+
+    async def hold():
+        await release.wait()
+
+    async def call(key):
+        order.append(key)
+
+    blocker = asyncio.create_task(scheduler.submit(hold, key="x"))
+    await asyncio.sleep(0)
+    # 会话 a 先排入多个请求，会话 b 的请求不会排在它们全部之后
+    tasks = [
+        asyncio.create_task(scheduler.submit(lambda: call("a"), key="a", tokens=10))
+        for _ in range(3)
+    ]
+    tasks.append(
+        asyncio.create_task(scheduler.submit(lambda: call("b"), key="b", tokens=10))
+    )
+    await asyncio.sleep(0)
+    release.set()
+    await asyncio.gather(blocker, *tasks)
+
+    assert order.index("b") <= 1
+
+
+async def test_scheduler_refunds_tpm_when_request_cancelled_while_waiting():
+    scheduler = LLMRequestScheduler(max_concurrency=4, tpm=6000)
+
+    async with scheduler.reserve(tokens=6000):
+        # TPM 令牌已耗尽，第二个请求等待补充期间被取消
+        waiting = asyncio.create_task(scheduler.submit(asyncio.sleep, tokens=30))
+        await asyncio.sleep(0.05)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        await asyncio.sleep(0.4)
+
+    assert scheduler.stats()["tpm_available"] >= 30
+    assert scheduler.stats()["in_flight"] == 0
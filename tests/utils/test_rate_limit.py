@@ -0,0 +1,90 @@
+import asyncio
+import time
+
+import pytest
+from qq_bot.utils.rate_limit import TokenBucket
+
+
+@pytest.fixture()
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("qq_bot.utils.rate_limit.time.monotonic", lambda: now[0])
+    return now
+
+
+def test_bucket_starts_full_and_refills_up_to_capacity(clock):
+    bucket = TokenBucket(rate=2, capacity=4)
+
+    assert bucket.try_acquire(4)
+    assert not bucket.try_acquire()
+    clock[0] += 1
+    assert bucket.tokens == pytest.approx(2)
+    clock[0] += 10
+    assert bucket.tokens == pytest.approx(4)
+
+
+def test_bucket_default_capacity():
+    assert TokenBucket(rate=0.5).capacity == 1
+    assert TokenBucket(rate=5).capacity == 5
+
+
+def test_bucket_rejects_invalid_rate():
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0)
+
+
+def test_bucket_wait_time(clock):
+    bucket = TokenBucket(rate=2, capacity=2)
+    bucket.try_acquire(2)
+
+    assert bucket.wait_time() == pytest.approx(0.5)
+    clock[0] += 0.25
+    assert bucket.wait_time() == pytest.approx(0.25)
+
+
+@pytest.mark.usefixtures("clock")
+def test_bucket_consume_allows_overdraft():
+    bucket = TokenBucket(rate=1, capacity=2)
+
+    bucket.consume(5)
+
+    assert bucket.tokens == pytest.approx(-3)
+    assert bucket.wait_time() == pytest.approx(4)
+
+
+async def test_bucket_acquire_waits_for_refill():
+    bucket = TokenBucket(rate=50, capacity=1)
+    start = time.monotonic()
+
+    for _ in range(3):
+        await bucket.acquire()
+
+    assert time.monotonic() - start >= 0.035
+
+
+async def test_bucket_acquire_serves_waiters_in_order():
+    bucket = TokenBucket(rate=100, capacity=1)
+    bucket.try_acquire()
+    order = []
+
+    async def take(i: int) -> None:
+        await bucket.acquire()
+        order.append(i)
+
+    await asyncio.gather(*(take(i) for i in range(5)))
+
+    assert order == [0, 1, 2, 3, 4]
+
+
+async def test_bucket_acquire_rejects_more_than_capacity():
+    with pytest.raises(ValueError):
+        await TokenBucket(rate=1, capacity=2).acquire(3)
+
+
+def test_bucket_refund_is_capped_at_capacity():
+    bucket = TokenBucket(rate=1, capacity=5)
+    assert bucket.try_acquire(2)
+
+    bucket.refund(10)
+
+    assert bucket.tokens == pytest.approx(5)
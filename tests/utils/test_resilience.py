@@ -0,0 +1,101 @@
+import time
+
+import pytest
+from qq_bot.utils.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    backoff_delay,
+    is_retryable,
+)
+
+
+class _StatusError(Exception):
+    def __init__(self, status_code: int) -> None:
+        super().__init__(status_code)
+        self.status_code = status_code
+
+
+def test_backoff_delay_grows_exponentially_up_to_cap(monkeypatch):
+    monkeypatch.setattr("qq_bot.utils.resilience.random.uniform", lambda _low, high: high)
+
+    assert [backoff_delay(attempt, base=0.5, cap=3) for attempt in range(1, 6)] == [
+        0.5,
+        1,
+        2,
+        3,
+        3,
+    ]
+
+
+def test_backoff_delay_applies_full_jitter():
+    delays = [backoff_delay(3, base=1, cap=10) for _ in range(200)]
+
+    assert all(0 <= delay <= 4 for delay in delays)
+    assert len(set(delays)) > 1
+
+
+def test_is_retryable_classifies_transient_failures():
+    assert is_retryable(TimeoutError())
+    assert is_retryable(_StatusError(429))
+    assert is_retryable(_StatusError(503))
+    assert not is_retryable(_StatusError(400))
+    assert not is_retryable(ValueError())
+    assert not is_retryable(CircuitOpenError("api", 1))
+
+
+def test_circuit_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker("api", failure_threshold=2, recovery_timeout=60)
+
+    for _ in range(2):
+        with pytest.raises(TimeoutError), breaker.guard():
+            raise TimeoutError()
+
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError), breaker.guard():
+        pass
+
+
+def test_circuit_breaker_counts_client_errors_as_success():
+    breaker = CircuitBreaker("api", failure_threshold=1)
+
+    with pytest.raises(_StatusError), breaker.guard():
+        raise _StatusError(400)
+
+    assert breaker.state == "closed"
+
+
+def test_circuit_breaker_half_open_allows_single_probe():
+    breaker = CircuitBreaker("api", failure_threshold=1, recovery_timeout=0.05)
+    breaker.record_failure()
+    assert not breaker.allow()
+
+    time.sleep(0.06)
+
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_circuit_breaker_reopens_when_probe_fails():
+    breaker = CircuitBreaker("api", failure_threshold=3, recovery_timeout=0.05)
+    for _ in range(3):
+        breaker.record_failure()
+    time.sleep(0.06)
+
+    assert breaker.allow()
+    breaker.record_failure()
+
+    assert breaker.state == "open"
+    assert breaker.retry_after() > 0
+
+
+def test_circuit_breaker_releases_probe_on_cancel():
+    breaker = CircuitBreaker("api", failure_threshold=1, recovery_timeout=0)
+    breaker.record_failure()
+
+    with pytest.raises(KeyboardInterrupt), breaker.guard():
+        raise KeyboardInterrupt()
+
+    assert breaker.allow()
@@ -0,0 +1,34 @@
+from qq_bot.utils.util_text import SentenceStream, ThinkTagFilter
+
+
+def test_sentence_stream_yields_completed_sentences():
+    stream = SentenceStream("zh")
+
+    assert stream.feed("你好。今天") == ["你好。"]
+    assert stream.feed("天气不错！我们") == ["今天天气不错！"]
+    assert stream.flush() == ["我们"]
+    assert stream.flush() == []
+
+
+def test_sentence_stream_keeps_whitespace_inside_unfinished_sentence():
+    stream = SentenceStream("en")
+
+    assert stream.feed("Hello there. How") == ["Hello there."]
+    assert stream.feed(" are you? Fine") == ["How are you?"]
+    assert stream.flush() == ["Fine"]
+
+
+def test_think_tag_filter_handles_tags_split_across_chunks():
+    tag_filter = ThinkTagFilter()
+
+    chunks = ["a<th", "ink>hidden</thi", "nk>b<", "c"]
+    visible = "".join(tag_filter.feed(chunk) for chunk in chunks) + tag_filter.flush()
+
+    assert visible == "ab<c"
+
+
+def test_think_tag_filter_drops_unclosed_think():
+    tag_filter = ThinkTagFilter()
+
+    assert tag_filter.feed("answer<think>still thinking") == "answer"
+    assert tag_filter.flush() == ""